@@ -1,21 +1,4087 @@
-import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
-import requests
-import folium
+import time
+STARTUP_T0 = time.perf_counter()
+
+from concurrent.futures import ThreadPoolExecutor, Future
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from array import array
+import bisect
+import unicodedata
 import webbrowser
 import os
+import sys
 import json
+import importlib
+import argparse
+import hashlib
+import string
+import pathlib
+import math
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+from contextlib import contextmanager, closing
 from datetime import datetime, timedelta
 import threading
-import time
-from PIL import Image, ImageTk
+import heapq
+import random
+import queue
 import sqlite3
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import numpy as np
 
-class SuruwaApp:
-    def __init__(self):
+# Chronométrage du démarrage : durée des imports et des étapes (secondes)
+STARTUP_TIMINGS = {'imports initiaux': time.perf_counter() - STARTUP_T0}
+IMPORT_TIMINGS = {}
+
+# Budget de démarrage à froid (secondes jusqu'à la première fenêtre)
+STARTUP_BUDGET = 3.0
+
+
+@contextmanager
+def startup_step(name):
+    """Mesure d'une étape du démarrage"""
+    start = time.perf_counter()
+    yield
+    STARTUP_TIMINGS[name] = time.perf_counter() - start
+
+
+def startup_report():
+    """Rapport de démarrage : imports par module, étapes et respect du budget"""
+    first_window = STARTUP_TIMINGS.get('première fenêtre')
+    return {
+        'imports': {name: round(t, 4) for name, t in IMPORT_TIMINGS.items()},
+        'étapes': {name: round(t, 4) for name, t in STARTUP_TIMINGS.items()},
+        'budget': STARTUP_BUDGET,
+        'dans_le_budget': first_window is not None and first_window <= STARTUP_BUDGET,
+    }
+
+
+def lazy_import(name):
+    """Import d'un module lourd au premier usage, avec mesure de sa durée
+    
+    Les modules importés ainsi sont déclarés dans hiddenimports (suruwasoft.spec).
+    """
+    if name in IMPORT_TIMINGS:
+        return sys.modules[name]
+    # import_module attend la fin d'un import concurrent (module partiellement initialisé)
+    already_loaded = name in sys.modules
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    if not already_loaded:
+        IMPORT_TIMINGS[name] = time.perf_counter() - start
+    return module
+
+
+# Point d'accès et clé de l'API OpenWeatherMap (SURUWA_OWM_URL ou --owm-url pour viser un serveur de test,
+# par exemple tools/owm_stub.py)
+OWM_BASE_URL = os.environ.get('SURUWA_OWM_URL') or "https://api.openweathermap.org/data/2.5"
+OWM_API_KEY = os.environ.get('SURUWA_OWM_KEY') or "bcfbca71e682918b20ab37cb390f581a"
+
+# Délais réseau en secondes (connexion, lecture)
+HTTP_TIMEOUT = (5, 15)
+
+# Nombre maximal de villes par requête groupée (/group)
+GROUP_SIZE = 20
+
+# Bases de données locales
+DB_PATH = 'suruwa.db'
+CACHE_DB_PATH = os.path.join(os.path.dirname(DB_PATH), 'suruwa_cache.db')
+
+# Nombre de lignes par page de l'historique
+HISTORY_PAGE_SIZE = 50
+
+# Intervalle d'actualisation de l'onglet Analytiques (ms)
+ANALYTICS_REFRESH_MS = 60 * 1000
+
+# Intervalle d'actualisation du panneau de diagnostic (ms)
+DIAGNOSTICS_REFRESH_MS = 2000
+
+# Instrumentation : seaux des histogrammes de durée (secondes) et export Prometheus
+METRICS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_PATH = os.path.join(os.path.dirname(DB_PATH), 'suruwa_metrics.prom')
+METRICS_FILE_INTERVAL = 15  # secondes entre deux écritures du fichier de métriques
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'suruwa_profiles')
+METRIC_HELP = {
+    'suruwa_upstream_seconds': "Durée des appels à l'API météo",
+    'suruwa_upstream_errors_total': "Appels à l'API météo en échec (réseau ou réponse d'erreur)",
+    'suruwa_weather_cache_total': "Lectures du cache météo par résultat",
+    'suruwa_db_write_seconds': "Durée des transactions groupées du thread d'écriture",
+    'suruwa_db_statements_total': "Éléments écrits par le thread d'écriture, par résultat",
+    'suruwa_db_busy_retries_total': "Lots rejoués par le thread d'écriture sur base verrouillée",
+    'suruwa_db_read_seconds': "Durée des requêtes de lecture",
+    'suruwa_risk_seconds': "Durée du calcul du risque",
+    'suruwa_map_render_seconds': "Durée de génération des cartes",
+    'suruwa_alert_dispatch_seconds': "Durée totale d'une diffusion d'alerte",
+    'suruwa_alert_send_seconds': "Durée d'envoi d'un lot par canal, reprises comprises",
+    'suruwa_alert_recipients_total': "Destinataires traités par canal et résultat",
+    'suruwa_auto_alerts_total': "Alertes déclenchées automatiquement par le monitoring",
+    'suruwa_api_request_seconds': "Durée des requêtes de l'API du risque",
+    'suruwa_api_requests_total': "Requêtes de l'API du risque par statut",
+    'suruwa_api_results_total': "Origine des résultats de l'API du risque",
+    'suruwa_queue_depth': "Éléments en attente par file",
+    'suruwa_slow_operations_total': "Opérations lentes profilées",
+    'suruwa_errors_total': "Erreurs des threads d'arrière-plan par source",
+    'suruwa_export_seconds': "Durée des exports de l'historique et des alertes",
+    'suruwa_export_rows_total': "Lignes exportées par table",
+    'suruwa_import_seconds': "Durée des imports en masse de l'historique",
+    'suruwa_import_rows_total': "Enregistrements importés ou rejetés",
+    'suruwa_maintenance_seconds': "Durée des passages de maintenance (rétention, compactage)",
+    'suruwa_retention_rows_deleted_total': "Lignes expirées supprimées par table",
+    'suruwa_db_reclaimed_bytes_total': "Espace rendu par le compactage de la base",
+}
+
+# Durée de validité des réponses en cache par point d'accès (secondes)
+CACHE_TTL = {
+    'weather': 10 * 60,        # conditions actuelles
+    'forecast': 3 * 60 * 60,   # prévisions par pas de 3h
+}
+
+
+def metric_labels(labels, **extra):
+    """Étiquettes au format Prometheus : {cle="valeur",...}"""
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    escape = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in items) + "}"
+
+
+class Histogram:
+    """Histogramme de durées à seaux fixes : une recherche dichotomique et un verrou par mesure"""
+    def __init__(self, buckets=METRICS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # dernier seau : au-delà du plus grand (+Inf)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+        
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+        
+    def snapshot(self):
+        """(effectifs par seau, somme) cohérents entre eux"""
+        with self.lock:
+            return list(self.counts), self.sum
+        
+    def quantile(self, q, counts=None):
+        """Estimation d'un quantile par interpolation linéaire dans son seau (None si vide)"""
+        counts = counts or self.snapshot()[0]
+        rank = q * sum(counts)
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return None
+
+
+class SlowOperationProfiler:
+    """Profileur par échantillonnage des opérations chronométrées, enregistré si l'opération est lente
+    
+    Un seul thread relève la pile des threads ayant une opération en cours (et dort sinon) ;
+    les piles sont agrégées au format « folded » (flamegraph.pl, speedscope).
+    """
+    def __init__(self, threshold, directory=PROFILES_DIR, interval=0.005):
+        self.threshold = threshold
+        self.directory = directory
+        self.interval = interval
+        self.watched = {}  # jeton -> (identifiant du thread, {pile: échantillons})
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        threading.Thread(target=self._run, name="suruwa-profiler", daemon=True).start()
+        
+    def watch(self):
+        """Début d'une opération sur le thread courant ; retourne un jeton"""
+        token = object()
+        with self.lock:
+            self.watched[token] = (threading.get_ident(), {})
+        self.wake.set()
+        return token
+        
+    def done(self, token, name, labels, elapsed):
+        """Fin d'une opération : profil écrit si elle a dépassé le seuil ; chemin du fichier ou None"""
+        with self.lock:
+            _, stacks = self.watched.pop(token)
+        if elapsed < self.threshold or not stacks:
+            return None
+        METRICS.inc('suruwa_slow_operations_total', operation=name)
+        os.makedirs(self.directory, exist_ok=True)
+        suffix = "_".join(str(value) for _, value in labels)
+        path = os.path.join(self.directory, f"{datetime.now():%Y%m%d-%H%M%S}_{name}{'_' + suffix if suffix else ''}"
+                                            f"_{elapsed * 1000:.0f}ms.folded")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{stack} {count}\n" for stack, count in sorted(stacks.items()))
+        return path
+        
+    def _run(self):
+        """Relevé périodique des piles des opérations en cours"""
+        while True:
+            self.wake.wait()
+            with self.lock:
+                if not self.watched:
+                    self.wake.clear()
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.watched.values():
+                    frame = frames.get(thread_id)
+                    calls = []
+                    while frame is not None:
+                        code = frame.f_code
+                        calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                        frame = frame.f_back
+                    stack = ";".join(reversed(calls))
+                    stacks[stack] = stacks.get(stack, 0) + 1
+            time.sleep(self.interval)
+
+
+class Metrics:
+    """Registre des mesures du processus : histogrammes, compteurs, jauges lues à l'export"""
+    def __init__(self):
+        self.histograms = {}  # (nom, étiquettes) -> Histogram
+        self.counters = {}    # (nom, étiquettes) -> valeur
+        self.gauges = {}      # (nom, étiquettes) -> fonction de lecture
+        self.lock = threading.Lock()
+        self.profiler = None
+        
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+        
+    def observe(self, name, seconds, **labels):
+        """Enregistrement d'une durée déjà mesurée"""
+        self.histogram(name, **labels).observe(seconds)
+        
+    @contextmanager
+    def timer(self, name, **labels):
+        """Chronométrage d'un bloc (profilé s'il est lent et que le profileur est actif)"""
+        histogram = self.histogram(name, **labels)
+        profiler = self.profiler
+        token = profiler.watch() if profiler else None
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            histogram.observe(elapsed)
+            if token is not None:
+                profiler.done(token, name, tuple(sorted(labels.items())), elapsed)
+        
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+        
+    def gauge(self, name, read, **labels):
+        """Jauge lue à chaque export : read() -> nombre"""
+        self.gauges[(name, tuple(sorted(labels.items())))] = read
+        
+    def enable_profiler(self, threshold, directory=PROFILES_DIR):
+        """Profils des opérations chronométrées de plus de threshold secondes"""
+        self.profiler = SlowOperationProfiler(threshold, directory)
+        
+    def _gauge_values(self):
+        values = {}
+        for key, read in list(self.gauges.items()):
+            try:
+                values[key] = read()
+            except Exception:
+                continue  # objet observé déjà fermé
+        return values
+        
+    def render(self):
+        """Exposition au format texte Prometheus"""
+        lines = []
+        described = set()
+        
+        def describe(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+        
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        for (name, labels), histogram in histograms:
+            describe(name, 'histogram')
+            counts, total = histogram.snapshot()
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{metric_labels(labels, le=bound)} {cumulative}")
+            lines.append(f"{name}_sum{metric_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{metric_labels(labels)} {cumulative}")
+        for (name, labels), value in counters:
+            describe(name, 'counter')
+            lines.append(f"{name}{metric_labels(labels)} {value}")
+        for (name, labels), value in sorted(self._gauge_values().items()):
+            describe(name, 'gauge')
+            lines.append(f"{name}{metric_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+        
+    def write(self, path=METRICS_PATH):
+        """Écriture atomique du fichier (collecteur « textfile » de node_exporter)"""
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+        
+    def summary(self):
+        """Panneau de diagnostic : [(mesure, nombre, moyenne, p50, p95 en ms)], [(compteur ou jauge, valeur)]"""
+        def label(name, labels):
+            short = name.removeprefix('suruwa_').removesuffix('_seconds').removesuffix('_total')
+            return " ".join([short] + [str(value) for _, value in labels])
+        
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            values = sorted(self.counters.items())
+        timings = []
+        for (name, labels), histogram in histograms:
+            counts, total = histogram.snapshot()
+            count = sum(counts)
+            if count:
+                timings.append((label(name, labels), count, total / count * 1000,
+                                histogram.quantile(0.5, counts) * 1000, histogram.quantile(0.95, counts) * 1000))
+        values += sorted(self._gauge_values().items())
+        return timings, [(label(name, labels), value) for (name, labels), value in values]
+
+
+# Mesures du processus, partagées par tous les composants
+METRICS = Metrics()
+
+# Gestionnaires des erreurs d'arrière-plan : handler(source, message), appelé sur le thread fautif
+ERROR_HANDLERS = []
+
+
+def report_error(source, message):
+    """Erreur d'un thread d'arrière-plan : comptée, écrite sur stderr et transmise aux ERROR_HANDLERS"""
+    METRICS.inc('suruwa_errors_total', source=source)
+    print(f"{datetime.now():%Y-%m-%d %H:%M:%S} erreur {source} : {message}", file=sys.stderr, flush=True)
+    for handler in list(ERROR_HANDLERS):
+        handler(source, message)
+
+
+class WeatherCache:
+    """Cache à deux niveaux des réponses météo (LRU mémoire + SQLite sur disque)"""
+    def __init__(self, path=CACHE_DB_PATH, ttl=None, memory_size=256, disk_size=5000):
+        self.ttl = dict(CACHE_TTL, **(ttl or {}))
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        
+        # Stockage disque partagé par les threads réseau
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT,
+                payload TEXT,
+                stored_at REAL
+            )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_stored ON responses(stored_at)")
+        self.conn.commit()
+        self.disk_count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        
+    @staticmethod
+    def make_key(endpoint, params):
+        """Clé de cache normalisée (point d'accès + paramètres)"""
+        parts = [f"{k}={str(v).strip().lower()}" for k, v in sorted(params.items())]
+        return endpoint + "?" + "&".join(parts)
+        
+    def get(self, endpoint, key, allow_stale=False):
+        """Lecture d'une réponse ; périmée seulement si allow_stale (marquée '_stale')"""
+        ttl = self.ttl.get(endpoint, 0)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None:
+                self.memory.move_to_end(key)
+            else:
+                row = self.conn.execute("SELECT stored_at, payload FROM responses WHERE key = ?",
+                                        (key,)).fetchone()
+                if row is None:
+                    return None
+                entry = (row[0], json.loads(row[1]))
+                self._remember(key, entry)
+        
+        stored_at, payload = entry
+        if now - stored_at <= ttl:
+            return payload
+        if allow_stale:
+            return dict(payload, _stale=True, _cached_at=stored_at)
+        return None
+        
+    def put(self, endpoint, key, payload):
+        """Enregistrement d'une réponse valide dans les deux niveaux"""
+        entry = (time.time(), payload)
+        with self.lock:
+            self._remember(key, entry)
+            exists = self.conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO responses (key, endpoint, payload, stored_at) VALUES (?, ?, ?, ?)",
+                              (key, endpoint, json.dumps(payload), entry[0]))
+            if exists is None:
+                self.disk_count += 1  # un rafraîchissement ne compte pas comme une nouvelle entrée
+            if self.disk_count > self.disk_size:
+                # Éviction des entrées les plus anciennes (10% de marge)
+                excess = self.disk_count - int(self.disk_size * 0.9)
+                self.conn.execute("DELETE FROM responses WHERE key IN "
+                                  "(SELECT key FROM responses ORDER BY stored_at LIMIT ?)", (excess,))
+                self.disk_count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            self.conn.commit()
+            
+    def _remember(self, key, entry):
+        """Insertion dans le LRU mémoire (verrou déjà pris)"""
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+            
+    def close(self):
+        """Fermeture du stockage disque"""
+        with self.lock:
+            self.conn.close()
+
+
+class WeatherClient:
+    """Client HTTP partagé pour OpenWeatherMap"""
+    def __init__(self, api_key, base_url=OWM_BASE_URL, pool_size=8, timeout=HTTP_TIMEOUT, cache=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cache = cache
+        self.request_count = 0
+        self.count_lock = threading.Lock()
+        
+        self.pool_size = pool_size
+        self.session = None
+        self.session_lock = threading.Lock()
+        
+        # Pool borné pour les appels lancés en parallèle
+        self.executor = ThreadPoolExecutor(max_workers=pool_size,
+                                           thread_name_prefix="suruwa-http")
+        
+    def get_session(self):
+        """Session unique, créée au premier appel : connexions keep-alive réutilisées"""
+        with self.session_lock:
+            if self.session is None:
+                requests = lazy_import('requests')
+                self.session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size)
+                self.session.mount('https://', adapter)
+                self.session.mount('http://', adapter)
+            return self.session
+        
+    def get(self, endpoint, params):
+        """Requête GET sur un point d'accès de l'API"""
+        with self.count_lock:
+            self.request_count += 1
+        query = dict(params, appid=self.api_key, units='metric')
+        try:
+            with METRICS.timer('suruwa_upstream_seconds', endpoint=endpoint):
+                response = self.get_session().get(f"{self.base_url}/{endpoint}",
+                                            params=query, timeout=self.timeout)
+                payload = response.json()
+                if response.status_code != 200:
+                    payload.setdefault('cod', response.status_code)  # erreur HTTP sans code dans le corps
+        except Exception:
+            METRICS.inc('suruwa_upstream_errors_total', endpoint=endpoint)
+            raise
+        if str(payload.get("cod", 200)) != "200":
+            METRICS.inc('suruwa_upstream_errors_total', endpoint=endpoint)
+        return payload
+        
+    def fetch(self, endpoint, params):
+        """Requête servie par le cache si possible, avec repli hors ligne"""
+        if self.cache is None:
+            return self.get(endpoint, params)
+        requests = lazy_import('requests')
+        
+        key = self.cache.make_key(endpoint, params)
+        cached = self.cache.get(endpoint, key)
+        if cached is not None:
+            METRICS.inc('suruwa_weather_cache_total', endpoint=endpoint, result='hit')
+            return cached
+        METRICS.inc('suruwa_weather_cache_total', endpoint=endpoint, result='miss')
+        
+        try:
+            payload = self.get(endpoint, params)
+        except requests.RequestException:
+            # Réseau indisponible : dernière réponse connue, marquée périmée
+            stale = self.cache.get(endpoint, key, allow_stale=True)
+            if stale is None:
+                raise
+            METRICS.inc('suruwa_weather_cache_total', endpoint=endpoint, result='stale')
+            return stale
+        
+        if str(payload.get("cod")) == "200":
+            self.cache.put(endpoint, key, payload)
+            return payload
+        
+        # Réponse d'erreur (quota dépassé, panne du service...) : même repli que sans réseau, l'entrée
+        # valide en cache n'est pas remplacée
+        stale = self.cache.get(endpoint, key, allow_stale=True)
+        if stale is None:
+            return payload
+        METRICS.inc('suruwa_weather_cache_total', endpoint=endpoint, result='stale')
+        return stale
+        
+    def fetch_current_and_forecast(self, params):
+        """Récupération simultanée de la météo actuelle et des prévisions"""
+        forecast_future = self.executor.submit(self.fetch, 'forecast', params)
+        try:
+            current_res = self.fetch('weather', params)
+        except Exception:
+            forecast_future.cancel()
+            raise
+        return current_res, forecast_future.result()
+        
+    def fetch_group(self, city_ids):
+        """Météo actuelle de plusieurs villes par identifiant, GROUP_SIZE villes par requête"""
+        requests = lazy_import('requests')
+        results = {}
+        missing = []
+        for city_id in city_ids:
+            cached = self.cache.get('weather', self.cache.make_key('weather', {'id': city_id})) if self.cache else None
+            if cached is not None:
+                results[city_id] = cached
+            else:
+                missing.append(city_id)
+        if self.cache:
+            METRICS.inc('suruwa_weather_cache_total', len(results), endpoint='group', result='hit')
+            METRICS.inc('suruwa_weather_cache_total', len(missing), endpoint='group', result='miss')
+        
+        chunks = [missing[i:i + GROUP_SIZE] for i in range(0, len(missing), GROUP_SIZE)]
+        futures = [self.executor.submit(self.get, 'group', {'id': ','.join(map(str, chunk))})
+                   for chunk in chunks]
+        
+        for chunk, future in zip(chunks, futures):
+            try:
+                payload = future.result()
+            except requests.RequestException:
+                payload = {}
+            
+            # Répartition de la réponse groupée ville par ville
+            for item in payload.get('list', []):
+                item.setdefault('cod', 200)
+                results[item['id']] = item
+                if self.cache:
+                    self.cache.put('weather', self.cache.make_key('weather', {'id': item['id']}), item)
+            
+            # Repli hors ligne pour les villes sans réponse
+            for city_id in chunk:
+                if city_id not in results and self.cache:
+                    stale = self.cache.get('weather', self.cache.make_key('weather', {'id': city_id}),
+                                           allow_stale=True)
+                    if stale is not None:
+                        results[city_id] = stale
+        return results
+        
+    def fetch_batch(self, city_ids):
+        """Météo actuelle groupée et prévisions (servies par le cache) de plusieurs villes"""
+        requests = lazy_import('requests')
+        # Pas de point d'accès groupé pour les prévisions : elles sont conservées 3h en cache
+        forecasts = {city_id: self.executor.submit(self.fetch, 'forecast', {'id': city_id})
+                     for city_id in city_ids}
+        currents = self.fetch_group(city_ids)
+        
+        results = {}
+        for city_id in city_ids:
+            try:
+                forecast_res = forecasts[city_id].result()
+            except requests.RequestException:
+                forecast_res = None
+            results[city_id] = (currents.get(city_id), forecast_res)
+        return results
+        
+    def close(self):
+        """Libération des connexions et du pool"""
+        self.executor.shutdown(wait=False)
+        if self.session is not None:
+            self.session.close()
+
+
+# Thread d'écriture : attente du verrou SQLite (secondes) puis lot rejoué, pour couvrir les
+# longues transactions de l'import en masse et de la maintenance sans perdre d'écritures
+DB_WRITER_BUSY_TIMEOUT = 60
+DB_WRITER_BUSY_RETRIES = 10
+DB_FLUSH_TIMEOUT = DB_WRITER_BUSY_TIMEOUT * (DB_WRITER_BUSY_RETRIES + 1)
+
+
+def sqlite_busy(error):
+    """Erreur de verrou : base occupée par une autre connexion"""
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+class DatabaseWriter:
+    """Thread unique d'écriture SQLite : file d'attente, transactions groupées, mode WAL"""
+    def __init__(self, path=DB_PATH, batch_size=1000):
+        self.path = path
+        self.batch_size = batch_size
+        self.queue = queue.Queue()
+        METRICS.gauge('suruwa_queue_depth', self.queue.qsize, queue='db_writer')
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="suruwa-db-writer", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        
+    def execute(self, sql, params=()):
+        """Mise en file d'une écriture ; le Future reçoit lastrowid après validation"""
+        return self.execute_group([(sql, params)])
+        
+    def executemany(self, sql, rows):
+        """Mise en file d'une écriture multiple"""
+        future = Future()
+        self.queue.put(([(sql, rows, True)], future))
+        return future
+        
+    def execute_group(self, statements):
+        """Mise en file d'instructions [(sql, params), ...] validées dans la même transaction"""
+        future = Future()
+        if not statements:
+            future.set_result(None)
+            return future
+        self.queue.put(([(sql, params, False) for sql, params in statements], future))
+        return future
+        
+    def flush(self, timeout=DB_FLUSH_TIMEOUT):
+        """Attente de la validation de toutes les écritures déjà en file
+        
+        False si le délai expire ou si le thread d'écriture n'est plus actif.
+        """
+        done = threading.Event()
+        self.queue.put(done)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not done.wait(1.0):
+            if not self.thread.is_alive() or (deadline is not None and time.monotonic() >= deadline):
+                return done.is_set()
+        return True
+        
+    def close(self, timeout=10):
+        """Validation des écritures en attente puis arrêt du thread"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+            
+    def _run(self):
+        """Boucle d'écriture : vide la file et valide par transactions groupées"""
+        conn = sqlite3.connect(self.path, timeout=DB_WRITER_BUSY_TIMEOUT)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self.ready.set()
+        
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            running = None not in batch
+            done_events = [item for item in batch if isinstance(item, threading.Event)]
+            items = [item for item in batch if isinstance(item, tuple)]
+            attempt = 0
+            while True:
+                try:
+                    with METRICS.timer('suruwa_db_write_seconds'):
+                        results = self._write_batch(conn, items)
+                    break
+                except sqlite3.Error as e:
+                    if conn.in_transaction:
+                        conn.rollback()  # COMMIT en échec : transaction encore ouverte
+                    if sqlite_busy(e) and attempt < DB_WRITER_BUSY_RETRIES:
+                        # Base verrouillée par une longue transaction : tout le lot est rejoué
+                        attempt += 1
+                        METRICS.inc('suruwa_db_busy_retries_total')
+                        continue
+                    error = e
+                except Exception as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    error = e
+                # Échec de la transaction elle-même (BEGIN, COMMIT, ROLLBACK TO) : le lot entier est
+                # en échec, le thread continue
+                report_error('écriture', error)
+                results = [(future, None, error) for _, future in items]
+                break
+            
+            failed = sum(error is not None for _, _, error in results)
+            METRICS.inc('suruwa_db_statements_total', len(results) - failed, result='ok')
+            if failed:
+                METRICS.inc('suruwa_db_statements_total', failed, result='error')
+            for future, rowid, error in results:
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(rowid)
+            for event in done_events:
+                event.set()
+        
+        conn.close()
+        
+    def _write_batch(self, conn, items):
+        """Une transaction pour le lot : seul l'élément fautif est annulé, le reste est validé
+        
+        Une erreur de verrou remonte au lieu d'être imputée à l'élément, pour rejouer le lot.
+        """
+        results = []
+        with conn:
+            conn.execute("BEGIN")
+            for statements, future in items:
+                conn.execute("SAVEPOINT item")
+                try:
+                    cursor = None
+                    for sql, params, many in statements:
+                        cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+                    conn.execute("RELEASE item")
+                    results.append((future, cursor.lastrowid if cursor is not None else None, None))
+                except sqlite3.Error as e:
+                    if sqlite_busy(e):
+                        raise
+                    conn.execute("ROLLBACK TO item")
+                    conn.execute("RELEASE item")
+                    report_error('écriture', e)  # l'exception est aussi transmise au Future
+                    results.append((future, None, e))
+        return results
+
+
+# Valeur numérique des niveaux de risque (agrégats, graphiques)
+RISK_SCORES = {"Indéterminé": 0, "Faible": 1, "Modéré": 2, "Élevé": 3, "Critique": 4}
+
+# Tables d'agrégats par zone (heure, jour), tenues à jour à chaque observation
+ROLLUP_TABLES = {'hourly': 'weather_rollup_hourly', 'daily': 'weather_rollup_daily'}
+
+# Index secondaires de l'historique (supprimés pendant un import en masse, puis reconstruits)
+HISTORY_INDEXES = {
+    'idx_history_timestamp': "CREATE INDEX IF NOT EXISTS idx_history_timestamp ON weather_history(timestamp)",
+    'idx_history_city_timestamp':
+        "CREATE INDEX IF NOT EXISTS idx_history_city_timestamp ON weather_history(city, timestamp)",
+}
+
+
+def rollup_statements(city, timestamp, risk_level, humidity, precipitation):
+    """Instructions de mise à jour incrémentale des agrégats pour une observation
+    
+    La précipitation observée est le cumul sur la dernière heure : l'agrégat horaire
+    en garde le maximum, l'agrégat journalier cumule les hausses de l'horaire.
+    """
+    hour = timestamp.strftime('%Y-%m-%d %H:00')
+    day = timestamp.strftime('%Y-%m-%d')
+    risk = RISK_SCORES.get(risk_level, 0)
+    
+    daily = """
+        INSERT INTO weather_rollup_daily (city, bucket, samples, max_risk, humidity_sum, precipitation)
+        VALUES (?, ?, 1, ?, ?, MAX(0, ? - COALESCE(
+            (SELECT precipitation FROM weather_rollup_hourly WHERE city = ? AND bucket = ?), 0)))
+        ON CONFLICT(city, bucket) DO UPDATE SET
+            samples = samples + 1,
+            max_risk = MAX(max_risk, excluded.max_risk),
+            humidity_sum = humidity_sum + excluded.humidity_sum,
+            precipitation = precipitation + excluded.precipitation
+    """
+    hourly = """
+        INSERT INTO weather_rollup_hourly (city, bucket, samples, max_risk, humidity_sum, precipitation)
+        VALUES (?, ?, 1, ?, ?, ?)
+        ON CONFLICT(city, bucket) DO UPDATE SET
+            samples = samples + 1,
+            max_risk = MAX(max_risk, excluded.max_risk),
+            humidity_sum = humidity_sum + excluded.humidity_sum,
+            precipitation = MAX(precipitation, excluded.precipitation)
+    """
+    # L'agrégat journalier lit l'horaire avant sa mise à jour
+    return [
+        (daily, (city, day, risk, humidity, precipitation, city, hour)),
+        (hourly, (city, hour, risk, humidity, precipitation)),
+    ]
+
+
+# Export en flux de l'historique et des alertes : colonne de zone et colonnes exportées (nom, type)
+EXPORT_TABLES = {
+    'weather_history': ('city', (('id', 'int'), ('city', 'str'), ('temperature', 'float'),
+                                 ('humidity', 'float'), ('precipitation', 'float'),
+                                 ('risk_level', 'str'), ('timestamp', 'datetime'))),
+    'alerts': ('zone', (('id', 'int'), ('zone', 'str'), ('alert_type', 'str'), ('risk_level', 'str'),
+                        ('message', 'str'), ('status', 'str'), ('delivery_status', 'str'),
+                        ('sent_count', 'int'), ('failed_count', 'int'), ('timestamp', 'datetime'))),
+}
+EXPORT_CHUNK_ROWS = 20000  # lignes lues et écrites par bloc
+EXPORT_GZIP_LEVEL = 1      # compression rapide : deux fois moins coûteuse que le niveau 3
+
+# Formats d'export par extension ; Parquet et Arrow demandent pyarrow
+EXPORT_FORMATS = {'.csv.gz': "CSV compressé", '.csv': "CSV", '.parquet': "Parquet",
+                  '.arrow': "Arrow (IPC)", '.npz': "NumPy (archive par blocs)"}
+
+
+def columnar_export_available():
+    """Parquet et Arrow disponibles (pyarrow installé)"""
+    return lazy_import('importlib.util').find_spec('pyarrow') is not None
+
+
+def export_formats():
+    """Extensions d'export utilisables ici, CSV compressé (format par défaut) en tête"""
+    columnar = columnar_export_available()
+    return [ext for ext in ('.csv.gz', '.parquet', '.arrow', '.npz', '.csv')
+            if columnar or ext not in ('.parquet', '.arrow')]
+
+
+def export_arrays(rows, columns):
+    """Colonnes NumPy d'un bloc de lignes : entiers (-1 si absent), réels (NaN), textes, dates (µs)"""
+    np = lazy_import('numpy')
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    arrays = {}
+    for (name, kind), column in zip(columns, values):
+        if kind == 'int':
+            arrays[name] = np.fromiter((-1 if v is None else v for v in column), np.int64, len(column))
+        elif kind == 'float':
+            arrays[name] = np.array(column, dtype=np.float64)
+        elif kind == 'datetime':
+            arrays[name] = np.array([None if v is None else str(v) for v in column], dtype='datetime64[us]')
+        else:
+            arrays[name] = np.array(['' if v is None else v for v in column], dtype=str)
+    return arrays
+
+
+class CsvExportWriter:
+    """CSV, compressé en gzip si le fichier se termine par .gz"""
+    # Réels formatés par SQLite (15 chiffres significatifs) : deux fois plus rapide que le module csv
+    float_as_text = True
+    
+    def __init__(self, path, columns):
+        csv = lazy_import('csv')
+        if path.endswith('.gz'):
+            self.file = lazy_import('gzip').open(path, 'wt', newline='', encoding='utf-8',
+                                                  compresslevel=EXPORT_GZIP_LEVEL)
+        else:
+            self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([name for name, _ in columns])
+        
+    def write(self, rows):
+        self.writer.writerows(rows)
+        
+    def close(self):
+        self.file.close()
+
+
+class ArrowExportWriter:
+    """Parquet (un groupe de lignes par bloc) ou fichier Arrow IPC"""
+    float_as_text = False
+    
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.writer = None
+        
+    def write(self, rows):
+        pa = lazy_import('pyarrow')
+        table = pa.table(export_arrays(rows, self.columns))
+        if self.writer is None:
+            if self.path.endswith('.parquet'):
+                self.writer = lazy_import('pyarrow.parquet').ParquetWriter(self.path, table.schema,
+                                                                           compression='zstd')
+            else:
+                self.writer = pa.ipc.new_file(self.path, table.schema)
+        self.writer.write_table(table)
+        
+    def close(self):
+        if self.writer is None:
+            self.write([])  # export vide : schéma seul
+        self.writer.close()
+
+
+class NumpyExportWriter:
+    """Archive .npz écrite par blocs : un tableau par colonne et par bloc (bloc_00000/city, ...)"""
+    float_as_text = False
+    
+    def __init__(self, path, columns):
+        zipfile = lazy_import('zipfile')
+        self.columns = columns
+        self.chunks = 0
+        self.zip = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=EXPORT_GZIP_LEVEL)
+        
+    def write(self, rows):
+        np = lazy_import('numpy')
+        for name, values in export_arrays(rows, self.columns).items():
+            with self.zip.open(f"bloc_{self.chunks:05d}/{name}.npy", 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, values, allow_pickle=False)
+        self.chunks += 1
+        
+    def close(self):
+        if self.chunks == 0:
+            self.write([])
+        self.zip.close()
+
+
+def read_export_npz(path):
+    """Blocs d'une archive NumPy exportée, un dictionnaire {colonne: tableau} à la fois"""
+    np = lazy_import('numpy')
+    with np.load(path, allow_pickle=False) as archive:
+        chunks = {}
+        for key in archive.files:
+            chunk, _, name = key.partition('/')
+            chunks.setdefault(chunk, []).append(name)
+        for chunk in sorted(chunks):
+            yield {name: archive[f"{chunk}/{name}"] for name in chunks[chunk]}
+
+
+def export_format(path):
+    """Extension d'export du fichier (ValueError si le format est inconnu ou indisponible)"""
+    for extension in EXPORT_FORMATS:
+        if path.endswith(extension):
+            if extension in ('.parquet', '.arrow') and not columnar_export_available():
+                raise ValueError("Parquet et Arrow demandent pyarrow : exporter en .npz ou .csv.gz")
+            return extension
+    raise ValueError(f"Format d'export inconnu ({', '.join(EXPORT_FORMATS)})")
+
+
+def export_writer(path, columns):
+    """Écrivain adapté à l'extension du fichier"""
+    extension = export_format(path)
+    if extension in ('.parquet', '.arrow'):
+        return ArrowExportWriter(path, columns)
+    if extension == '.npz':
+        return NumpyExportWriter(path, columns)
+    return CsvExportWriter(path, columns)
+
+
+def export_table(db_path, path, table='weather_history', zone=None, start=None, end=None,
+                 on_progress=None, cancel=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Export en flux d'une table, filtrée par zone et période [start, end), en mémoire constante
+    
+    Les lignes sont lues par blocs sur une connexion en lecture seule propre à l'appel et
+    écrites au fil de l'eau dans un fichier temporaire, renommé à la fin. on_progress(écrites,
+    total) est appelé après chaque bloc ; cancel (threading.Event) interrompt l'export.
+    Retourne le nombre de lignes exportées, None si l'export a été interrompu.
+    """
+    zone_column, columns = EXPORT_TABLES[table]
+    conditions = []
+    params = []
+    if zone:
+        conditions.append(f"{zone_column} = ?")
+        params.append(zone)
+    if start:
+        conditions.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        conditions.append("timestamp < ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    extension = export_format(path)
+    temporary = f"{path[:-len(extension)]}.partiel{extension}"
+    writer = export_writer(temporary, columns)
+    selected = ', '.join(f"CAST({name} AS TEXT)" if kind == 'float' and writer.float_as_text else name
+                         for name, kind in columns)
+    conn = sqlite3.connect(pathlib.Path(db_path).resolve().as_uri() + '?mode=ro', uri=True)
+    written = 0
+    try:
+        with METRICS.timer('suruwa_export_seconds', table=table):
+            total = conn.execute(f"SELECT COUNT(*) FROM {table} {where}", params).fetchone()[0]
+            cursor = conn.execute(f"""
+                SELECT {selected}
+                FROM {table}
+                {where}
+                ORDER BY timestamp, id
+            """, params)
+            while True:
+                rows = cursor.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                if cancel is not None and cancel.is_set():
+                    return None
+                writer.write(rows)
+                written += len(rows)
+                METRICS.inc('suruwa_export_rows_total', len(rows), table=table)
+                if on_progress:
+                    on_progress(written, total)
+            writer.close()
+            writer = None
+        os.replace(temporary, path)
+        return written
+    finally:
+        conn.close()
+        if writer is not None:
+            writer.close()
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+# Rétention de l'historique : observations brutes gardées RETENTION_RAW_DAYS jours (agrégats horaires et
+# journaliers au-delà), agrégats horaires gardés RETENTION_HOURLY_DAYS jours, journaliers sans limite.
+# 0 (défaut) : tout garder, la maintenance se limite alors au compactage ; purge activée explicitement
+RETENTION_RAW_DAYS = int(os.environ.get('SURUWA_RETENTION_DAYS') or 0)
+RETENTION_HOURLY_DAYS = int(os.environ.get('SURUWA_RETENTION_HOURLY_DAYS') or 0)
+RETENTION_BATCH_ROWS = 2000       # observations supprimées par transaction
+RETENTION_PAUSE = 0.05            # secondes entre deux transactions, laissées au thread d'écriture
+RETENTION_VACUUM_PAGES = 1024     # pages rendues par pas de vacuum incrémental
+MAINTENANCE_DELAY = 5 * 60        # secondes avant le premier passage (hors démarrage)
+MAINTENANCE_INTERVAL = 6 * 60 * 60  # secondes entre deux passages
+
+# Import en masse de l'historique (relevés de stations, réanalyses) : CSV ou JSON lignes, .gz accepté
+IMPORT_CHUNK_ROWS = 50000  # lignes par transaction : insertion, agrégats et point de reprise
+IMPORT_MAX_ERRORS = 20     # erreurs de validation détaillées dans le rapport
+
+# Colonnes de weather_history et noms acceptés dans les fichiers importés
+IMPORT_FIELDS = (
+    ('city', ('city', 'zone', 'station', 'name', 'ville')),
+    ('temperature', ('temperature', 'temp', 'température')),
+    ('humidity', ('humidity', 'humidite', 'humidité', 'rh')),
+    ('precipitation', ('precipitation', 'precip', 'rain', 'rain_1h', 'rainfall', 'pluie', 'précipitations')),
+    ('risk_level', ('risk_level', 'risk', 'risque')),
+    ('timestamp', ('timestamp', 'time', 'datetime', 'date', 'dt')),
+)
+
+# Dates numériques importées : formats compacts par longueur, horodatages Unix acceptés (1973-2099)
+IMPORT_COMPACT_DATES = {8: '%Y%m%d', 10: '%Y%m%d%H', 12: '%Y%m%d%H%M', 14: '%Y%m%d%H%M%S'}
+IMPORT_EPOCH_RANGE = (1e8, 4.1e9)
+
+# Bornes de validité des mesures importées
+IMPORT_RANGES = {'temperature': (-90.0, 60.0), 'humidity': (0.0, 100.0), 'precipitation': (0.0, 500.0)}
+
+# Décalage UTC fixe du fuseau local (None s'il a une heure d'été)
+LOCAL_UTC_OFFSET = None if time.daylight else timedelta(seconds=-time.timezone)
+
+
+def import_number(value, field):
+    """Mesure numérique validée (virgule décimale acceptée), None si absente"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, str) and ',' in value:
+        value = value.replace(',', '.')
+    number = float(value)
+    low, high = IMPORT_RANGES[field]
+    if not low <= number <= high:
+        raise ValueError(f"{field} hors limites : {number}")
+    return number
+
+
+def import_timestamp(value):
+    """Date ISO 8601 ou horodatage Unix, ramenée à l'heure locale au format de la base
+    
+    Une date à la seconde déjà à l'heure locale (sans fuseau, ou avec celui du poste s'il
+    n'a pas d'heure d'été) est reprise telle quelle : le formatage coûte plus que la lecture.
+    """
+    if isinstance(value, (int, float)) or (isinstance(value, str) and value.replace('.', '', 1).isdigit()):
+        return import_numeric_timestamp(value)
+    if not value:
+        raise ValueError("date absente")
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        # AAAA-MM-JJTHH:MM:SS suivi de Z ou +HH:MM, déjà à l'heure locale
+        if moment.utcoffset() != LOCAL_UTC_OFFSET or len(value) not in (20, 25):
+            return str(moment.astimezone().replace(tzinfo=None))
+        value = value[:19]
+    if len(value) == 19 and value[10] in 'T ':
+        return value.replace('T', ' ')
+    return str(moment)
+
+
+def import_numeric_timestamp(value):
+    """Date compacte AAAAMMJJ[HH[MM[SS]]] ou horodatage Unix en secondes (IMPORT_EPOCH_RANGE)"""
+    text = str(value)
+    layout = IMPORT_COMPACT_DATES.get(len(text))
+    # Une date compacte commence par une année et un mois plausibles (un horodatage rarement)
+    if layout and text.isdigit() and '1900' <= text[:4] <= '2100' and '01' <= text[4:6] <= '12':
+        try:
+            return str(datetime.strptime(text, layout))
+        except ValueError:
+            pass  # jour ou heure impossible : lu comme horodatage
+    number = float(value)
+    low, high = IMPORT_EPOCH_RANGE
+    if not low <= number <= high:
+        raise ValueError(f"date illisible : {value}")
+    return str(datetime.fromtimestamp(number))
+
+
+def normalize_import_record(raw):
+    """Ligne de weather_history (city, temperature, humidity, precipitation, risk_level, timestamp)
+    à partir des valeurs brutes dans l'ordre d'IMPORT_FIELDS ; ValueError si la ligne est invalide
+    """
+    if raw is None:
+        raise ValueError("ligne illisible")
+    city, temperature, humidity, precipitation, risk_level, timestamp = raw
+    city = city.strip() if isinstance(city, str) else ''
+    if not city:
+        raise ValueError("zone absente")
+    risk_level = risk_level or "Indéterminé"
+    if risk_level not in RISK_SCORES:
+        raise ValueError(f"niveau de risque inconnu : {risk_level}")
+    return (city, import_number(temperature, 'temperature'), import_number(humidity, 'humidity'),
+            import_number(precipitation, 'precipitation') or 0.0, risk_level, import_timestamp(timestamp))
+
+
+def import_records(path, raw):
+    """Valeurs brutes de chaque enregistrement d'un fichier CSV ou JSON lignes (raw : fichier binaire)
+    
+    CSV : séparateur détecté (virgule, point-virgule, tabulation), colonnes reconnues par leur nom.
+    Une ligne JSON illisible donne None.
+    """
+    io = lazy_import('io')
+    source = lazy_import('gzip').GzipFile(fileobj=raw) if path.endswith('.gz') else raw
+    text = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+    try:
+        yield from import_text_records(path, text)
+    finally:
+        text.detach()  # raw reste ouvert pour l'appelant (position de lecture)
+
+
+def import_columns(names):
+    """Position (ou clé) de chaque champ d'IMPORT_FIELDS parmi des noms de colonnes, None si absent"""
+    folded = {name.strip().casefold(): position for position, name in enumerate(names)}
+    return [next((folded[alias] for alias in aliases if alias in folded), None) for _, aliases in IMPORT_FIELDS]
+
+
+def import_text_records(path, text):
+    """Valeurs brutes des enregistrements d'un fichier texte (voir import_records)"""
+    operator = lazy_import('operator')
+    if path.endswith(('.jsonl', '.jsonl.gz', '.ndjson', '.ndjson.gz')):
+        # Lecture par itemgetter, préparé une fois par jeu de clés ; clé vide pour un champ absent
+        getters = {}
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                keys = tuple(record)
+                record[''] = None
+            except (ValueError, TypeError):
+                yield None
+                continue
+            values = getters.get(keys)
+            if values is None:
+                values = getters[keys] = operator.itemgetter(
+                    *('' if index is None else keys[index] for index in import_columns(keys)))
+            yield values(record)
+        return
+    
+    csv = lazy_import('csv')
+    header = text.readline()
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    columns = next(csv.reader([header], dialect))
+    indexes = import_columns(columns)
+    if indexes[0] is None or indexes[-1] is None:
+        raise ValueError("colonnes de zone et de date introuvables dans l'en-tête")
+    # Colonne absente : lue dans une cellule vide ajoutée en fin de ligne
+    width = len(columns)
+    values = operator.itemgetter(*(width if index is None else index for index in indexes))
+    for row in csv.reader(text, dialect):
+        if len(row) != width:
+            row = (row + [''] * width)[:width]
+        row.append('')
+        yield values(row)
+
+
+def hourly_aggregates(rows):
+    """Agrégats horaires d'un bloc de lignes normalisées
+    
+    [(zone, heure, observations, risque max, somme des humidités, précipitation max)]
+    """
+    hours = {}
+    for city, _, humidity, precipitation, risk_level, timestamp in rows:
+        key = (city, timestamp[:13] + ':00')
+        risk = RISK_SCORES[risk_level]
+        aggregate = hours.get(key)
+        if aggregate is None:
+            hours[key] = [1, risk, humidity or 0.0, precipitation]
+        else:
+            aggregate[0] += 1
+            if risk > aggregate[1]:
+                aggregate[1] = risk
+            aggregate[2] += humidity or 0.0
+            if precipitation > aggregate[3]:
+                aggregate[3] = precipitation
+    return [key + tuple(aggregate) for key, aggregate in hours.items()]
+
+
+def rollup_merge_statements():
+    """Fusion dans les agrégats des agrégats horaires d'un bloc (table temporaire import_hours)
+    
+    Même résultat que rollup_statements appliqué ligne à ligne : l'horaire garde le maximum de
+    précipitation, le journalier cumule les hausses de l'horaire (lu avant sa mise à jour).
+    """
+    daily = """
+        INSERT INTO weather_rollup_daily (city, bucket, samples, max_risk, humidity_sum, precipitation)
+        SELECT n.city, substr(n.bucket, 1, 10), SUM(n.samples), MAX(n.max_risk), SUM(n.humidity_sum),
+               SUM(MAX(0, n.precipitation - COALESCE(h.precipitation, 0)))
+        FROM temp.import_hours AS n
+        LEFT JOIN weather_rollup_hourly AS h ON h.city = n.city AND h.bucket = n.bucket
+        WHERE true
+        GROUP BY n.city, substr(n.bucket, 1, 10)
+        ON CONFLICT(city, bucket) DO UPDATE SET
+            samples = samples + excluded.samples,
+            max_risk = MAX(max_risk, excluded.max_risk),
+            humidity_sum = humidity_sum + excluded.humidity_sum,
+            precipitation = precipitation + excluded.precipitation
+    """
+    hourly = """
+        INSERT INTO weather_rollup_hourly (city, bucket, samples, max_risk, humidity_sum, precipitation)
+        SELECT * FROM temp.import_hours WHERE true
+        ON CONFLICT(city, bucket) DO UPDATE SET
+            samples = samples + excluded.samples,
+            max_risk = MAX(max_risk, excluded.max_risk),
+            humidity_sum = humidity_sum + excluded.humidity_sum,
+            precipitation = MAX(precipitation, excluded.precipitation)
+    """
+    return daily, hourly
+
+
+def merge_rollups(conn, hours):
+    """Fusion d'agrégats horaires (voir hourly_aggregates) dans les agrégats, dans la transaction en cours"""
+    conn.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS import_hours (
+            city TEXT,
+            bucket TEXT,
+            samples INTEGER,
+            max_risk INTEGER,
+            humidity_sum REAL,
+            precipitation REAL,
+            PRIMARY KEY (city, bucket)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("DELETE FROM temp.import_hours")
+    conn.executemany("INSERT INTO temp.import_hours VALUES (?, ?, ?, ?, ?, ?)", hours)
+    for sql in rollup_merge_statements():
+        conn.execute(sql)
+
+
+def import_history(db_path, path, on_progress=None, cancel=None, chunk_rows=IMPORT_CHUNK_ROWS,
+                   defer_indexes=None):
+    """Import en masse d'un fichier CSV ou JSON lignes dans weather_history, avec reprise
+    
+    Chaque transaction insère un bloc de lignes validées (executemany), y fusionne les agrégats
+    et enregistre le point de reprise dans history_imports : un import interrompu reprend au
+    premier bloc non validé. Les index secondaires sont supprimés pendant le chargement si le
+    fichier est gros au regard de la table (defer_indexes=None), puis reconstruits. on_progress
+    (lignes importées, fraction du fichier lue) est appelé après chaque bloc ; cancel
+    (threading.Event) arrête l'import après le bloc en cours.
+    """
+    started = time.perf_counter()
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS history_imports (
+            source TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            records INTEGER,
+            imported INTEGER,
+            rejected INTEGER,
+            finished DATETIME
+        )
+    """)
+    
+    # Point de reprise, valable si le fichier n'a pas changé depuis
+    checkpoint = conn.execute("SELECT size, mtime, records, imported, rejected, finished FROM history_imports "
+                              "WHERE source = ?", (path,)).fetchone()
+    if checkpoint and checkpoint[:2] == (stat.st_size, stat.st_mtime):
+        records, imported, rejected, finished = checkpoint[2:]
+    else:
+        records, imported, rejected, finished = 0, 0, 0, None
+    imported_before = imported
+    report = {'source': path, 'reprise_a': records, 'deja_importe': finished is not None, 'erreurs': []}
+    
+    # Index différés : reconstruire coûte moins que maintenir si le fichier ajoute autant de lignes que la table
+    # en contient (environ 60 octets par ligne)
+    if defer_indexes is None:
+        existing = conn.execute("SELECT MAX(id) FROM weather_history").fetchone()[0] or 0
+        defer_indexes = finished is None and stat.st_size / 60 >= existing
+    report['index_differes'] = defer_indexes
+    
+    insert = """
+        INSERT INTO weather_history (city, temperature, humidity, precipitation, risk_level, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    save_checkpoint = """
+        INSERT OR REPLACE INTO history_imports (source, size, mtime, records, imported, rejected, finished)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+    try:
+        if finished is None:
+            if defer_indexes:
+                for name in HISTORY_INDEXES:
+                    conn.execute(f"DROP INDEX IF EXISTS {name}")
+            with open(path, 'rb') as raw, closing(import_records(path, raw)) as source, \
+                    METRICS.timer('suruwa_import_seconds'):
+                for _ in range(records):  # lignes déjà validées lors d'un import précédent
+                    next(source, None)
+                chunk = []
+                exhausted = False
+                while not exhausted:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    chunk.clear()
+                    consumed = 0
+                    for raw_values in source:
+                        consumed += 1
+                        try:
+                            chunk.append(normalize_import_record(raw_values))
+                        except (ValueError, TypeError, AttributeError) as e:
+                            rejected += 1
+                            if len(report['erreurs']) < IMPORT_MAX_ERRORS:
+                                report['erreurs'].append(f"enregistrement {records + consumed} : {e}")
+                        if len(chunk) == chunk_rows:
+                            break
+                    else:
+                        exhausted = True
+                    
+                    # Bloc, agrégats et point de reprise dans la même transaction
+                    records += consumed
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        if chunk:
+                            conn.executemany(insert, chunk)
+                            merge_rollups(conn, hourly_aggregates(chunk))
+                            imported += len(chunk)
+                        conn.execute(save_checkpoint, (path, stat.st_size, stat.st_mtime, records, imported,
+                                                       rejected, datetime.now() if exhausted else None))
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                    METRICS.inc('suruwa_import_rows_total', len(chunk), result='importee')
+                    METRICS.inc('suruwa_import_rows_total', consumed - len(chunk), result='rejetee')
+                    if on_progress:
+                        on_progress(imported, raw.tell() / max(stat.st_size, 1))
+                finished = exhausted or None
+    finally:
+        # Index reconstruits même après une interruption (sinon recréés au prochain démarrage)
+        for sql in HISTORY_INDEXES.values():
+            conn.execute(sql)
+        conn.close()
+    
+    elapsed = time.perf_counter() - started
+    report.update({'termine': finished is not None, 'enregistrements': records, 'lignes_importees': imported,
+                   'lignes_rejetees': rejected, 'duree_s': round(elapsed, 2),
+                   'lignes_par_s': round((imported - imported_before) / elapsed)})
+    return report
+
+
+def database_pages(conn):
+    """Pages de la base : (total, libres, taille d'une page)"""
+    return tuple(conn.execute(f"PRAGMA {name}").fetchone()[0] for name in ('page_count', 'freelist_count',
+                                                                           'page_size'))
+
+
+def verify_day_rollups(conn, day, end):
+    """Agrégats d'un jour recalculés depuis l'historique brut pour les zones qui en ont plus d'observations
+    (historique antérieur aux agrégats ou importé sans eux) ; nombre de zones recalculées
+    """
+    counts = conn.execute("SELECT city, COUNT(*) FROM weather_history WHERE timestamp >= ? AND timestamp < ? "
+                          "GROUP BY city", (day, end)).fetchall()
+    samples = dict(conn.execute("SELECT city, samples FROM weather_rollup_daily WHERE bucket = ?", (day,)))
+    rebuilt = 0
+    for city, count in counts:
+        if samples.get(city, 0) >= count:
+            continue
+        rows = [(city, temperature, humidity, precipitation or 0.0,
+                 risk_level if risk_level in RISK_SCORES else "Indéterminé", str(timestamp))
+                for temperature, humidity, precipitation, risk_level, timestamp in conn.execute(
+                    "SELECT temperature, humidity, precipitation, risk_level, timestamp FROM weather_history "
+                    "WHERE city IS ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp", (city, day, end))]
+        conn.execute("DELETE FROM weather_rollup_hourly WHERE city IS ? AND bucket >= ? AND bucket < ?",
+                     (city, day, end))
+        conn.execute("DELETE FROM weather_rollup_daily WHERE city IS ? AND bucket = ?", (city, day))
+        merge_rollups(conn, hourly_aggregates(rows))
+        rebuilt += 1
+    return rebuilt
+
+
+def maintain_history(db_path, raw_days=None, hourly_days=None, cancel=None, batch_rows=None, pause=None,
+                     convert=False):
+    """Rétention de l'historique et compactage de la base
+    
+    Les observations brutes de plus de raw_days jours (jours entiers) sont supprimées, jour par jour
+    et par petites transactions, après vérification de leurs agrégats horaires et journaliers ; les
+    agrégats horaires de plus de hourly_days jours le sont zone par zone et par lots, les journaliers
+    restent. L'espace libéré est rendu au système par vacuum incrémental ; une base créée sans
+    auto_vacuum n'est convertie (VACUUM complet, accès exclusif) qu'avec convert, réservé au mode
+    --maintenance : jamais sur une base en service.
+    cancel (threading.Event) arrête la maintenance entre deux transactions.
+    """
+    raw_days = RETENTION_RAW_DAYS if raw_days is None else raw_days
+    hourly_days = RETENTION_HOURLY_DAYS if hourly_days is None else hourly_days
+    batch_rows = batch_rows or RETENTION_BATCH_ROWS
+    pause = RETENTION_PAUSE if pause is None else pause
+    stopped = lambda: cancel is not None and cancel.is_set()
+    if raw_days and hourly_days:
+        hourly_days = max(hourly_days, raw_days)  # pas d'agrégat horaire supprimé avant ses observations
+    
+    started = time.perf_counter()
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    pages, free_pages, page_size = database_pages(conn)
+    report = {'observations_supprimees': 0, 'jours_purges': 0, 'agregats_recalcules': 0,
+              'agregats_horaires_supprimes': 0, 'vacuum': None, 'espace_libere_octets': 0}
+        
+    def write(sql, params=()):
+        # Transactions courtes : le thread d'écriture n'attend jamais plus d'un lot
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            count = conn.execute(sql, params).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if pause:
+            time.sleep(pause)
+        return count
+    
+    try:
+        with METRICS.timer('suruwa_maintenance_seconds'):
+            # Observations brutes expirées, du jour le plus ancien au plus récent
+            if raw_days:
+                cutoff = (datetime.now() - timedelta(days=raw_days)).strftime('%Y-%m-%d')
+                while not stopped():
+                    first = conn.execute("SELECT MIN(timestamp) FROM weather_history").fetchone()[0]
+                    if first is None or str(first)[:10] >= cutoff:
+                        break
+                    day = str(first)[:10]
+                    end = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+                    
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        report['agregats_recalcules'] += verify_day_rollups(conn, day, end)
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                    
+                    while not stopped():
+                        deleted = write("""
+                            DELETE FROM weather_history WHERE id IN (
+                                SELECT id FROM weather_history WHERE timestamp >= ? AND timestamp < ? LIMIT ?)
+                        """, (day, end, batch_rows))
+                        report['observations_supprimees'] += deleted
+                        METRICS.inc('suruwa_retention_rows_deleted_total', deleted, table='weather_history')
+                        if deleted < batch_rows:
+                            report['jours_purges'] += 1
+                            break
+            
+            # Agrégats horaires expirés, zone par zone et par lots (clé primaire zone, heure)
+            if hourly_days and not stopped():
+                cutoff = (datetime.now() - timedelta(days=hourly_days)).strftime('%Y-%m-%d')
+                city = conn.execute("SELECT MIN(city) FROM weather_rollup_hourly").fetchone()[0]
+                while city is not None and not stopped():
+                    deleted = write("""
+                        DELETE FROM weather_rollup_hourly WHERE city = ? AND bucket IN (
+                            SELECT bucket FROM weather_rollup_hourly WHERE city = ? AND bucket < ?
+                            ORDER BY bucket LIMIT ?)
+                    """, (city, city, cutoff, batch_rows))
+                    report['agregats_horaires_supprimes'] += deleted
+                    METRICS.inc('suruwa_retention_rows_deleted_total', deleted, table='weather_rollup_hourly')
+                    if deleted == batch_rows:
+                        continue  # reste de la zone au lot suivant
+                    city = conn.execute("SELECT MIN(city) FROM weather_rollup_hourly WHERE city > ?",
+                                        (city,)).fetchone()[0]
+            
+            # Compactage : vacuum incrémental par petits pas, conversion unique des anciennes bases
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            if auto_vacuum == 0 and not stopped():
+                if convert:
+                    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    conn.execute("VACUUM")
+                    report['vacuum'] = 'conversion'
+                else:
+                    report['vacuum'] = 'conversion requise (suruwasoft.py --maintenance, application arrêtée)'
+            elif auto_vacuum == 2:
+                report['vacuum'] = 'incremental'
+                while not stopped() and conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                    # executescript exécute le pragma jusqu'au bout (execute n'en fait qu'un pas : une page)
+                    conn.executescript(f"PRAGMA incremental_vacuum({RETENTION_VACUUM_PAGES})")
+                    if pause:
+                        time.sleep(pause)
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    finally:
+        pages_after, free_after, _ = database_pages(conn)
+        conn.close()
+    
+    reclaimed = (pages - pages_after) * page_size
+    METRICS.inc('suruwa_db_reclaimed_bytes_total', max(reclaimed, 0))
+    report.update({'espace_libere_octets': reclaimed, 'taille_octets': pages_after * page_size,
+                   'pages_libres': free_after, 'interrompu': stopped(),
+                   'duree_s': round(time.perf_counter() - started, 2)})
+    return report
+
+
+def maintenance_summary(report):
+    """Résumé d'un rapport de maintenance sur une ligne"""
+    summary = (f"{report['observations_supprimees']} observations et {report['agregats_horaires_supprimes']} "
+               f"agrégats horaires expirés supprimés, {report['espace_libere_octets'] / 1e6:.1f} Mo libérés")
+    if report['vacuum'] and report['vacuum'] != 'incremental':
+        summary += f" (vacuum : {report['vacuum']})"
+    return summary
+
+
+# Répertoire géographique hors ligne (dump GeoNames, ex. cities15000.txt ou allCountries.txt)
+GAZETTEER_PATH = os.path.join(os.path.dirname(DB_PATH), 'gazetteer_africa.txt')
+
+# Codes pays ISO des États et territoires africains
+AFRICA_COUNTRIES = {
+    'DZ', 'AO', 'BJ', 'BW', 'BF', 'BI', 'CV', 'CM', 'CF', 'TD', 'KM', 'CG', 'CD', 'CI',
+    'DJ', 'EG', 'GQ', 'ER', 'SZ', 'ET', 'GA', 'GM', 'GH', 'GN', 'GW', 'KE', 'LS', 'LR',
+    'LY', 'MG', 'MW', 'ML', 'MR', 'MU', 'MA', 'MZ', 'NA', 'NE', 'NG', 'RW', 'ST', 'SN',
+    'SC', 'SL', 'SO', 'ZA', 'SS', 'SD', 'TZ', 'TG', 'TN', 'UG', 'ZM', 'ZW', 'EH', 'RE',
+    'YT', 'SH',
+}
+
+# Villes principales disponibles sans fichier GeoNames (nom, pays, lat, lon, population)
+DEFAULT_PLACES = [
+    ("Lomé", 'TG', 6.1319, 1.2228, 837437), ("Kara", 'TG', 9.5511, 1.1861, 94878),
+    ("Sokodé", 'TG', 8.9833, 1.1333, 117811), ("Accra", 'GH', 5.5560, -0.1969, 1963264),
+    ("Kumasi", 'GH', 6.6885, -1.6244, 1468609), ("Cotonou", 'BJ', 6.3654, 2.4183, 780000),
+    ("Porto-Novo", 'BJ', 6.4969, 2.6036, 234168), ("Lagos", 'NG', 6.4541, 3.3947, 9000000),
+    ("Abuja", 'NG', 9.0579, 7.4951, 590400), ("Kano", 'NG', 12.0001, 8.5167, 3626068),
+    ("Ibadan", 'NG', 7.3878, 3.8964, 3565108), ("Abidjan", 'CI', 5.3453, -4.0268, 3677115),
+    ("Yamoussoukro", 'CI', 6.8206, -5.2767, 194530), ("Ouagadougou", 'BF', 12.3657, -1.5339, 1086505),
+    ("Niamey", 'NE', 13.5137, 2.1098, 774235), ("Bamako", 'ML', 12.6500, -8.0000, 1297281),
+    ("Dakar", 'SN', 14.6937, -17.4441, 2476400), ("Saint-Louis", 'SN', 16.0179, -16.4896, 176000),
+    ("Conakry", 'GN', 9.5380, -13.6773, 1767200), ("Freetown", 'SL', 8.4871, -13.2356, 802639),
+    ("Monrovia", 'LR', 6.3005, -10.7969, 939524), ("Nouakchott", 'MR', 18.0858, -15.9785, 661400),
+    ("Banjul", 'GM', 13.4527, -16.5780, 34589), ("Bissau", 'GW', 11.8636, -15.5977, 388028),
+    ("Douala", 'CM', 4.0483, 9.7043, 1338082), ("Yaoundé", 'CM', 3.8667, 11.5167, 1299369),
+    ("Libreville", 'GA', 0.3925, 9.4537, 578156), ("Brazzaville", 'CG', -4.2658, 15.2832, 1284609),
+    ("Kinshasa", 'CD', -4.3276, 15.3136, 7785965), ("Bangui", 'CF', 4.3612, 18.5550, 542393),
+    ("N'Djamena", 'TD', 12.1067, 15.0444, 721081), ("Luanda", 'AO', -8.8368, 13.2343, 2776168),
+    ("Nairobi", 'KE', -1.2833, 36.8167, 2750547), ("Mombasa", 'KE', -4.0547, 39.6636, 799668),
+    ("Kampala", 'UG', 0.3163, 32.5822, 1353189), ("Dar es Salaam", 'TZ', -6.8235, 39.2695, 2698652),
+    ("Kigali", 'RW', -1.9499, 30.0588, 745261), ("Addis Ababa", 'ET', 9.0250, 38.7469, 2757729),
+    ("Khartoum", 'SD', 15.5518, 32.5324, 1974647), ("Juba", 'SS', 4.8594, 31.5713, 300000),
+    ("Mogadishu", 'SO', 2.0371, 45.3438, 2587183), ("Cairo", 'EG', 30.0626, 31.2497, 7734614),
+    ("Alexandria", 'EG', 31.2018, 29.9158, 3811516), ("Tunis", 'TN', 36.8190, 10.1658, 693210),
+    ("Algiers", 'DZ', 36.7525, 3.0420, 1977663), ("Rabat", 'MA', 34.0133, -6.8326, 1655753),
+    ("Casablanca", 'MA', 33.5883, -7.6114, 3144909), ("Tripoli", 'LY', 32.8872, 13.1913, 1150989),
+    ("Maputo", 'MZ', -25.9653, 32.5892, 1191613), ("Beira", 'MZ', -19.8436, 34.8389, 530604),
+    ("Harare", 'ZW', -17.8277, 31.0534, 1542813), ("Lusaka", 'ZM', -15.4134, 28.2771, 1267440),
+    ("Lilongwe", 'MW', -13.9669, 33.7873, 646750), ("Johannesburg", 'ZA', -26.2023, 28.0436, 2026469),
+    ("Durban", 'ZA', -29.8579, 31.0292, 3120282), ("Cape Town", 'ZA', -33.9258, 18.4232, 3433441),
+    ("Antananarivo", 'MG', -18.9137, 47.5361, 1391433), ("Gaborone", 'BW', -24.6545, 25.9086, 208411),
+    ("Windhoek", 'NA', -22.5594, 17.0832, 268132),
+]
+
+
+def normalize_place_name(name):
+    """Forme de recherche d'un nom : sans accents, minuscules, séparateurs simplifiés"""
+    decomposed = unicodedata.normalize('NFKD', name)
+    ascii_name = ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+    return ' '.join(''.join(c if c.isalnum() else ' ' for c in ascii_name).split())
+
+
+class Gazetteer:
+    """Répertoire de localités hors ligne avec index de préfixes pour l'autocomplétion"""
+    def __init__(self, places=DEFAULT_PLACES, top_size=8, scan_limit=128):
+        self.top_size = top_size
+        self.scan_limit = scan_limit  # taille maximale d'une plage parcourue à la volée
+        self._build(places)
+        
+    @classmethod
+    def from_geonames(cls, path, countries=AFRICA_COUNTRIES, min_population=0):
+        """Chargement en flux d'un dump GeoNames (lieux habités des pays retenus)"""
+        def read_places():
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    # 6: classe d'objet, 8: code pays, 14: population
+                    if len(fields) < 15 or fields[6] != 'P' or fields[8] not in countries:
+                        continue
+                    population = int(fields[14] or 0)
+                    if population < min_population:
+                        continue
+                    yield fields[1], fields[8], float(fields[4]), float(fields[5]), population
+        return cls(read_places())
+        
+    def _build(self, places):
+        """Construction de l'index : clés triées + tableaux compacts par localité"""
+        self.names = []
+        self.countries = []
+        self.lat = array('d')
+        self.lon = array('d')
+        self.population = array('q')
+        
+        entries = []
+        for name, country, lat, lon, population in places:
+            entries.append((normalize_place_name(name), len(self.names)))
+            self.names.append(name)
+            self.countries.append(country)
+            self.lat.append(lat)
+            self.lon.append(lon)
+            self.population.append(population)
+        
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.place_ids = array('i', (place for _, place in entries))
+        
+        # Préfixes couvrant beaucoup de localités : meilleures localités précalculées
+        self.prefix_tops = {}
+        self._index_prefixes(0, len(self.keys), 1)
+        
+    def _index_prefixes(self, start, end, depth):
+        """Précalcul des préfixes de longueur depth trop fréquents pour un parcours direct"""
+        i = start
+        while i < end:
+            key = self.keys[i]
+            if len(key) < depth:
+                i += 1
+                continue
+            prefix = key[:depth]
+            j = bisect.bisect_right(self.keys, prefix + '\uffff', i, end)
+            if j - i > self.scan_limit:
+                self.prefix_tops[prefix] = heapq.nlargest(self.top_size, self.place_ids[i:j],
+                                                          key=self.population.__getitem__)
+                self._index_prefixes(i, j, depth + 1)
+            i = j
+            
+    def __len__(self):
+        return len(self.names)
+        
+    def label(self, place):
+        """Libellé affiché d'une localité"""
+        return f"{self.names[place]}, {self.countries[place]}"
+        
+    def complete(self, text, limit=8):
+        """Localités dont le nom commence par text, les plus peuplées d'abord"""
+        prefix = normalize_place_name(text)
+        if not prefix:
+            return []
+        
+        if prefix in self.prefix_tops and limit <= self.top_size:
+            places = self.prefix_tops[prefix][:limit]
+        else:
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_right(self.keys, prefix + '\uffff', start)
+            places = heapq.nlargest(limit, self.place_ids[start:end], key=self.population.__getitem__)
+        return [self.label(place) for place in places]
+        
+    def resolve(self, text):
+        """Résolution d'un nom (éventuellement « Ville, CC ») en (libellé, lat, lon)"""
+        name, _, country = text.partition(',')
+        key = normalize_place_name(name)
+        country = country.strip().upper()
+        
+        start = bisect.bisect_left(self.keys, key)
+        end = bisect.bisect_right(self.keys, key, start)
+        candidates = [p for p in self.place_ids[start:end] if not country or self.countries[p] == country]
+        if not candidates:
+            return None
+        
+        place = max(candidates, key=self.population.__getitem__)
+        return self.label(place), self.lat[place], self.lon[place]
+
+
+# Refuges et points d'évacuation (GeoJSON ou CSV) et index spatial persistant
+SHELTERS_PATHS = [os.path.join(os.path.dirname(DB_PATH), name)
+                  for name in ('shelters.geojson', 'shelters.csv')]
+SHELTER_INDEX_PATH = os.path.join(os.path.dirname(DB_PATH), 'suruwa_shelters.npz')
+SHELTER_CELL_DEG = 0.1
+EARTH_RADIUS_KM = 6371.0088
+
+
+def read_shelters(path):
+    """Lecture d'un fichier de refuges : [(nom, lat, lon), ...]"""
+    shelters = []
+    if path.endswith('.csv'):
+        csv = lazy_import('csv')
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                row = {key.strip().lower(): value for key, value in row.items() if key}
+                lat = row.get('lat') or row.get('latitude')
+                lon = row.get('lon') or row.get('lng') or row.get('longitude')
+                if lat and lon:
+                    shelters.append((row.get('name') or row.get('nom') or "Refuge", float(lat), float(lon)))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            collection = json.load(f)
+        for feature in collection.get('features', []):
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                continue
+            properties = feature.get('properties') or {}
+            lon, lat = geometry['coordinates'][:2]
+            shelters.append((properties.get('name') or properties.get('nom') or "Refuge", float(lat), float(lon)))
+    return shelters
+
+
+class ShelterIndex:
+    """Index en grille régulière des refuges ; k plus proches par distance orthodromique"""
+    def __init__(self, names, lat, lon, cell_deg=SHELTER_CELL_DEG, source_stamp=None, max_rings=16, layout=None):
+        """layout : (cellules, vecteurs, clés, débuts) de points déjà triés (index sauvegardé), sinon calculé"""
+        np = lazy_import('numpy')
+        self.cell_deg = cell_deg
+        self.max_rings = max_rings  # au-delà, parcours complet plutôt que des anneaux toujours plus grands
+        self.source_stamp = source_stamp
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        names = np.asarray(names, dtype=str)
+        
+        if layout is None:
+            # Points triés par cellule : chaque cellule est une plage contiguë
+            cells = self._cells(lat, lon)
+            order = np.argsort(cells, kind='stable')
+            lat, lon, names, cells = lat[order], lon[order], names[order], cells[order]
+            keys, starts = np.unique(cells, return_index=True)
+            layout = (cells, self._unit_vectors(lat, lon), keys, starts)
+        self.lat, self.lon, self.names = lat, lon, names
+        self.cells, self.xyz, self.keys, self.starts = layout
+        ends = np.append(self.starts[1:], len(self.cells))
+        self.ranges = dict(zip(self.keys.tolist(), zip(self.starts.tolist(), ends.tolist())))
+        
+    @classmethod
+    def from_points(cls, shelters, **kwargs):
+        """Construction depuis [(nom, lat, lon), ...]"""
+        return cls([s[0] for s in shelters], [s[1] for s in shelters], [s[2] for s in shelters], **kwargs)
+        
+    @classmethod
+    def load(cls, sources=SHELTERS_PATHS, index_path=SHELTER_INDEX_PATH):
+        """Index persistant, reconstruit seulement si le fichier source a changé ; None sans source"""
+        source = next((path for path in sources if os.path.exists(path)), None)
+        if source is None:
+            return None
+        info = os.stat(source)
+        stamp = f"{os.path.abspath(source)}:{info.st_size}:{info.st_mtime_ns}"
+        
+        np = lazy_import('numpy')
+        if os.path.exists(index_path):
+            with np.load(index_path) as data:
+                # Index trié relu tel quel (les anciens fichiers sans plages de cellules sont reconstruits)
+                if (str(data['stamp']) == stamp and float(data['cell_deg']) == SHELTER_CELL_DEG
+                        and 'starts' in data.files):
+                    return cls(data['names'], data['lat'], data['lon'], source_stamp=stamp,
+                               layout=(data['cells'], data['xyz'], data['keys'], data['starts']))
+        
+        index = cls.from_points(read_shelters(source), source_stamp=stamp)
+        index.save(index_path)
+        return index
+        
+    def save(self, path=SHELTER_INDEX_PATH):
+        """Sauvegarde atomique de l'index"""
+        np = lazy_import('numpy')
+        tmp_path = f"{path}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, names=self.names, lat=self.lat, lon=self.lon, cells=self.cells, xyz=self.xyz,
+                 keys=self.keys, starts=self.starts,
+                 stamp=np.array(self.source_stamp or ''), cell_deg=np.array(self.cell_deg))
+        os.replace(tmp_path, path)
+        
+    def __len__(self):
+        return len(self.lat)
+        
+    def _cells(self, lat, lon):
+        """Identifiant de cellule (ligne, colonne) encodé en entier"""
+        np = lazy_import('numpy')
+        rows = np.floor((lat + 90.0) / self.cell_deg).astype(np.int64)
+        cols = np.floor((lon + 180.0) / self.cell_deg).astype(np.int64)
+        return rows * 100000 + cols
+        
+    def _ring(self, row, col, radius):
+        """Plages de points des cellules situées à exactement radius cellules"""
+        ranges = self.ranges
+        found = []
+        for r in range(row - radius, row + radius + 1):
+            step = 1 if abs(r - row) == radius else 2 * radius
+            for c in range(col - radius, col + radius + 1, max(step, 1)):
+                span = ranges.get(r * 100000 + c)
+                if span:
+                    found.append(span)
+        return found
+        
+    @staticmethod
+    def _unit_vectors(lat, lon):
+        """Vecteurs unitaires 3D : le produit scalaire ordonne les distances orthodromiques"""
+        np = lazy_import('numpy')
+        lat, lon = np.radians(lat), np.radians(lon)
+        return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+        
+    def _bound(self, lat, radius):
+        """Distance minimale (km) d'un point hors des anneaux 0..radius"""
+        gap = radius * self.cell_deg
+        if gap >= 90:
+            return math.inf
+        # Écart en latitude, ou en longitude ramené à la latitude la plus défavorable
+        max_lat = min(abs(lat) + gap, 89.999)
+        lon_gap = math.asin(math.cos(math.radians(max_lat)) * math.sin(math.radians(min(gap, 90))))
+        return EARTH_RADIUS_KM * min(math.radians(gap), lon_gap)
+        
+    def nearest(self, lat, lon, k=3):
+        """k refuges les plus proches : [(nom, lat, lon, distance_km), ...] par distance croissante"""
+        np = lazy_import('numpy')
+        k = min(k, len(self))
+        if k <= 0:
+            return []
+        row = int(math.floor((lat + 90.0) / self.cell_deg))
+        col = int(math.floor((lon + 180.0) / self.cell_deg))
+        
+        # Anneaux de cellules de plus en plus larges jusqu'à ce que le k-ième soit certain
+        query = self._unit_vectors(lat, lon)
+        bounds = []
+        count = 0
+        radius = 0
+        while True:
+            for start, end in self._ring(row, col, radius):
+                bounds.append((start, end))
+                count += end - start
+            if count >= k:
+                idx = np.concatenate([np.arange(start, end) for start, end in bounds])
+                similarity = self.xyz[idx] @ query
+                kth = np.partition(similarity, len(idx) - k)[len(idx) - k]
+                if math.acos(min(kth, 1.0)) * EARTH_RADIUS_KM <= self._bound(lat, radius):
+                    break
+            radius += 1
+            if radius > self.max_rings:
+                # Zone très peu dense : calcul direct sur tous les refuges
+                idx = np.arange(len(self))
+                similarity = self.xyz @ query
+                break
+        
+        best = np.argpartition(-similarity, k - 1)[:k]
+        best = best[np.argsort(-similarity[best], kind='stable')]
+        result = []
+        for i in best:
+            place = idx[i]
+            result.append((str(self.names[place]), float(self.lat[place]), float(self.lon[place]),
+                           haversine_km(lat, lon, self.lat[place], self.lon[place])))
+        return result
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance orthodromique (km) entre deux points"""
+    lat1, lat2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+# Zones inondables cartographiées (GeoJSON de polygones) et index persistant
+FLOOD_ZONES_PATH = os.path.join(os.path.dirname(DB_PATH), 'flood_zones.geojson')
+FLOOD_ZONES_INDEX_PATH = os.path.join(os.path.dirname(DB_PATH), 'suruwa_flood_zones.npz')
+
+# Niveaux de détail des zones inondables sur les cartes : (zoom min, zoom max, rayon en degrés autour du lieu) ;
+# plus le zoom est fort, plus la géométrie est fine et l'emprise réduite
+FLOOD_ZONE_BANDS = ((0, 9, 1.0), (10, 12, 0.5), (13, 15, 0.25), (16, 19, 0.1))
+
+
+def simplify_ring(points, tolerance):
+    """Simplification de Douglas-Peucker d'un anneau (tableau (n, 2)), extrémités conservées"""
+    np = lazy_import('numpy')
+    if len(points) <= 4 or tolerance <= 0:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        segment = end - start
+        inner = points[first + 1:last] - start
+        length = math.hypot(segment[0], segment[1])
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            stack.append((first, middle))
+            stack.append((middle, last))
+    simplified = points[keep]
+    # Un anneau fermé a besoin d'au moins quatre sommets
+    return simplified if len(simplified) >= 4 else points[[0, len(points) // 3, 2 * len(points) // 3, -1]]
+
+
+def iter_geojson_features(path, chunk_size=1 << 20):
+    """Entités du tableau « features » d'un GeoJSON, décodées une à une sans charger tout le document"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer = ''
+        position = -1
+        while position < 0:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return  # pas de FeatureCollection
+            tail = max(len(buffer) - len('"features"'), 0)
+            buffer = buffer[tail:] + chunk
+            position = buffer.find('"features"')
+        position += len('"features"')
+        
+        expected = ':['
+        while True:
+            if position >= len(buffer):
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    raise ValueError(f"GeoJSON tronqué : {path}")
+                buffer = buffer[position:] + chunk
+                position = 0
+            char = buffer[position]
+            if char.isspace() or (char == ',' and not expected):
+                position += 1
+            elif expected:
+                if char != expected[0]:
+                    raise ValueError(f"tableau « features » attendu : {path}")
+                expected = expected[1:]
+                position += 1
+            elif char == ']':
+                return
+            else:
+                try:
+                    feature, position = decoder.raw_decode(buffer, position)
+                except ValueError:
+                    # Entité coupée par la fin du bloc : lecture du bloc suivant
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        raise
+                    buffer = buffer[position:] + chunk
+                    position = 0
+                    continue
+                yield feature
+                if position > chunk_size:
+                    buffer = buffer[position:]
+                    position = 0
+
+
+class FloodZoneIndex:
+    """Polygones de zones inondables en tableaux contigus, filtrés par emprise puis testés par parité"""
+    def __init__(self, names, coords, ring_offsets, feature_rings, source_stamp=None):
+        np = lazy_import('numpy')
+        self.source_stamp = source_stamp
+        self.names = np.asarray(names, dtype=str)
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)  # (lon, lat) de tous les anneaux
+        self.ring_offsets = np.asarray(ring_offsets, dtype=np.int64)  # anneau r : coords[o[r]:o[r + 1]]
+        self.feature_rings = np.asarray(feature_rings, dtype=np.int64)  # zone f : anneaux fr[f]:fr[f + 1]
+        
+        # Arête i -> i + 1 valide seulement à l'intérieur d'un même anneau
+        self.edge_ok = np.ones(len(self.coords), dtype=bool)
+        self.edge_ok[self.ring_offsets[1:] - 1] = False
+        
+        # Emprises (min lon, min lat, max lon, max lat) par zone
+        self.bbox = np.empty((len(self.names), 4))
+        if len(self.names):
+            starts = self.ring_offsets[self.feature_rings[:-1]]
+            self.bbox[:, :2] = np.minimum.reduceat(self.coords, starts, axis=0)
+            self.bbox[:, 2:] = np.maximum.reduceat(self.coords, starts, axis=0)
+        
+    @classmethod
+    def from_geojson(cls, path, source_stamp=None):
+        """Lecture en flux d'un GeoJSON de Polygon / MultiPolygon (sommets en tableau de doubles)"""
+        names, coords, ring_offsets, feature_rings = [], array('d'), [0], [0]
+        for number, feature in enumerate(iter_geojson_features(path), 1):
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+            for polygon in polygons:
+                for ring in polygon:
+                    if len(ring) < 4:
+                        continue
+                    for point in ring:
+                        coords.extend(point[:2])
+                    ring_offsets.append(len(coords) // 2)
+            if len(ring_offsets) - 1 == feature_rings[-1]:
+                continue  # aucun anneau exploitable
+            properties = feature.get('properties') or {}
+            names.append(properties.get('name') or properties.get('nom') or f"Zone inondable #{number}")
+            feature_rings.append(len(ring_offsets) - 1)
+        return cls(names, coords, ring_offsets, feature_rings, source_stamp=source_stamp)
+        
+    @classmethod
+    def load(cls, source=FLOOD_ZONES_PATH, index_path=FLOOD_ZONES_INDEX_PATH):
+        """Index persistant, reconstruit seulement si le GeoJSON a changé ; None sans source"""
+        if not os.path.exists(source):
+            return None
+        info = os.stat(source)
+        stamp = f"{os.path.abspath(source)}:{info.st_size}:{info.st_mtime_ns}"
+        
+        np = lazy_import('numpy')
+        if os.path.exists(index_path):
+            with np.load(index_path) as data:
+                if str(data['stamp']) == stamp:
+                    return cls(data['names'], data['coords'], data['ring_offsets'], data['feature_rings'],
+                               source_stamp=stamp)
+        
+        index = cls.from_geojson(source, source_stamp=stamp)
+        index.save(index_path)
+        return index
+        
+    def save(self, path=FLOOD_ZONES_INDEX_PATH):
+        """Sauvegarde atomique de l'index"""
+        np = lazy_import('numpy')
+        tmp_path = f"{path}.{threading.get_ident()}.tmp.npz"
+        np.savez(tmp_path, names=self.names, coords=self.coords, ring_offsets=self.ring_offsets,
+                 feature_rings=self.feature_rings, stamp=np.array(self.source_stamp or ''))
+        os.replace(tmp_path, path)
+        
+    def __len__(self):
+        return len(self.names)
+        
+    def _vertex_span(self, feature):
+        """Tranche des sommets d'une zone"""
+        return slice(self.ring_offsets[self.feature_rings[feature]],
+                     self.ring_offsets[self.feature_rings[feature + 1]])
+        
+    def candidates(self, south, west, north, east):
+        """Zones dont l'emprise recoupe une emprise donnée"""
+        np = lazy_import('numpy')
+        return np.flatnonzero((self.bbox[:, 0] <= east) & (self.bbox[:, 2] >= west)
+                              & (self.bbox[:, 1] <= north) & (self.bbox[:, 3] >= south))
+        
+    def contains(self, lats, lons, chunk=1 << 20):
+        """Pour N points : liste des zones contenant chaque point (règle pair-impair, trous compris)"""
+        np = lazy_import('numpy')
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        result = [[] for _ in range(len(lats))]
+        if not len(self) or not len(lats):
+            return result
+        
+        for f in self.candidates(lats.min(), lons.min(), lats.max(), lons.max()):
+            west, south, east, north = self.bbox[f]
+            inside_bbox = np.flatnonzero((lons >= west) & (lons <= east) & (lats >= south) & (lats <= north))
+            if not len(inside_bbox):
+                continue
+            span = self._vertex_span(f)
+            points = self.coords[span]
+            valid = self.edge_ok[span][:-1]
+            ax, ay = points[:-1][valid].T
+            bx, by = points[1:][valid].T
+            
+            # Lancer de rayon vectorisé, par blocs (points x arêtes) de taille bornée
+            step = max(1, chunk // max(len(ax), 1))
+            for block in range(0, len(inside_bbox), step):
+                sel = inside_bbox[block:block + step]
+                px = lons[sel, None]
+                py = lats[sel, None]
+                straddles = (ay > py) != (by > py)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    crossing_x = (bx - ax) * (py - ay) / (by - ay) + ax
+                crossings = np.count_nonzero(straddles & (px < crossing_x), axis=1)
+                for point in sel[crossings % 2 == 1]:
+                    result[point].append(int(f))
+        return result
+        
+    def flags(self, lats, lons):
+        """Appartenance de chaque point à au moins une zone inondable"""
+        return [bool(zones) for zones in self.contains(lats, lons)]
+        
+    def geojson_bands(self, lat, lon, bands=FLOOD_ZONE_BANDS):
+        """Zones autour d'un point par bande de zoom : [(zoom min, zoom max, entités)], chaque bande
+        simplifiée au plus fort zoom qu'elle couvre et limitée à son rayon (degrés)
+        """
+        return [(min_zoom, max_zoom,
+                 self.geojson_features(lat - radius, lon - radius, lat + radius, lon + radius, max_zoom))
+                for min_zoom, max_zoom, radius in bands]
+        
+    def geojson_features(self, south, west, north, east, zoom):
+        """Zones d'une emprise, simplifiées à la résolution d'un niveau de zoom"""
+        np = lazy_import('numpy')
+        # Un demi-pixel à ce zoom, en degrés
+        tolerance = 360.0 / (256 * 2 ** zoom) / 2
+        features = []
+        for f in self.candidates(south, west, north, east):
+            west_f, south_f, east_f, north_f = self.bbox[f]
+            if max(east_f - west_f, north_f - south_f) < tolerance:
+                continue  # plus petite qu'un pixel
+            rings = []
+            for r in range(self.feature_rings[f], self.feature_rings[f + 1]):
+                ring = simplify_ring(self.coords[self.ring_offsets[r]:self.ring_offsets[r + 1]], tolerance)
+                rings.append(np.round(ring, 6).tolist())
+            name = str(self.names[f])
+            # Tous les anneaux dans un seul polygone : Leaflet remplit en pair-impair, comme le test
+            features.append({'type': 'Feature',
+                             'geometry': {'type': 'Polygon', 'coordinates': rings},
+                             'properties': {'popup': name, 'tooltip': "Zone à risque d'inondation"}})
+        return features
+
+
+# Cartes HTML générées (cache géré, indépendant du répertoire courant)
+MAP_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), 'suruwa_maps')
+MAP_CACHE_SIZE = 64
+OSM_TILE_URL = "https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
+
+# Leaflet livré avec l'application (assets/leaflet, déclaré dans les datas de suruwasoft.spec) : cartes hors ligne
+ASSETS_DIR = os.path.join(getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__))), 'assets')
+LEAFLET_DIR = os.path.join(ASSETS_DIR, 'leaflet')
+ASSET_TYPES = {'.js': 'application/javascript', '.css': 'text/css', '.png': 'image/png'}
+
+# Modèle de carte Leaflet : les couches sont injectées en GeoJSON précalculé
+MAP_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>$title</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="$assets_url/leaflet.css">
+<script src="$assets_url/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var map = L.map('map').setView($center, $zoom);
+L.tileLayer($tile_url, {maxZoom: 19, attribution: '&copy; OpenStreetMap'}).addTo(map);
+
+function esc(text) {
+  var div = document.createElement('div');
+  div.textContent = text == null ? '' : String(text);
+  return div.innerHTML.replace(/\\n/g, '<br>');
+}
+
+var overlays = {};
+$layers.forEach(function (layer) {
+  function geojson(data) {
+    return L.geoJSON(data, {
+      style: function (feature) { return feature.properties.style || layer.style; },
+      pointToLayer: function (feature, latlng) {
+        return L.circleMarker(latlng, feature.properties.style || layer.style);
+      },
+      onEachFeature: function (feature, item) {
+        if (feature.properties.popup) { item.bindPopup(esc(feature.properties.popup)); }
+        if (feature.properties.tooltip) { item.bindTooltip(esc(feature.properties.tooltip)); }
+      }
+    });
+  }
+  if (!layer.bands) {
+    overlays[layer.name] = geojson(layer.data).addTo(map);
+    return;
+  }
+  // Niveaux de détail : seule la géométrie de la bande du zoom courant est affichée
+  var group = L.layerGroup().addTo(map);
+  var bands = layer.bands.map(function (band) {
+    return {min: band.min_zoom, max: band.max_zoom, layer: geojson(band.data)};
+  });
+  function showBand() {
+    var zoom = map.getZoom();
+    bands.forEach(function (band) {
+      var visible = zoom >= band.min && zoom <= band.max;
+      if (visible && !group.hasLayer(band.layer)) { group.addLayer(band.layer); }
+      if (!visible && group.hasLayer(band.layer)) { group.removeLayer(band.layer); }
+    });
+  }
+  map.on('zoomend', showBand);
+  showBand();
+  overlays[layer.name] = group;
+});
+L.control.layers(null, overlays).addTo(map);
+</script>
+</body>
+</html>
+""")
+
+
+def geojson_point(lat, lon, **properties):
+    """Entité GeoJSON ponctuelle"""
+    return {'type': 'Feature', 'properties': properties,
+            'geometry': {'type': 'Point', 'coordinates': [lon, lat]}}
+
+
+def geojson_polygon(ring, **properties):
+    """Entité GeoJSON polygonale à partir d'un anneau [(lat, lon), ...]"""
+    coordinates = [[lon, lat] for lat, lon in ring]
+    coordinates.append(coordinates[0])
+    return {'type': 'Feature', 'properties': properties,
+            'geometry': {'type': 'Polygon', 'coordinates': [coordinates]}}
+
+
+def map_layer(name, features, **style):
+    """Couche de carte : nom affiché, style par défaut et collection GeoJSON"""
+    return {'name': name, 'style': style,
+            'data': {'type': 'FeatureCollection', 'features': features}}
+
+
+def map_banded_layer(name, bands, **style):
+    """Couche à niveaux de détail : [(zoom min, zoom max, entités)], la carte n'affiche que la bande du zoom courant"""
+    return {'name': name, 'style': style,
+            'bands': [{'min_zoom': min_zoom, 'max_zoom': max_zoom,
+                       'data': {'type': 'FeatureCollection', 'features': features}}
+                      for min_zoom, max_zoom, features in bands]}
+
+
+class MapRenderer:
+    """Génération des cartes HTML depuis un modèle, avec cache disque borné"""
+    def __init__(self, cache_dir=MAP_CACHE_DIR, max_files=MAP_CACHE_SIZE, tile_url=OSM_TILE_URL, assets_url=None):
+        self.cache_dir = cache_dir
+        self.max_files = max_files
+        self.tile_url = tile_url
+        # Leaflet servi par le serveur de tuiles local, sinon lu directement dans le répertoire livré
+        self.assets_url = assets_url or pathlib.Path(LEAFLET_DIR).as_uri()
+        os.makedirs(cache_dir, exist_ok=True)
+        
+    def path_for(self, key_parts):
+        """Fichier de cache correspondant à une clé (localisation, risque, couches...)"""
+        key = json.dumps([self.tile_url, self.assets_url] + list(key_parts), sort_keys=True, default=str)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"map_{digest}.html")
+        
+    def render(self, key_parts, build):
+        """Chemin de la carte ; build() -> (titre, centre, zoom, couches) n'est appelé qu'en cas d'absence"""
+        start = time.perf_counter()
+        path = self.path_for(key_parts)
+        if os.path.exists(path):
+            os.utime(path)  # fraîcheur pour l'éviction LRU
+            METRICS.observe('suruwa_map_render_seconds', time.perf_counter() - start, map='lieu', cache='hit')
+            return path
+        
+        title, center, zoom, layers = build()
+        html = MAP_TEMPLATE.substitute(
+            title=title.replace('<', '&lt;'),
+            center=json.dumps(list(center)),
+            zoom=int(zoom),
+            tile_url=json.dumps(self.tile_url),
+            assets_url=self.assets_url,
+            # « </ » échappé pour ne pas fermer la balise script
+            layers=json.dumps(layers, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/'),
+        )
+        
+        self.write(path, html)
+        self.evict()
+        METRICS.observe('suruwa_map_render_seconds', time.perf_counter() - start, map='lieu', cache='miss')
+        return path
+        
+    def write(self, path, html):
+        """Écriture atomique : deux fenêtres ne peuvent pas lire un fichier partiel"""
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp_path, path)
+        
+    def render_situation(self, zones, alerts):
+        """Carte de situation (fichier unique réécrit) à partir des agrégats des zones et des alertes"""
+        path = os.path.join(self.cache_dir, 'situation.html')
+        with METRICS.timer('suruwa_map_render_seconds', map='situation', cache='miss'):
+            self.write(path, SITUATION_TEMPLATE.substitute(
+                tile_url=json.dumps(self.tile_url),
+                assets_url=self.assets_url,
+                zones=zones.payload(),
+                alerts=alerts.payload(),
+            ))
+        return path
+
+    def evict(self):
+        """Suppression des cartes les moins récemment utilisées au-delà de max_files"""
+        entries = [entry for entry in os.scandir(self.cache_dir)
+                   if entry.name.startswith('map_') and entry.name.endswith('.html')]
+        if len(entries) <= self.max_files:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_files]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass  # déjà supprimée par une autre fenêtre
+
+
+# Carte de situation nationale : agrégats par grille en pixels Web Mercator
+CLUSTER_MAX_ZOOM = 12  # au-delà, les points sont affichés individuellement
+CLUSTER_CELL_PX = 64
+
+SITUATION_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>SURUWA - Carte de situation</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="$assets_url/leaflet.css">
+<script src="$assets_url/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+var map = L.map('map', {preferCanvas: true}).setView([2, 20], 3);
+L.tileLayer($tile_url, {maxZoom: 19, attribution: '&copy; OpenStreetMap'}).addTo(map);
+
+var sets = {zones: $zones, alerts: $alerts};
+var colors = ['#9E9E9E', '#4CAF50', '#FF9800', '#F44336', '#8B0000'];
+var levels = ['Indéterminé', 'Faible', 'Modéré', 'Élevé', 'Critique'];
+var canvas = L.canvas();
+var drawn = L.layerGroup().addTo(map);
+
+function esc(text) {
+  var div = document.createElement('div');
+  div.textContent = text == null ? '' : String(text);
+  return div.innerHTML;
+}
+
+// Seuls les agrégats du zoom courant visibles à l'écran sont dessinés
+function draw() {
+  drawn.clearLayers();
+  var zoom = map.getZoom(), bounds = map.getBounds().pad(0.2);
+  Object.keys(sets).forEach(function (kind) {
+    var set = sets[kind], alert = kind === 'alerts';
+    var items = zoom > set.max_zoom ? set.points : set.zooms[zoom];
+    items.forEach(function (item) {
+      if (!bounds.contains([item[0], item[1]])) { return; }
+      var count = item[2], risk = item[3];
+      var label = count > 1 ? count + (alert ? ' alertes' : ' zones') + ' (max ' + levels[risk] + ')'
+                            : (alert ? 'Alerte : ' : '') + item[4] + ' - ' + levels[risk];
+      L.circleMarker([item[0], item[1]], {
+        renderer: canvas,
+        radius: (count > 1 ? 6 + 3 * Math.log2(count) : 6) + (alert ? 3 : 0),
+        color: alert ? '#000' : colors[risk], weight: alert ? 3 : 1,
+        dashArray: alert ? '4' : null,
+        fillColor: colors[risk], fillOpacity: alert ? 0.3 : 0.7
+      }).bindTooltip(esc(label)).addTo(drawn);
+    });
+  });
+}
+map.on('moveend', draw);
+draw();
+</script>
+</body>
+</html>
+""")
+
+
+class SituationClusters:
+    """Regroupement par grille et par zoom de points colorés par risque, maintenu incrémentalement"""
+    def __init__(self, max_zoom=CLUSTER_MAX_ZOOM, cell_px=CLUSTER_CELL_PX, max_ratio=0.8):
+        self.max_zoom = max_zoom
+        self.cell_px = cell_px
+        self.max_ratio = max_ratio  # proportion cellules/points au-delà de laquelle on n'agrège plus
+        self.lock = threading.Lock()
+        self.points = {}  # clé -> (lat, lon, score, libellé, cellule au zoom maximal)
+        self.point_json = {}  # clé -> fragment JSON du point
+        # Par zoom : cellule -> [nombre, somme lat, somme lon, nombre par score de risque]
+        self.cells = [{} for _ in range(max_zoom + 1)]
+        self.cell_json = [{} for _ in range(max_zoom + 1)]  # fragments JSON, invalidés à chaque modification
+        
+    def _cell(self, lat, lon):
+        """Cellule de la grille au zoom maximal (les zooms inférieurs s'en déduisent par décalage)"""
+        scale = 256 * 2 ** self.max_zoom / self.cell_px
+        lat = max(min(lat, 85.0511), -85.0511)
+        x = int((lon + 180.0) / 360.0 * scale)
+        y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * scale)
+        return x, y
+        
+    def _apply(self, cell, lat, lon, score, sign):
+        """Ajout (sign=1) ou retrait (sign=-1) d'un point dans sa cellule à chaque zoom"""
+        x, y = cell
+        for zoom in range(self.max_zoom + 1):
+            shift = self.max_zoom - zoom
+            key = (x >> shift, y >> shift)
+            cells = self.cells[zoom]
+            agg = cells.get(key)
+            if agg is None:
+                agg = cells[key] = [0, 0.0, 0.0, [0] * len(RISK_SCORES)]
+            agg[0] += sign
+            agg[1] += sign * lat
+            agg[2] += sign * lon
+            agg[3][score] += sign
+            if agg[0] == 0:
+                del cells[key]
+            self.cell_json[zoom].pop(key, None)
+        
+    def update(self, key, lat, lon, score, label):
+        """Insertion ou mise à jour d'un point : O(nombre de zooms)"""
+        with self.lock:
+            previous = self.points.get(key)
+            if previous is not None:
+                if previous[:4] == (lat, lon, score, label):
+                    return
+                self._apply(previous[4], previous[0], previous[1], previous[2], -1)
+            cell = self._cell(lat, lon)
+            self.points[key] = (lat, lon, score, label, cell)
+            self.point_json.pop(key, None)
+            self._apply(cell, lat, lon, score, 1)
+        
+    def remove(self, key):
+        """Retrait d'un point"""
+        with self.lock:
+            previous = self.points.pop(key, None)
+            if previous is not None:
+                self.point_json.pop(key, None)
+                self._apply(previous[4], previous[0], previous[1], previous[2], -1)
+        
+    def payload(self):
+        """Données JSON de la carte ; seuls les fragments modifiés depuis le dernier appel sont resérialisés"""
+        with self.lock:
+            zooms = []
+            for cells, fragments in zip(self.cells, self.cell_json):
+                if len(cells) > self.max_ratio * len(self.points):
+                    break  # regroupement inutile à ce zoom : les points suffisent
+                parts = []
+                for key, (count, lat_sum, lon_sum, by_score) in cells.items():
+                    fragment = fragments.get(key)
+                    if fragment is None:
+                        score = max(i for i, n in enumerate(by_score) if n)
+                        fragment = fragments[key] = json.dumps(
+                            [round(lat_sum / count, 5), round(lon_sum / count, 5), count, score],
+                            separators=(',', ':'))
+                    parts.append(fragment)
+                zooms.append('[' + ','.join(parts) + ']')
+            
+            points = []
+            for key, (lat, lon, score, label, _) in self.points.items():
+                fragment = self.point_json.get(key)
+                if fragment is None:
+                    fragment = self.point_json[key] = json.dumps(
+                        [lat, lon, 1, score, label], ensure_ascii=False, separators=(',', ':'))
+                points.append(fragment)
+        
+        # « </ » échappé pour ne pas fermer la balise script
+        return ('{"max_zoom":%d,"zooms":[%s],"points":[%s]}'
+                % (len(zooms) - 1, ','.join(zooms), ','.join(points))).replace('</', '<\\/')
+
+
+# Tuiles de carte hors ligne (fichier MBTiles unique) et serveur local
+TILE_DB_PATH = os.path.join(os.path.dirname(DB_PATH), 'suruwa_tiles.mbtiles')
+TILE_SERVER_PORT = 8765
+TILE_UPSTREAM_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+TILE_USER_AGENT = "SuruwaSoft/2.0 (flood prevention desktop app)"
+TILE_READERS = 4  # connexions de lecture du stock, partagées par les threads du serveur
+
+
+def tile_xy(lat, lon, zoom):
+    """Tuile (x, y) au schéma XYZ contenant un point"""
+    lat = max(min(lat, 85.0511), -85.0511)
+    n = 2 ** zoom
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bbox(south, west, north, east, zooms):
+    """Énumération des tuiles (z, x, y) couvrant une emprise"""
+    for zoom in zooms:
+        x_min, y_min = tile_xy(north, west, zoom)
+        x_max, y_max = tile_xy(south, east, zoom)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                yield zoom, x, y
+
+
+class TileStore:
+    """Stock de tuiles MBTiles : lectures par un pool borné de connexions mmap, écritures sérialisées"""
+    def __init__(self, path=TILE_DB_PATH, mmap_size=256 * 1024 * 1024, max_readers=TILE_READERS):
+        self.path = path
+        self.mmap_size = mmap_size
+        self.max_readers = max_readers
+        self.pool = queue.Queue()  # connexions de lecture libres
+        self.readers = []
+        self.pool_lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        
+        self.writer = sqlite3.connect(path, check_same_thread=False)
+        self.writer.execute("PRAGMA journal_mode=WAL")
+        self.writer.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT)")
+        self.writer.execute('''
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER,
+                tile_column INTEGER,
+                tile_row INTEGER,
+                tile_data BLOB
+            )
+        ''')
+        self.writer.execute("CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)")
+        if not self.writer.execute("SELECT 1 FROM metadata LIMIT 1").fetchone():
+            self.writer.executemany("INSERT INTO metadata (name, value) VALUES (?, ?)",
+                                    [('name', 'SURUWA'), ('format', 'png'), ('type', 'baselayer')])
+        self.writer.commit()
+        
+    @contextmanager
+    def _reader(self):
+        """Connexion de lecture empruntée au pool (créée tant qu'il en compte moins de max_readers)"""
+        try:
+            conn = self.pool.get_nowait()
+        except queue.Empty:
+            with self.pool_lock:
+                conn = None
+                if len(self.readers) < self.max_readers:
+                    conn = sqlite3.connect(self.path, check_same_thread=False)
+                    conn.execute(f"PRAGMA mmap_size={self.mmap_size}")
+                    self.readers.append(conn)
+            if conn is None:
+                conn = self.pool.get()  # toutes prêtées : attente de la première rendue
+        try:
+            yield conn
+        finally:
+            self.pool.put(conn)
+        
+    def get(self, zoom, x, y):
+        """Données d'une tuile XYZ, ou None"""
+        # MBTiles numérote les lignes en TMS (origine en bas)
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (zoom, x, (1 << zoom) - 1 - y)).fetchone()
+        return row[0] if row else None
+        
+    def has(self, zoom, x, y):
+        """Présence d'une tuile"""
+        with self._reader() as conn:
+            return conn.execute(
+                "SELECT 1 FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                (zoom, x, (1 << zoom) - 1 - y)).fetchone() is not None
+        
+    def put_many(self, tiles):
+        """Enregistrement de tuiles [(z, x, y, données), ...]"""
+        with self.write_lock, self.writer:
+            self.writer.executemany(
+                "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+                [(z, x, (1 << z) - 1 - y, sqlite3.Binary(data)) for z, x, y, data in tiles])
+        
+    def count(self):
+        """Nombre de tuiles stockées"""
+        with self._reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+        
+    def seed(self, south, west, north, east, zooms, fetch, progress=None, batch_size=200):
+        """Pré-chargement d'une emprise : fetch(z, x, y) -> octets ou None ; retourne le nombre ajouté"""
+        added = 0
+        pending = []
+        tiles = list(tiles_in_bbox(south, west, north, east, zooms))
+        for done, (z, x, y) in enumerate(tiles, 1):
+            if not self.has(z, x, y):
+                data = fetch(z, x, y)
+                if data:
+                    pending.append((z, x, y, data))
+            if len(pending) >= batch_size:
+                self.put_many(pending)
+                added += len(pending)
+                pending = []
+            if progress:
+                progress(done, len(tiles))
+        if pending:
+            self.put_many(pending)
+            added += len(pending)
+        return added
+        
+    def close(self):
+        """Fermeture des connexions"""
+        for conn in self.readers:
+            conn.close()
+        self.writer.close()
+
+
+class _TileRequestHandler(BaseHTTPRequestHandler):
+    """Réponses /{z}/{x}/{y}.png du serveur de tuiles local, et /leaflet/... (Leaflet livré)"""
+    protocol_version = 'HTTP/1.1'
+        
+    def do_GET(self):
+        if self.path.startswith('/leaflet/'):
+            self.send_asset(self.path.split('?')[0][len('/leaflet/'):])
+            return
+        try:
+            z, x, y = (int(part) for part in
+                       self.path.split('?')[0].strip('/').removesuffix('.png').split('/'))
+        except ValueError:
+            self.send_error(404)
+            return
+        
+        data = self.server.tiles.tile(z, x, y)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'max-age=86400')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(data)
+        
+    def send_asset(self, name):
+        """Fichier de LEAFLET_DIR (chemins relatifs seulement, types de ASSET_TYPES)"""
+        path = os.path.normpath(os.path.join(LEAFLET_DIR, name))
+        content_type = ASSET_TYPES.get(os.path.splitext(path)[1])
+        if content_type is None or not path.startswith(LEAFLET_DIR + os.sep):
+            self.send_error(404)
+            return
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Cache-Control', 'max-age=86400')
+        self.end_headers()
+        self.wfile.write(data)
+        
+    def log_message(self, format, *args):
+        pass  # pas de journal par requête
+
+
+class TileServer:
+    """Serveur HTTP local des tuiles : stock MBTiles, complété depuis le serveur amont si en ligne"""
+    def __init__(self, store, port=TILE_SERVER_PORT, upstream=TILE_UPSTREAM_URL):
+        self.store = store
+        self.upstream = upstream
+        self.session = None
+        try:
+            self.httpd = ThreadingHTTPServer(('127.0.0.1', port), _TileRequestHandler)
+        except OSError:
+            self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _TileRequestHandler)  # port occupé
+        self.httpd.daemon_threads = True
+        self.httpd.tiles = self
+        self.url_template = f"http://127.0.0.1:{self.httpd.server_port}/{{z}}/{{x}}/{{y}}.png"
+        self.assets_url = f"http://127.0.0.1:{self.httpd.server_port}/leaflet"
+        
+    def start(self):
+        """Démarrage du service en arrière-plan"""
+        threading.Thread(target=self.httpd.serve_forever, name="suruwa-tiles", daemon=True).start()
+        
+    def tile(self, z, x, y):
+        """Tuile du stock, téléchargée et conservée si absente"""
+        data = self.store.get(z, x, y)
+        if data is None and self.upstream:
+            data = self.fetch_upstream(z, x, y)
+            if data:
+                self.store.put_many([(z, x, y, data)])
+        return data
+        
+    def fetch_upstream(self, z, x, y):
+        """Téléchargement d'une tuile depuis le serveur amont (None hors ligne)"""
+        requests = lazy_import('requests')
+        if self.session is None:
+            self.session = requests.Session()
+            self.session.headers['User-Agent'] = TILE_USER_AGENT
+        try:
+            response = self.session.get(self.upstream.format(z=z, x=x, y=y), timeout=HTTP_TIMEOUT)
+        except requests.RequestException:
+            return None
+        return response.content if response.status_code == 200 else None
+        
+    def stop(self):
+        """Arrêt du service"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+# Paramètres du monitoring des zones
+MONITORING_WORKERS = 4      # rafraîchissements simultanés
+MONITORING_JITTER = 0.1     # variation aléatoire (±10%) des échéances
+MONITORING_BATCH_WINDOW = 30  # avance maximale (s) pour regrouper des zones proches de l'échéance
+MONITORING_RETRY_DELAY = 5    # report (s) d'une échéance tombée pendant le rafraîchissement de sa zone
+
+
+class ZoneScheduler:
+    """Ordonnanceur des zones surveillées : tas des prochaines échéances + pool borné"""
+    def __init__(self, refresh, max_workers=MONITORING_WORKERS, jitter=MONITORING_JITTER,
+                 batch_size=GROUP_SIZE, batch_window=MONITORING_BATCH_WINDOW):
+        self.refresh = refresh  # refresh([(zone_id, name), ...]), appelé sur un thread du pool
+        self.max_workers = max_workers
+        self.jitter = jitter
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        
+        self.heap = []          # (échéance, séquence, zone_id, génération)
+        self.zones = {}         # zone_id -> {'name', 'interval', 'gen'}
+        self.in_flight = set()
+        self.active_batches = 0
+        self.seq = 0
+        self.cond = threading.Condition()
+        self.running = False
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="suruwa-zone")
+        METRICS.gauge('suruwa_queue_depth', lambda: len(self.in_flight), queue='zones_in_flight')
+        
+    def add(self, zone_id, name, interval, delay=None):
+        """Ajout (ou replanification) d'une zone ; interval en secondes"""
+        with self.cond:
+            gen = self.zones.get(zone_id, {}).get('gen', 0) + 1
+            self.zones[zone_id] = {'name': name, 'interval': interval, 'gen': gen}
+            if delay is None:
+                # Première échéance étalée sur l'intervalle pour éviter les rafales
+                delay = random.uniform(0, interval)
+            self._push(zone_id, time.monotonic() + delay)
+            
+    def remove(self, zone_id):
+        """Retrait d'une zone (son entrée dans le tas est ignorée à l'échéance)"""
+        with self.cond:
+            self.zones.pop(zone_id, None)
+            
+    def _push(self, zone_id, due):
+        """Insertion dans le tas (verrou déjà pris)"""
+        self.seq += 1
+        heapq.heappush(self.heap, (due, self.seq, zone_id, self.zones[zone_id]['gen']))
+        self.cond.notify()
+        
+    def start(self):
+        """Démarrage du thread de répartition"""
+        self.running = True
+        threading.Thread(target=self._loop, name="suruwa-scheduler", daemon=True).start()
+        
+    def stop(self):
+        """Arrêt de l'ordonnanceur"""
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.executor.shutdown(wait=False)
+        
+    def _loop(self):
+        """Attente de la prochaine échéance puis envoi d'un lot au pool"""
+        with self.cond:
+            while self.running:
+                if not self.heap or self.active_batches >= self.max_workers:
+                    self.cond.wait()
+                    continue
+                
+                now = time.monotonic()
+                delay = self.heap[0][0] - now
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                
+                # Regroupement des zones échues ou proches de l'échéance
+                batch = []
+                deferred = []
+                horizon = now + self.batch_window
+                while self.heap and self.heap[0][0] <= horizon and len(batch) < self.batch_size:
+                    due, _, zone_id, gen = heapq.heappop(self.heap)
+                    zone = self.zones.get(zone_id)
+                    if zone is None or zone['gen'] != gen:
+                        continue  # zone supprimée ou replanifiée entre-temps
+                    if zone_id in self.in_flight:
+                        # Replanifiée pendant son rafraîchissement : échéance repoussée, jamais perdue
+                        deferred.append((zone_id, max(due, now + MONITORING_RETRY_DELAY)))
+                        continue
+                    self.in_flight.add(zone_id)
+                    batch.append((zone_id, zone['name'], gen))
+                for zone_id, due in deferred:
+                    self._push(zone_id, due)
+
+                if batch:
+                    self.active_batches += 1
+                    self.executor.submit(self._run, batch)
+                
+    def _run(self, batch):
+        """Rafraîchissement d'un lot de zones puis replanification"""
+        try:
+            self.refresh([(zone_id, name) for zone_id, name, _ in batch])
+        except Exception as e:
+            report_error('monitoring', f"{len(batch)} zones : {e}")
+        finally:
+            with self.cond:
+                self.active_batches -= 1
+                for zone_id, _, gen in batch:
+                    self.in_flight.discard(zone_id)
+                    zone = self.zones.get(zone_id)
+                    if zone is not None and zone['gen'] == gen:
+                        spread = random.uniform(1 - self.jitter, 1 + self.jitter)
+                        self._push(zone_id, time.monotonic() + zone['interval'] * spread)
+                self.cond.notify()
+
+
+# Facteurs de risque d'inondation (bit du masque, libellé), dans l'ordre d'affichage
+RISK_FACTORS = [
+    (1 << 0, "Humidité très élevée"),
+    (1 << 1, "Humidité élevée"),
+    (1 << 2, "Fortes précipitations prévues"),
+    (1 << 3, "Précipitations modérées prévues"),
+    (1 << 4, "Basse pression"),
+    (1 << 5, "Vents forts"),
+    (1 << 6, "Dans une zone inondable cartographiée"),
+]
+
+RISK_LEVELS = ["Faible", "Modéré", "Élevé", "Critique"]
+
+
+def compute_flood_risk_batch(humidity, pressure, wind_speed, precipitation, in_flood_zone=None):
+    """Calcul vectorisé du risque d'inondation pour N localités
+    
+    humidity, pressure, wind_speed : tableaux (N,) des conditions actuelles
+    precipitation : tableau (N, T) des précipitations prévues, complété par des zéros
+    in_flood_zone : tableau (N,) optionnel, localité dans une zone inondable cartographiée
+    Retourne (niveaux, scores, masques des facteurs)
+    """
+    np = lazy_import('numpy')
+    humidity = np.asarray(humidity, dtype=float)
+    pressure = np.asarray(pressure, dtype=float)
+    wind_speed = np.asarray(wind_speed, dtype=float)
+    precipitation = np.asarray(precipitation, dtype=float).reshape(len(humidity), -1)
+    
+    # Cumul colonne par colonne : même ordre d'addition que sum() sur les prévisions
+    total_precip = np.zeros(len(humidity))
+    for column in precipitation.T:
+        total_precip += column
+    
+    very_humid = humidity > 85
+    humid = ~very_humid & (humidity > 70)
+    heavy_rain = total_precip > 50
+    moderate_rain = ~heavy_rain & (total_precip > 20)
+    low_pressure = pressure < 1000
+    strong_wind = wind_speed > 15
+    if in_flood_zone is None:
+        mapped_zone = np.zeros(len(humidity), dtype=bool)
+    else:
+        mapped_zone = np.asarray(in_flood_zone, dtype=bool)
+    
+    scores = (3 * very_humid + 2 * humid + 4 * heavy_rain + 2 * moderate_rain
+              + 2 * low_pressure + 1 * strong_wind + 2 * mapped_zone)
+    
+    masks = np.zeros(len(humidity), dtype=np.int64)
+    for (bit, _), present in zip(RISK_FACTORS, (very_humid, humid, heavy_rain, moderate_rain,
+                                                low_pressure, strong_wind, mapped_zone)):
+        masks |= np.where(present, bit, 0)
+    
+    levels = np.array(RISK_LEVELS)[(scores >= 3).astype(int) + (scores >= 5) + (scores >= 7)]
+    return levels, scores, masks
+
+
+def flood_risk_inputs(observations):
+    """Mise en tableaux d'une liste de (current_data, forecast_data) pour le calcul groupé"""
+    np = lazy_import('numpy')
+    width = max((len(forecast) for _, forecast in observations), default=0)
+    precipitation = np.zeros((len(observations), width))
+    for row, (_, forecast) in enumerate(observations):
+        precipitation[row, :len(forecast)] = [f['precipitation'] for f in forecast]
+    
+    humidity = [current['humidity'] for current, _ in observations]
+    pressure = [current['pressure'] for current, _ in observations]
+    wind_speed = [current['wind_speed'] for current, _ in observations]
+    return humidity, pressure, wind_speed, precipitation
+
+
+def risk_factors(mask):
+    """Libellés des facteurs présents dans un masque"""
+    return [label for bit, label in RISK_FACTORS if mask & bit]
+
+
+# Diffusion des alertes : canaux activés par variables d'environnement
+ALERT_QUEUE_SIZE = 64  # lots en attente par canal avant de freiner la lecture des destinataires
+ALERT_PROGRESS_INTERVAL = 1.0
+DELIVERY_PENDING = "En attente"
+DELIVERY_RUNNING = "En cours"
+DELIVERY_SENT = "Envoyée"
+DELIVERY_PARTIAL = "Partielle"
+DELIVERY_FAILED = "Échec"
+DELIVERY_NO_CHANNEL = "Aucun canal"
+
+
+class TokenBucket:
+    """Limiteur de débit asynchrone : rate jetons par seconde, rafale bornée, réservation à crédit"""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        
+    async def acquire(self, count=1):
+        """Réservation de count jetons, en attendant si le crédit est épuisé"""
+        asyncio = lazy_import('asyncio')
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= count
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+
+class AlertChannel(ABC):
+    """Canal de diffusion : lots de destinataires, envois concurrents bornés, débit limité, reprises"""
+    name = "canal"
+    contact = None  # champ du destinataire utilisé ; None = une seule diffusion par alerte
+        
+    def __init__(self, batch_size=1, concurrency=4, rate=None, retries=3, backoff=1.0):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.limiter = TokenBucket(rate) if rate else None
+        self.retries = retries
+        self.backoff = backoff
+        
+    @abstractmethod
+    def send(self, batch, alert):
+        """Envoi bloquant d'un lot (exécuté dans un thread) ; lève une exception en cas d'échec"""
+        
+    async def deliver(self, batch, alert, executor):
+        """Envoi d'un lot avec reprises et attente exponentielle ; True si le lot est parti"""
+        asyncio = lazy_import('asyncio')
+        loop = asyncio.get_running_loop()
+        if self.limiter:
+            await self.limiter.acquire(len(batch))
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            try:
+                await loop.run_in_executor(executor, self.send, batch, alert)
+                ok = True
+                break
+            except Exception as e:
+                if attempt == self.retries:
+                    report_error('diffusion', f"{self.name} : {e}")
+                    ok = False
+                    break
+                await asyncio.sleep(self.backoff * 2 ** attempt * random.uniform(0.5, 1.5))
+        METRICS.observe('suruwa_alert_send_seconds', time.perf_counter() - start, channel=self.name)
+        METRICS.inc('suruwa_alert_recipients_total', len(batch), channel=self.name, result='ok' if ok else 'error')
+        return ok
+
+
+class SmsGatewayChannel(AlertChannel):
+    """SMS via une passerelle HTTP acceptant un lot de numéros par requête"""
+    name = "sms"
+    contact = 'phone'
+        
+    def __init__(self, url, token=None, **kwargs):
+        kwargs.setdefault('batch_size', 100)
+        super().__init__(**kwargs)
+        self.url = url
+        self.token = token
+        self.session = None
+        self.session_lock = threading.Lock()
+        
+    def send(self, batch, alert):
+        requests = lazy_import('requests')
+        with self.session_lock:
+            if self.session is None:
+                self._open_session(requests)
+        response = self.session.post(self.url, json={'to': batch, 'message': alert['text']},
+                                     timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+        
+    def _open_session(self, requests):
+        """Session HTTP partagée par les envois concurrents"""
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=self.concurrency))
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=self.concurrency))
+        if self.token:
+            self.session.headers['Authorization'] = f"Bearer {self.token}"
+
+
+class SmtpChannel(AlertChannel):
+    """Emails via SMTP : un message et une transaction par lot (destinataires en copie cachée)"""
+    name = "email"
+    contact = 'email'
+        
+    def __init__(self, host, port=25, sender="alertes@suruwa.local", user=None, password=None,
+                 starttls=False, **kwargs):
+        kwargs.setdefault('batch_size', 50)
+        super().__init__(**kwargs)
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        
+    def send(self, batch, alert):
+        smtplib = lazy_import('smtplib')
+        message = lazy_import('email.message').EmailMessage()
+        message['From'] = self.sender
+        message['To'] = self.sender
+        message['Subject'] = f"[SURUWA] Alerte {alert['risk']} - {alert['zone']}"
+        message.set_content(alert['text'])
+        with smtplib.SMTP(self.host, self.port, timeout=HTTP_TIMEOUT[1]) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.user:
+                smtp.login(self.user, self.password or '')
+            smtp.send_message(message, self.sender, batch)
+
+
+class WebhookChannel(AlertChannel):
+    """Diffusion unique de l'alerte vers un webhook (radio, sirènes, autres systèmes)"""
+    name = "radio"
+        
+    def __init__(self, url, **kwargs):
+        kwargs.setdefault('concurrency', 1)
+        super().__init__(**kwargs)
+        self.url = url
+        
+    def send(self, batch, alert):
+        requests = lazy_import('requests')
+        response = requests.post(self.url, json={key: alert[key] for key in ('id', 'zone', 'risk', 'message')},
+                                 timeout=HTTP_TIMEOUT)
+        response.raise_for_status()
+
+
+def alert_channels_from_env(environ=os.environ):
+    """Canaux configurés : SURUWA_SMS_URL, SURUWA_SMTP_HOST, SURUWA_WEBHOOK_URL (et options associées)"""
+    def number(name, default, kind=float):
+        return kind(environ.get(name) or default)
+    
+    channels = []
+    if environ.get('SURUWA_SMS_URL'):
+        channels.append(SmsGatewayChannel(environ['SURUWA_SMS_URL'], token=environ.get('SURUWA_SMS_TOKEN'),
+                                          batch_size=number('SURUWA_SMS_BATCH', 100, int),
+                                          concurrency=number('SURUWA_SMS_CONCURRENCY', 4, int),
+                                          rate=number('SURUWA_SMS_RATE', 0)))
+    if environ.get('SURUWA_SMTP_HOST'):
+        channels.append(SmtpChannel(environ['SURUWA_SMTP_HOST'], port=number('SURUWA_SMTP_PORT', 25, int),
+                                    sender=environ.get('SURUWA_SMTP_FROM') or "alertes@suruwa.local",
+                                    user=environ.get('SURUWA_SMTP_USER'),
+                                    password=environ.get('SURUWA_SMTP_PASSWORD'),
+                                    starttls=environ.get('SURUWA_SMTP_STARTTLS') == '1',
+                                    batch_size=number('SURUWA_SMTP_BATCH', 50, int),
+                                    concurrency=number('SURUWA_SMTP_CONCURRENCY', 2, int),
+                                    rate=number('SURUWA_SMTP_RATE', 0)))
+    if environ.get('SURUWA_WEBHOOK_URL'):
+        channels.append(WebhookChannel(environ['SURUWA_WEBHOOK_URL']))
+    return channels
+
+
+class AlertDispatcher:
+    """Diffusion asynchrone des alertes : boucle asyncio dédiée, une file bornée et des workers par canal"""
+    def __init__(self, channels, on_progress=None, queue_size=ALERT_QUEUE_SIZE,
+                 progress_interval=ALERT_PROGRESS_INTERVAL):
+        self.channels = channels
+        self.on_progress = on_progress  # on_progress(alert_id, statut, envoyés, échecs), thread de diffusion
+        self.queue_size = queue_size
+        self.progress_interval = progress_interval
+        self.loop = None
+        self.thread = None
+        self.executor = ThreadPoolExecutor(max_workers=max(1, sum(c.concurrency for c in channels)),
+                                           thread_name_prefix="suruwa-alert")
+        self.active_queues = {}  # alerte -> files des canaux, pour la jauge des lots en attente
+        METRICS.gauge('suruwa_queue_depth', lambda: sum(q.qsize() for queues in list(self.active_queues.values())
+                                                        for q in queues.values()), queue='alert_batches')
+        
+    def start(self):
+        """Démarrage de la boucle de diffusion en arrière-plan"""
+        ready = threading.Event()
+            
+        def run():
+            asyncio = lazy_import('asyncio')
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            ready.set()
+            self.loop.run_forever()
+            self.loop.close()
+        
+        self.thread = threading.Thread(target=run, name="suruwa-alerts", daemon=True)
+        self.thread.start()
+        ready.wait()
+        
+    def dispatch(self, alert, recipients):
+        """Diffusion d'une alerte {id, zone, risk, message} ; recipients : itérable de dicts (phone, email)
+        
+        Retourne un Future du statut final, sans bloquer l'appelant.
+        """
+        asyncio = lazy_import('asyncio')
+        alert = dict(alert, text=f"SURUWA - Alerte {alert['risk']} pour {alert['zone']} : {alert['message']}")
+        return asyncio.run_coroutine_threadsafe(self._dispatch(alert, recipients), self.loop)
+        
+    async def _dispatch(self, alert, recipients):
+        with METRICS.timer('suruwa_alert_dispatch_seconds'):
+            try:
+                return await self._deliver_all(alert, recipients)
+            finally:
+                self.active_queues.pop(alert['id'], None)
+        
+    async def _deliver_all(self, alert, recipients):
+        asyncio = lazy_import('asyncio')
+        loop = asyncio.get_running_loop()
+        if not self.channels:
+            self._progress(alert, DELIVERY_NO_CHANNEL, {})
+            return DELIVERY_NO_CHANNEL
+        
+        counts = {channel.name: [0, 0] for channel in self.channels}  # envoyés, échecs
+        queues = self.active_queues[alert['id']] = {channel.name: asyncio.Queue(self.queue_size)
+                                                    for channel in self.channels}
+        last_report = [0.0]
+        
+        async def worker(channel):
+            queue = queues[channel.name]
+            while True:
+                batch = await queue.get()
+                if batch is None:
+                    return
+                ok = await channel.deliver(batch, alert, self.executor)
+                counts[channel.name][0 if ok else 1] += len(batch)
+                if time.monotonic() - last_report[0] >= self.progress_interval:
+                    last_report[0] = time.monotonic()
+                    self._progress(alert, DELIVERY_RUNNING, counts)
+        
+        workers = [loop.create_task(worker(channel))
+                   for channel in self.channels for _ in range(channel.concurrency)]
+        
+        # Lecture des destinataires par tranches hors de la boucle (curseur SQLite, fichier...)
+        pending = {channel.name: [] for channel in self.channels if channel.contact}
+        iterator = iter(recipients)
+        take = lambda: [recipient for _, recipient in zip(range(1000), iterator)]
+        for channel in self.channels:
+            if channel.contact is None:
+                await queues[channel.name].put([alert['zone']])
+        while True:
+            chunk = await loop.run_in_executor(self.executor, take)
+            if not chunk:
+                break
+            for channel in self.channels:
+                if channel.contact is None:
+                    continue
+                batch = pending[channel.name]
+                for recipient in chunk:
+                    address = recipient.get(channel.contact)
+                    if address:
+                        batch.append(address)
+                        if len(batch) >= channel.batch_size:
+                            await queues[channel.name].put(batch)  # attente si le canal est saturé
+                            batch = pending[channel.name] = []
+        for channel in self.channels:
+            if pending.get(channel.name):
+                await queues[channel.name].put(pending[channel.name])
+            for _ in range(channel.concurrency):
+                await queues[channel.name].put(None)
+        await asyncio.gather(*workers)
+        
+        sent = sum(n for n, _ in counts.values())
+        failed = sum(n for _, n in counts.values())
+        status = DELIVERY_FAILED if failed and not sent else DELIVERY_PARTIAL if failed else DELIVERY_SENT
+        self._progress(alert, status, counts)
+        return status
+        
+    def _progress(self, alert, status, counts):
+        if self.on_progress:
+            sent = sum(n for n, _ in counts.values())
+            failed = sum(n for _, n in counts.values())
+            self.on_progress(alert['id'], status, sent, failed)
+        
+    def stop(self, timeout=5):
+        """Arrêt de la boucle (diffusions en cours abandonnées)"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+        self.executor.shutdown(wait=False)
+
+
+# Abonnés aux alertes : types d'alertes et zones indexées pour la diffusion ciblée
+ALERT_TYPES = {'flood': "Inondation", 'weather': "Météo", 'emergency': "Urgence"}
+
+# Alertes automatiques (mode service) : niveau déclencheur, délai avant de réalerter une zone au même niveau
+AUTO_ALERT_MIN_LEVEL = "Élevé"
+AUTO_ALERT_COOLDOWN = 6 * 60 * 60
+SUBSCRIBER_FETCH_SIZE = 1000
+
+
+def subscription_zone_key(zone):
+    """Clé d'une zone d'abonnement : nom normalisé, sans code pays (« Lomé, TG » -> « lome »)"""
+    return normalize_place_name(zone.partition(',')[0])
+
+
+def subscription_statements(email, phone, zones, alert_types):
+    """Instructions d'enregistrement d'un abonné (créé ou remplacé) et de ses zones"""
+    email = email.strip().lower()
+    phone = ''.join(c for c in phone if c.isdigit() or c == '+')
+    flags = [int(alert_type in alert_types) for alert_type in ALERT_TYPES]
+    subscriber = "(SELECT id FROM subscribers WHERE email = ? AND phone = ?)"
+    statements = [
+        ("""
+            INSERT INTO subscribers (email, phone, flood_alerts, weather_alerts, emergency_alerts, created)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (email, phone) DO UPDATE SET
+                flood_alerts = excluded.flood_alerts,
+                weather_alerts = excluded.weather_alerts,
+                emergency_alerts = excluded.emergency_alerts
+        """, (email, phone, *flags, datetime.now())),
+        (f"DELETE FROM subscriber_zones WHERE subscriber_id = {subscriber}", (email, phone)),
+    ]
+    for zone in {subscription_zone_key(zone) for zone in zones if subscription_zone_key(zone)}:
+        for alert_type in alert_types:
+            statements.append(("""
+                INSERT OR IGNORE INTO subscriber_zones (zone, alert_type, subscriber_id)
+                SELECT ?, ?, id FROM subscribers WHERE email = ? AND phone = ?
+            """, (zone, alert_type, email, phone)))
+    return statements
+
+
+def iter_subscribers(path, zone, alert_type, batch_size=SUBSCRIBER_FETCH_SIZE):
+    """Abonnés d'une zone pour un type d'alerte, lus par lots sans charger la table
+    
+    Parcours de la clé primaire (zone, alert_type, subscriber_id) ; la connexion est propre au
+    générateur, qui peut être consommé depuis n'importe quel thread.
+    """
+    conn = sqlite3.connect(path, check_same_thread=False)
+    try:
+        cursor = conn.execute("""
+            SELECT s.email, s.phone
+            FROM subscriber_zones z
+            JOIN subscribers s ON s.id = z.subscriber_id
+            WHERE z.zone = ? AND z.alert_type = ?
+        """, (subscription_zone_key(zone), alert_type))
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for email, phone in rows:
+                yield {'email': email, 'phone': phone}
+    finally:
+        conn.close()
+
+
+# API HTTP de consultation du risque (mode service)
+RISK_API_PORT = 8780
+RISK_API_TTL = 60  # secondes pendant lesquelles un résultat calculé est resservi tel quel
+RISK_API_MAX_RESULTS = 10000
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                500: "Internal Server Error", 502: "Bad Gateway"}
+
+
+class RiskApiServer:
+    """API HTTP asyncio du risque : GET /risk?city=... ou ?lat=...&lon=...
+    
+    Les requêtes simultanées pour un même lieu partagent un seul calcul (single-flight), dont le
+    résultat est resservi pendant ttl secondes ; les appels amont passent par le cache météo.
+    """
+    def __init__(self, engine, host='127.0.0.1', port=RISK_API_PORT, ttl=RISK_API_TTL,
+                 max_results=RISK_API_MAX_RESULTS):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.ttl = ttl
+        self.max_results = max_results
+        self.results = OrderedDict()  # clé -> (expiration, statut, corps JSON)
+        self.in_flight = {}  # clé -> tâche de calcul partagée
+        self.requests = 0
+        self.computations = 0
+        self.loop = None
+        self.thread = None
+        METRICS.gauge('suruwa_queue_depth', lambda: len(self.in_flight), queue='api_in_flight')
+        
+    def start(self):
+        """Démarrage du serveur sur sa propre boucle asyncio"""
+        asyncio = lazy_import('asyncio')
+        ready = threading.Event()
+            
+        def run():
+            self.loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self.loop)
+            server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, reuse_address=True))
+            self.port = server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+            server.close()
+            self.loop.run_until_complete(server.wait_closed())
+            self.loop.close()
+        
+        self.thread = threading.Thread(target=run, name="suruwa-risk-api", daemon=True)
+        self.thread.start()
+        ready.wait()
+        
+    def stop(self, timeout=5):
+        """Arrêt du serveur"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+        
+    async def _handle(self, reader, writer):
+        """Connexion HTTP/1.1 persistante : requêtes traitées l'une après l'autre"""
+        asyncio = lazy_import('asyncio')
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except ValueError:
+                    # Ligne de requête ou en-tête trop long, requête mal formée
+                    METRICS.inc('suruwa_api_requests_total', status=400)
+                    await self._respond(writer, 400, b'{"erreur": "requete invalide"}', False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers = request
+                
+                start = time.perf_counter()
+                try:
+                    status, body = await self._route(method, target)
+                except Exception as e:
+                    report_error('api', f"{target} : {e!r}")
+                    status, body = 500, b'{"erreur": "erreur interne"}'
+                METRICS.observe('suruwa_api_request_seconds', time.perf_counter() - start)
+                METRICS.inc('suruwa_api_requests_total', status=status)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                content_type = METRICS_CONTENT_TYPE if target == '/metrics' else None
+                await self._respond(writer, status, body, keep_alive, content_type)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+        
+    async def _read_request(self, reader):
+        """(méthode, cible, version, en-têtes) ; None en fin de connexion, ValueError si mal formée"""
+        request_line = await reader.readline()  # ValueError au-delà de la limite du flux
+        if not request_line:
+            return None
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        method, target, version = request_line.decode('latin-1').split()
+        return method, target, version, headers
+        
+    async def _respond(self, writer, status, body, keep_alive, content_type=None):
+        """Écriture d'une réponse complète"""
+        writer.write(
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type or 'application/json; charset=utf-8'}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body)
+        await writer.drain()
+        
+    async def _route(self, method, target):
+        """Aiguillage d'une requête : (statut, corps JSON)"""
+        self.requests += 1
+        if method != 'GET':
+            return 405, b'{"erreur": "methode non prise en charge"}'
+        path, _, query = target.partition('?')
+        if path == '/health':
+            return 200, json.dumps({'statut': "ok", 'requetes': self.requests,
+                                    'calculs': self.computations}).encode()
+        if path == '/metrics':
+            return 200, METRICS.render().encode('utf-8')
+        if path != '/risk':
+            return 404, b'{"erreur": "ressource inconnue"}'
+        
+        params = parse_qs(query)
+        if 'lat' in params and 'lon' in params:
+            try:
+                lat, lon = round(float(params['lat'][0]), 4), round(float(params['lon'][0]), 4)
+            except ValueError:
+                return 400, b'{"erreur": "coordonnees invalides"}'
+            label, location = f"{lat},{lon}", {'lat': lat, 'lon': lon}
+        elif params.get('city'):
+            # Localité résolue par le répertoire dans le thread de l'appel amont, pas sur la boucle
+            label = params['city'][0]
+            return await self.risk((('city', normalize_place_name(label)),), label, None)
+        else:
+            return 400, b'{"erreur": "parametre city ou lat/lon requis"}'
+        return await self.risk(tuple(sorted(location.items())), label, location)
+        
+    async def risk(self, key, label, location):
+        """Résultat d'un lieu : mémorisé, ou calcul partagé avec les requêtes déjà en cours"""
+        asyncio = lazy_import('asyncio')
+        cached = self.results.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            METRICS.inc('suruwa_api_results_total', source='memo')
+            return cached[1], cached[2]
+        
+        task = self.in_flight.get(key)
+        if task is None:
+            METRICS.inc('suruwa_api_results_total', source='calcul')
+            task = self.in_flight[key] = asyncio.ensure_future(self._compute(key, label, location))
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        else:
+            METRICS.inc('suruwa_api_results_total', source='partage')
+        return await asyncio.shield(task)
+        
+    async def _compute(self, key, label, location):
+        """Appel amont (thread, localité résolue si location est None) puis calcul du risque ;
+        seuls les succès sont mémorisés
+        """
+        asyncio = lazy_import('asyncio')
+        self.computations += 1
+        current_data, forecast_data = await asyncio.get_running_loop().run_in_executor(
+            None, self.engine.get_weather_with_forecast, label, location)
+        if isinstance(forecast_data, str):  # Erreur
+            status = 404 if forecast_data == "Ville introuvable" else 502
+            return status, json.dumps({'lieu': label, 'erreur': forecast_data}, ensure_ascii=False).encode()
+        
+        risk_level, factors = self.engine.calculate_flood_risk(current_data, forecast_data)
+        body = json.dumps({
+            'lieu': label,
+            'niveau': risk_level,
+            'facteurs': factors,
+            'position': [current_data['lat'], current_data['lon']],
+            'meteo': {key: current_data[key] for key in ('temp', 'humidity', 'pressure', 'wind_speed',
+                                                         'precipitation')},
+            'hors_ligne': current_data['stale'],
+            'calcule_a': datetime.now().isoformat(timespec='seconds'),
+        }, ensure_ascii=False).encode()
+        
+        self.results[key] = (time.monotonic() + self.ttl, 200, body)
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_results:
+            self.results.popitem(last=False)
+        return 200, body
+
+
+def import_gui():
+    """Import de Tkinter, uniquement pour l'application graphique (le mode service s'en passe)"""
+    global tk, ttk, messagebox, filedialog
+    tk = lazy_import('tkinter')
+    ttk = lazy_import('tkinter.ttk')
+    messagebox = lazy_import('tkinter.messagebox')
+    filedialog = lazy_import('tkinter.filedialog')
+
+
+class SuruwaEngine:
+    """Moteur sans interface : météo, calcul du risque, persistance, monitoring et diffusion des alertes"""
+    def __init__(self):
+        self.API_KEY = OWM_API_KEY
+        ERROR_HANDLERS.append(self.error_reported)
+        
+        # Client météo partagé, derrière le cache des réponses
+        self.weather_cache = WeatherCache()
+        self.weather_client = WeatherClient(self.API_KEY, base_url=OWM_BASE_URL, cache=self.weather_cache)
+        
+        # Diffusion des alertes (canaux configurés par l'environnement)
+        self.alert_dispatcher = AlertDispatcher(alert_channels_from_env(), on_progress=self._alert_progress)
+        self.alert_dispatcher.start()
+        
+        # Répertoire des localités (villes principales, puis dump GeoNames en arrière-plan)
+        self.gazetteer = Gazetteer()
+        if os.path.exists(GAZETTEER_PATH):
+            threading.Thread(target=self._load_gazetteer, daemon=True).start()
+        
+        # Refuges et zones inondables : index spatiaux chargés (ou reconstruits) en arrière-plan
+        self.shelter_index = None
+        threading.Thread(target=self._load_shelters, daemon=True).start()
+        self.flood_zones = None
+        threading.Thread(target=self._load_flood_zones, daemon=True).start()
+        
+        # Base de données
+        with startup_step('base de données'):
+            self.init_database()
+        
+    def init_database(self):
+        """Initialisation de la base de données SQLite"""
+        # Connexion de lecture du thread Tk ; les écritures passent par self.db_writer
+        self.conn = sqlite3.connect(DB_PATH)
+        cursor = self.conn.cursor()
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")  # sans effet sur une base existante (voir maintain_history)
+        cursor.execute("PRAGMA journal_mode=WAL")
+        
+        # Table pour l'historique météo
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS weather_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                city TEXT,
+                temperature REAL,
+                humidity REAL,
+                precipitation REAL,
+                risk_level TEXT,
+                timestamp DATETIME
+            )
+        ''')
+        
+        # Table pour les alertes
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                zone TEXT,
+                message TEXT,
+                risk_level TEXT,
+                timestamp DATETIME,
+                status TEXT,
+                alert_type TEXT DEFAULT 'flood',
+                delivery_status TEXT,
+                sent_count INTEGER DEFAULT 0,
+                failed_count INTEGER DEFAULT 0
+            )
+        ''')
+        alert_columns = {row[1] for row in cursor.execute("PRAGMA table_info(alerts)")}
+        for column, declaration in (('delivery_status', 'TEXT'), ('sent_count', 'INTEGER DEFAULT 0'),
+                                    ('failed_count', 'INTEGER DEFAULT 0'), ('alert_type', "TEXT DEFAULT 'flood'")):
+            if column not in alert_columns:
+                cursor.execute(f"ALTER TABLE alerts ADD COLUMN {column} {declaration}")
+        
+        # Abonnés et index (zone, type d'alerte) -> abonnés
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS subscribers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                email TEXT NOT NULL DEFAULT '',
+                phone TEXT NOT NULL DEFAULT '',
+                flood_alerts INTEGER,
+                weather_alerts INTEGER,
+                emergency_alerts INTEGER,
+                created DATETIME,
+                UNIQUE (email, phone)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS subscriber_zones (
+                zone TEXT,
+                alert_type TEXT,
+                subscriber_id INTEGER,
+                PRIMARY KEY (zone, alert_type, subscriber_id)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_subscriber_zones_subscriber ON subscriber_zones(subscriber_id)")
+        
+        # Table pour les zones surveillées
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS monitoring_zones (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT,
+                frequency INTEGER,
+                city_id INTEGER,
+                lat REAL,
+                lon REAL,
+                risk_level TEXT,
+                last_update DATETIME,
+                status TEXT
+            )
+        ''')
+        
+        # Tables d'agrégats horaires et journaliers par zone
+        for table in ROLLUP_TABLES.values():
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    city TEXT,
+                    bucket TEXT,
+                    samples INTEGER,
+                    max_risk INTEGER,
+                    humidity_sum REAL,
+                    precipitation REAL,
+                    PRIMARY KEY (city, bucket)
+                ) WITHOUT ROWID
+            ''')
+        
+        # Index des requêtes de consultation (historique, alertes actives)
+        for sql in HISTORY_INDEXES.values():
+            cursor.execute(sql)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_alerts_status_timestamp ON alerts(status, timestamp)")
+        
+        self.conn.commit()
+        
+        # Thread d'écriture unique
+        self.db_writer = DatabaseWriter(DB_PATH)
+        
+    def load_rollups(self, city, granularity, since):
+        """Agrégats d'une zone depuis une date : (période, risque max, humidité moyenne, précipitations)"""
+        table = ROLLUP_TABLES[granularity]
+        with METRICS.timer('suruwa_db_read_seconds', query='rollups'):
+            cursor = self.conn.cursor()
+            cursor.execute(f"""
+                SELECT bucket, max_risk, humidity_sum / samples, precipitation
+                FROM {table}
+                WHERE city = ? AND bucket >= ?
+                ORDER BY bucket
+            """, (city, since))
+            return cursor.fetchall()
+        
+    def list_rollup_zones(self):
+        """Zones présentes dans les agrégats (parcours par saut d'index, sans lire chaque jour)"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            WITH RECURSIVE zones(city) AS (
+                SELECT MIN(city) FROM weather_rollup_daily
+                UNION ALL
+                SELECT (SELECT MIN(city) FROM weather_rollup_daily WHERE city > zones.city)
+                FROM zones WHERE zones.city IS NOT NULL
+            )
+            SELECT city FROM zones WHERE city IS NOT NULL
+        """)
+        return [row[0] for row in cursor.fetchall()]
+        
+    def get_weather_with_forecast(self, city, params=None):
+        """Récupération météo avec prévisions"""
+        try:
+            # Météo actuelle et prévisions récupérées en parallèle
+            current_res, forecast_res = self.weather_client.fetch_current_and_forecast(
+                params or self.location_params(city))
+            
+            if current_res.get("cod") != 200:
+                raise Exception("Ville introuvable")
+            
+            return self.parse_weather(current_res, forecast_res)
+            
+        except Exception as e:
+            return None, str(e)
+            
+    def parse_weather(self, current_res, forecast_res):
+        """Extraction des données utiles des réponses de l'API"""
+        current_data = {
+            'temp': current_res["main"]["temp"],
+            'humidity': current_res["main"]["humidity"],
+            'condition': current_res["weather"][0]["description"],
+            'pressure': current_res["main"]["pressure"],
+            'wind_speed': current_res["wind"]["speed"],
+            'lat': current_res["coord"]["lat"],
+            'lon': current_res["coord"]["lon"],
+            'city_id': current_res.get("id"),
+            'precipitation': current_res.get("rain", {}).get("1h", 0),
+            # Données servies depuis le cache hors ligne
+            'stale': current_res.get("_stale", False) or forecast_res.get("_stale", False),
+            'cached_at': current_res.get("_cached_at")
+        }
+        
+        # Analyse des prévisions pour les 24h
+        forecast_data = []
+        for item in forecast_res["list"][:8]:  # 8 prévisions = 24h
+            forecast_data.append({
+                'time': item["dt_txt"],
+                'temp': item["main"]["temp"],
+                'humidity': item["main"]["humidity"],
+                'precipitation': item.get("rain", {}).get("3h", 0)
+            })
+        
+        return current_data, forecast_data
+            
+    def calculate_flood_risk(self, current_data, forecast_data):
+        """Calcul du risque d'inondation basé sur l'IA"""
+        if not current_data or not forecast_data:
+            return "Indéterminé", "Données insuffisantes"
+        
+        observations = [(current_data, forecast_data)]
+        with METRICS.timer('suruwa_risk_seconds', mode='single'):
+            levels, _, masks = compute_flood_risk_batch(*flood_risk_inputs(observations),
+                                                        in_flood_zone=self.flood_zone_flags(observations))
+        return str(levels[0]), risk_factors(int(masks[0]))
+            
+    def _load_gazetteer(self):
+        """Chargement du dump GeoNames (thread d'arrière-plan)"""
+        try:
+            gazetteer = Gazetteer.from_geonames(GAZETTEER_PATH)
+        except (OSError, ValueError) as e:
+            report_error('chargement', f"répertoire des localités non chargé : {e}")
+            return
+        if len(gazetteer):
+            self.gazetteer = gazetteer
+            
+    def _load_shelters(self):
+        """Chargement de l'index des refuges (thread d'arrière-plan)"""
+        try:
+            self.shelter_index = ShelterIndex.load()
+        except (OSError, ValueError, KeyError) as e:
+            report_error('chargement', f"index des refuges non chargé : {e}")
+        
+    def _load_flood_zones(self):
+        """Chargement de l'index des zones inondables (thread d'arrière-plan)"""
+        try:
+            self.flood_zones = FloodZoneIndex.load()
+        except (OSError, ValueError, KeyError) as e:
+            report_error('chargement', f"zones inondables non chargées : {e}")
+        
+    def flood_zone_flags(self, observations):
+        """Présence de chaque observation dans une zone inondable (None sans données)"""
+        if self.flood_zones is None:
+            return None
+        return self.flood_zones.flags([current['lat'] for current, _ in observations],
+                                      [current['lon'] for current, _ in observations])
+        
+    def nearest_shelters(self, lat, lon, k=3):
+        """Refuges les plus proches, liste vide si aucun jeu de données n'est chargé"""
+        if self.shelter_index is None:
+            return []
+        return self.shelter_index.nearest(lat, lon, k)
+        
+    def location_params(self, text):
+        """Paramètres de requête : coordonnées si la localité est connue hors ligne"""
+        place = self.gazetteer.resolve(text)
+        if place is None:
+            return {'q': text}  # géocodage par l'API
+        _, lat, lon = place
+        return {'lat': round(lat, 4), 'lon': round(lon, 4)}
+        
+    def fetch_history_page(self, city=None, start=None, end=None, after=None, limit=HISTORY_PAGE_SIZE):
+        """Page de l'historique, du plus récent au plus ancien, après la clé (timestamp, id)
+        
+        Retourne jusqu'à limit + 1 lignes (id, ville, temp, humidité, risque, date) :
+        la ligne supplémentaire indique qu'une page suivante existe.
+        """
+        conditions = []
+        params = []
+        if city:
+            conditions.append("city = ?")
+            params.append(city)
+        if start:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            conditions.append("timestamp < ?")
+            params.append(end)
+        if after:
+            # Pagination par clé : coût constant quelle que soit la profondeur de la page
+            conditions.append("(timestamp, id) < (?, ?)")
+            params.extend(after)
+        
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with METRICS.timer('suruwa_db_read_seconds', query='history_page'):
+            cursor = self.conn.cursor()
+            cursor.execute(f"""
+                SELECT id, city, temperature, humidity, risk_level, timestamp
+                FROM weather_history
+                {where}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            """, params + [limit + 1])
+            return cursor.fetchall()
+        
+    def fetch_active_alerts(self):
+        """Alertes actives, de la plus récente à la plus ancienne : (zone, risque, date, message, diffusion)"""
+        with METRICS.timer('suruwa_db_read_seconds', query='active_alerts'):
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                SELECT zone, risk_level, timestamp, message, delivery_status
+                FROM alerts
+                WHERE status = 'Actif'
+                ORDER BY timestamp DESC
+            """)
+            return cursor.fetchall()
+        
+    def export_records(self, path, table='weather_history', zone=None, start=None, end=None,
+                       on_progress=None, cancel=None):
+        """Export en flux d'une table (voir export_table), écritures en file validées d'abord"""
+        self.db_writer.flush()
+        return export_table(DB_PATH, path, table, zone, start, end, on_progress, cancel)
+        
+    def import_records(self, path, on_progress=None, cancel=None):
+        """Import en masse d'un historique (voir import_history), écritures en file validées d'abord"""
+        self.db_writer.flush()
+        return import_history(DB_PATH, path, on_progress, cancel)
+
+    def render_risk_map(self, renderer, lat, lon, city, risk):
+        """Fichier HTML de la carte d'un lieu analysé (lu dans le cache du renderer s'il existe)"""
+        def build():
+            # Carte avec couches multiples
+            layers = [
+                self.location_layer(lat, lon, city, risk),
+                # Couche des zones inondables cartographiées
+                self.flood_zones_layer(lat, lon),
+                # Couche des points d'évacuation
+                self.evacuation_points_layer(lat, lon),
+            ]
+            return f"SURUWA - {city}", (lat, lon), 10, layers
+        
+        # Carte déjà générée pour ce lieu, ce risque et ces couches : simple lecture du cache
+        versions = tuple(index.source_stamp if index else None for index in (self.shelter_index, self.flood_zones))
+        key = (round(lat, 4), round(lon, 4), city, risk, ('zone', ('inondation', FLOOD_ZONE_BANDS), 'evacuation'),
+               versions)
+        return renderer.render(key, build)
+        
+    def location_layer(self, lat, lon, city, risk):
+        """Couche du lieu analysé"""
+        color = 'red' if risk in ['Élevé', 'Critique'] else 'green'
+        marker = geojson_point(lat, lon,
+                               popup=f"📍 {city}\n🌊 Risque: {risk}",
+                               tooltip=f"Zone analysée: {city}")
+        return map_layer("Zone analysée", [marker], radius=10, color=color,
+                         fillColor=color, fillOpacity=0.8)
+        
+    def flood_zones_layer(self, lat, lon):
+        """Couche des zones inondables autour de la position, une géométrie simplifiée par bande de zoom"""
+        bands = self.flood_zones.geojson_bands(lat, lon) if self.flood_zones is not None else []
+        return map_banded_layer("Zones inondables", bands, color='blue', fill=True,
+                                fillColor='lightblue', fillOpacity=0.3)
+        
+    def evacuation_points_layer(self, lat, lon, k=5):
+        """Couche des refuges les plus proches"""
+        features = [geojson_point(e_lat, e_lon,
+                                  popup=f"🏥 Point d'évacuation\n{name}\n{distance:.1f} km",
+                                  tooltip=f"Refuge: {name}")
+                    for name, e_lat, e_lon, distance in self.nearest_shelters(lat, lon, k)]
+        return map_layer("Points d'évacuation", features, radius=8, color='darkgreen',
+                         fillColor='green', fillOpacity=0.9)
+        
+    def locate_zone(self, name):
+        """Position d'une zone : zone surveillée du même nom, sinon gazetteer"""
+        key = normalize_place_name(name)
+        with self.zone_clusters.lock:
+            for lat, lon, _, label, _ in self.zone_clusters.points.values():
+                if normalize_place_name(label) == key:
+                    return lat, lon
+        resolved = self.gazetteer.resolve(name)
+        return resolved[1:] if resolved else None
+        
+    def add_situation_alert(self, alert_id, zone, risk):
+        """Ajout d'une alerte active à la carte de situation (ignorée si le lieu est inconnu)"""
+        location = self.locate_zone(zone)
+        if location:
+            self.alert_clusters.update(alert_id, location[0], location[1], RISK_SCORES.get(risk, 0), zone)
+        
+    def dispatch_alert(self, alert_id, zone, risk, message, alert_type='flood'):
+        """Diffusion d'une alerte enregistrée aux abonnés de la zone, sur tous les canaux configurés ;
+        retourne le Future du statut final
+        """
+        return self.alert_dispatcher.dispatch({'id': alert_id, 'zone': zone, 'risk': risk, 'message': message},
+                                       iter_subscribers(DB_PATH, zone, alert_type))
+        
+    def _alert_progress(self, alert_id, status, sent, failed):
+        """Avancement d'une diffusion (thread de diffusion) : persistance puis notification"""
+        saved = self.db_writer.execute(
+            "UPDATE alerts SET delivery_status = ?, sent_count = ?, failed_count = ? WHERE id = ?",
+            (status, sent, failed, alert_id))
+        saved.add_done_callback(lambda f: self.alert_progressed(alert_id, status, sent, failed))
+        
+    def start_monitoring(self, auto_alerts=False):
+        """Démarrage du système de monitoring ; auto_alerts : alerte diffusée quand une zone
+        atteint AUTO_ALERT_MIN_LEVEL (mode service)
+        """
+        self.auto_alerts = auto_alerts
+        self.auto_alert_lock = threading.Lock()
+        self.zone_levels = {}     # zone_id -> dernier score de risque
+        self.alerted_zones = {}   # zone normalisée -> (score alerté, instant monotone)
+        self.zone_scheduler = ZoneScheduler(self._refresh_zones)
+        self.zone_city_ids = {}  # zone_id -> identifiant OpenWeatherMap
+        self.monitoring_checks = 0
+        self.zone_clusters = SituationClusters()
+        self.alert_clusters = SituationClusters()
+        
+        # Restauration des zones enregistrées
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            SELECT id, name, frequency, city_id, lat, lon, risk_level
+            FROM monitoring_zones
+        """)
+        
+        for zone_id, name, frequency, city_id, lat, lon, risk in cursor.fetchall():
+            if city_id:
+                self.zone_city_ids[zone_id] = city_id
+            if lat is not None:
+                self.zone_clusters.update(zone_id, lat, lon, RISK_SCORES.get(risk, 0), name)
+            self.zone_levels[zone_id] = RISK_SCORES.get(risk, 0)
+            self.zone_scheduler.add(zone_id, name, frequency * 60)
+        
+        # Alertes actives localisées pour la carte de situation ; elles couvrent déjà leur zone
+        cursor.execute("SELECT id, zone, risk_level FROM alerts WHERE status = 'Actif'")
+        for alert_id, zone, risk in cursor.fetchall():
+            self.add_situation_alert(alert_id, zone, risk)
+            key = subscription_zone_key(zone)
+            score = max(RISK_SCORES.get(risk, 0), self.alerted_zones.get(key, (0,))[0])
+            self.alerted_zones[key] = (score, time.monotonic())
+        
+        self.zone_scheduler.start()
+        
+        # Rétention et compactage de la base en arrière-plan
+        self.start_maintenance()
+
+    def _refresh_zones(self, zones):
+        """Vérification d'un lot de zones (thread du pool de monitoring)"""
+        names = dict(zones)
+        by_city = {}
+        for zone_id, name in zones:
+            city_id = self.zone_city_ids.get(zone_id)
+            if city_id:
+                by_city.setdefault(city_id, []).append(zone_id)
+            else:
+                # Zone jamais résolue : recherche par nom, qui fournit son identifiant
+                self._refresh_zone(zone_id, name)
+        
+        if by_city:
+            # Une requête groupée par tranche de GROUP_SIZE villes
+            results = self.weather_client.fetch_batch(list(by_city))
+            
+            observations = []
+            for city_id, (current_res, forecast_res) in results.items():
+                # Réponse absente ou erreur amont non cachée (404, 429, 500...) : seules les zones
+                # de cette ville passent en erreur, le reste du lot est traité
+                valid = (current_res is not None and forecast_res is not None
+                         and str(forecast_res.get("cod")) == "200" and "list" in forecast_res)
+                try:
+                    if valid:
+                        current_data, forecast_data = self.parse_weather(current_res, forecast_res)
+                except (KeyError, IndexError, TypeError, AttributeError) as e:
+                    report_error('surveillance', f"réponse météo invalide pour la ville {city_id} : {e!r}")
+                    valid = False
+                if not valid:
+                    for zone_id in by_city[city_id]:
+                        self._report_zone(zone_id, names[zone_id], None, None, "Erreur")
+                    continue
+                if not forecast_data:
+                    for zone_id in by_city[city_id]:
+                        self._report_zone(zone_id, names[zone_id], current_data, "Indéterminé", "Actif")
+                    continue
+                observations.append((city_id, (current_data, forecast_data)))
+            
+            # Score de tout le lot en un seul calcul vectorisé
+            if observations:
+                batch = [obs for _, obs in observations]
+                with METRICS.timer('suruwa_risk_seconds', mode='batch'):
+                    levels, _, _ = compute_flood_risk_batch(*flood_risk_inputs(batch),
+                                                            in_flood_zone=self.flood_zone_flags(batch))
+                for (city_id, (current_data, _)), risk_level in zip(observations, levels):
+                    for zone_id in by_city[city_id]:
+                        self._report_zone(zone_id, names[zone_id], current_data, str(risk_level), "Actif")
+        
+        self.monitoring_checks += len(zones)
+        self.zones_checked(len(zones))
+        
+    def _refresh_zone(self, zone_id, name):
+        """Vérification individuelle d'une zone par son nom"""
+        current_data, forecast_data = self.get_weather_with_forecast(name)
+        
+        if isinstance(forecast_data, str):  # Erreur
+            self._report_zone(zone_id, name, None, None, "Erreur")
+            return
+        
+        if current_data['city_id']:
+            self.zone_city_ids[zone_id] = current_data['city_id']
+        risk_level, _ = self.calculate_flood_risk(current_data, forecast_data)
+        self._report_zone(zone_id, name, current_data, risk_level, "Actif")
+        
+    def _report_zone(self, zone_id, name, current_data, risk_level, status):
+        """Persistance d'un résultat de zone puis notification
+        
+        Sous le verrou de l'ordonnanceur : une zone retirée pendant le rafraîchissement de son
+        lot n'est ni enregistrée, ni replacée sur la carte de situation, ni alertée.
+        """
+        now = datetime.now()
+        with self.zone_scheduler.cond:
+            if zone_id not in self.zone_scheduler.zones:
+                return
+            if current_data is not None:
+                self.db_writer.execute("""
+                    UPDATE monitoring_zones
+                    SET city_id = ?, lat = ?, lon = ?, risk_level = ?, last_update = ?, status = ?
+                    WHERE id = ?
+                """, (current_data['city_id'], current_data['lat'], current_data['lon'],
+                      risk_level, now, status, zone_id))
+                self.save_weather_data(name, current_data, risk_level)
+                self.zone_clusters.update(zone_id, current_data['lat'], current_data['lon'],
+                                          RISK_SCORES.get(risk_level, 0), name)
+                if self.auto_alerts:
+                    self._auto_alert(zone_id, name, risk_level)
+            else:
+                self.db_writer.execute("UPDATE monitoring_zones SET status = ? WHERE id = ?", (status, zone_id))
+        
+        self.zone_reported(zone_id, name, risk_level, status, now)
+        
+    def _auto_alert(self, zone_id, name, risk_level):
+        """Alerte enregistrée puis diffusée quand le risque d'une zone monte à AUTO_ALERT_MIN_LEVEL ou au-delà
+        
+        Une seule alerte par zone et par niveau pendant AUTO_ALERT_COOLDOWN (alertes actives au
+        démarrage comprises) : une zone qui oscille autour du seuil n'inonde pas les abonnés.
+        """
+        score = RISK_SCORES.get(risk_level, 0)
+        key = subscription_zone_key(name)
+        now = time.monotonic()
+        with self.auto_alert_lock:
+            previous = self.zone_levels.get(zone_id, 0)
+            self.zone_levels[zone_id] = score
+            if score < RISK_SCORES[AUTO_ALERT_MIN_LEVEL] or score <= previous:
+                return
+            alerted_score, alerted_at = self.alerted_zones.get(key, (0, None))
+            if alerted_at is not None and alerted_score >= score and now - alerted_at < AUTO_ALERT_COOLDOWN:
+                return
+            self.alerted_zones[key] = (score, now)
+        
+        message = (f"Risque d'inondation {risk_level.lower()} détecté pour {name} par la surveillance "
+                   f"automatique. Éloignez-vous des zones inondables et suivez les consignes des autorités.")
+        saved = self.db_writer.execute("""
+            INSERT INTO alerts (zone, message, risk_level, timestamp, status, alert_type, delivery_status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (name, message, risk_level, datetime.now(), "Actif", 'flood', DELIVERY_PENDING))
+        saved.add_done_callback(
+            lambda f: f.exception() or self._auto_alert_saved(f.result(), name, risk_level, message))
+        
+    def _auto_alert_saved(self, alert_id, zone, risk_level, message):
+        """Alerte automatique enregistrée (thread d'écriture) : carte de situation, diffusion, notification"""
+        METRICS.inc('suruwa_auto_alerts_total', risk=risk_level)
+        self.add_situation_alert(alert_id, zone, risk_level)
+        self.dispatch_alert(alert_id, zone, risk_level, message)
+        self.alert_recorded(alert_id, zone, risk_level)
+        
+    def save_weather_data(self, city, data, risk_level):
+        """Sauvegarde des données météo et des agrégats (thread d'écriture)"""
+        now = datetime.now()
+        precipitation = data.get('precipitation', 0)
+        self.db_writer.execute_group([("""
+            INSERT INTO weather_history (city, temperature, humidity, precipitation, risk_level, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (city, data['temp'], data['humidity'], precipitation, risk_level, now))]
+            + rollup_statements(city, now, risk_level, data['humidity'], precipitation))
+        
+    def export_metrics(self, path=METRICS_PATH, interval=METRICS_FILE_INTERVAL):
+        """Écriture périodique des métriques au format Prometheus (thread d'arrière-plan)"""
+        self.metrics_stop = threading.Event()
+        
+        def run():
+            while not self.metrics_stop.wait(interval):
+                try:
+                    METRICS.write(path)
+                except OSError as e:
+                    report_error('métriques', f"fichier non écrit : {e}")
+            METRICS.write(path)
+        
+        self.metrics_thread = threading.Thread(target=run, name="suruwa-metrics", daemon=True)
+        self.metrics_thread.start()
+        
+    def run_maintenance(self, cancel=None, convert=False):
+        """Passage de maintenance (voir maintain_history), écritures en file validées d'abord"""
+        self.db_writer.flush()
+        return maintain_history(DB_PATH, cancel=cancel, convert=convert)
+        
+    def start_maintenance(self, delay=MAINTENANCE_DELAY, interval=MAINTENANCE_INTERVAL):
+        """Maintenance périodique de la base (thread d'arrière-plan), résultat transmis à maintenance_done"""
+        self.maintenance_stop = threading.Event()
+        
+        def run():
+            wait = delay
+            while not self.maintenance_stop.wait(wait):
+                wait = interval
+                try:
+                    report = self.run_maintenance(self.maintenance_stop)  # sans VACUUM complet : base en service
+                except (ValueError, sqlite3.Error) as e:
+                    report_error('maintenance', e)
+                    continue
+                self.maintenance_done(report)
+        
+        self.maintenance_thread = threading.Thread(target=run, name="suruwa-maintenance", daemon=True)
+        self.maintenance_thread.start()
+        
+    def maintenance_done(self, report):
+        """Fin d'un passage de maintenance (thread de maintenance) ; journalisé en mode service"""
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} maintenance : {maintenance_summary(report)}", flush=True)
+        
+    def zone_reported(self, zone_id, name, risk_level, status, updated_at):
+        """Résultat d'une zone (thread de monitoring) ; journalisé en mode service"""
+        print(f"{updated_at:%Y-%m-%d %H:%M:%S} zone {name} : {risk_level or '-'} ({status})", flush=True)
+        
+    def zones_checked(self, count):
+        """Fin de vérification d'un lot de zones (thread de monitoring)"""
+        
+    def error_reported(self, source, message):
+        """Erreur d'arrière-plan (thread fautif) ; déjà écrite sur stderr en mode service"""
+        
+    def alert_recorded(self, alert_id, zone, risk_level):
+        """Alerte automatique enregistrée (thread d'écriture) ; journalisée en mode service"""
+        print(f"{datetime.now():%Y-%m-%d %H:%M:%S} alerte #{alert_id} déclenchée : {zone} ({risk_level})",
+              flush=True)
+        
+    def alert_progressed(self, alert_id, status, sent, failed):
+        """Avancement d'une diffusion, après persistance (thread d'écriture)"""
+        if status != DELIVERY_RUNNING:
+            print(f"{datetime.now():%Y-%m-%d %H:%M:%S} alerte #{alert_id} : {status} "
+                  f"({sent} envois, {failed} échecs)", flush=True)
+        
+    def shutdown(self):
+        """Arrêt propre : monitoring et diffusion arrêtés, écritures validées, connexions fermées"""
+        if self.error_reported in ERROR_HANDLERS:
+            ERROR_HANDLERS.remove(self.error_reported)
+        if hasattr(self, 'export_cancel'):
+            self.export_cancel.set()
+        if hasattr(self, 'import_cancel'):
+            self.import_cancel.set()
+        if hasattr(self, 'metrics_stop'):
+            self.metrics_stop.set()
+            self.metrics_thread.join(5)
+        if hasattr(self, 'maintenance_stop'):
+            self.maintenance_stop.set()
+            self.maintenance_thread.join(5)
+        if hasattr(self, 'zone_scheduler'):
+            self.zone_scheduler.stop()
+        if hasattr(self, 'alert_dispatcher'):
+            self.alert_dispatcher.stop()
+        if hasattr(self, 'db_writer'):
+            self.db_writer.close()
+        if hasattr(self, 'weather_client'):
+            self.weather_client.close()
+        if hasattr(self, 'weather_cache'):
+            self.weather_cache.close()
+        if hasattr(self, 'conn'):
+            self.conn.close()
+
+
+class SuruwaApp(SuruwaEngine):
+    """Application de bureau Tkinter construite sur le moteur"""
+    def __init__(self, report_startup=False):
+        import_gui()
+        self.report_startup = report_startup
         self.root = tk.Tk()
         self.root.title("SURUWA - Système de Prévention des Inondations")
         self.root.geometry("1200x800")
@@ -25,19 +4091,33 @@ class SuruwaApp:
         self.setup_styles()
         
         # Variables
-        self.API_KEY = "bcfbca71e682918b20ab37cb390f581a"
         self.current_alerts = []
         self.weather_history = []
         self.user_preferences = {}
         
-        # Base de données
-        self.init_database()
+        # Moteur : météo, risque, base de données, diffusion des alertes
+        super().__init__()
+        
+        # Tuiles hors ligne servies localement, puis génération des cartes (cache disque)
+        self.tile_store = TileStore()
+        self.tile_server = TileServer(self.tile_store)
+        self.tile_server.start()
+        self.map_renderer = MapRenderer(tile_url=self.tile_server.url_template,
+                                        assets_url=self.tile_server.assets_url)
         
         # Interface utilisateur
-        self.create_interface()
+        with startup_step('interface'):
+            self.create_interface()
         
         # Démarrage du système de monitoring
-        self.start_monitoring()
+        with startup_step('monitoring'):
+            self.start_monitoring()
+        
+        # Fermeture de la fenêtre : validation des écritures en attente
+        self.root.protocol("WM_DELETE_WINDOW", self.shutdown)
+        
+        # Fin du démarrage à froid : première apparition de la fenêtre
+        self.root.bind('<Map>', self._on_first_map, add='+')
         
     def setup_styles(self):
         """Configuration des styles visuels"""
@@ -60,58 +4140,53 @@ class SuruwaApp:
                        foreground='red',
                        background='#fff0f0')
         
-    def init_database(self):
-        """Initialisation de la base de données SQLite"""
-        self.conn = sqlite3.connect('suruwa.db')
-        cursor = self.conn.cursor()
-        
-        # Table pour l'historique météo
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS weather_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                city TEXT,
-                temperature REAL,
-                humidity REAL,
-                precipitation REAL,
-                risk_level TEXT,
-                timestamp DATETIME
-            )
-        ''')
-        
-        # Table pour les alertes
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS alerts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                zone TEXT,
-                message TEXT,
-                risk_level TEXT,
-                timestamp DATETIME,
-                status TEXT
-            )
-        ''')
-        
-        self.conn.commit()
-        
     def create_interface(self):
         """Création de l'interface utilisateur"""
         # Menu principal
         self.create_menu()
         
-        # Notebook avec onglets
+        # Notebook avec onglets, construits à leur première sélection
         self.notebook = ttk.Notebook(self.root)
+        self.tab_builders = {}
         
         # Onglets
-        self.create_citizen_tab()
-        self.create_admin_tab()
-        self.create_monitoring_tab()
-        self.create_analytics_tab()
-        self.create_settings_tab()
+        self.add_lazy_tab('citizen_frame', "👥 Espace Citoyen", self.create_citizen_tab)
+        self.add_lazy_tab('admin_frame', "🛠️ Administration", self.create_admin_tab)
+        self.add_lazy_tab('monitoring_frame', "📡 Monitoring", self.create_monitoring_tab)
+        self.add_lazy_tab('analytics_frame', "📊 Analytiques", self.create_analytics_tab)
+        self.add_lazy_tab('settings_frame', "⚙️ Paramètres", self.create_settings_tab)
+        
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        self.build_tab(self.citizen_frame)
         
         self.notebook.pack(fill='both', expand=True, padx=10, pady=5)
         
         # Barre de statut
         self.create_status_bar()
         
+    def add_lazy_tab(self, attribute, title, builder):
+        """Ajout d'un onglet vide dont le contenu sera construit à la demande"""
+        frame = ttk.Frame(self.notebook)
+        setattr(self, attribute, frame)
+        self.notebook.add(frame, text=title)
+        self.tab_builders[str(frame)] = builder
+        
+    def on_tab_changed(self, event=None):
+        """Construction de l'onglet sélectionné s'il ne l'est pas encore"""
+        self.build_tab(self.notebook.select())
+        
+    def build_tab(self, frame):
+        """Construction du contenu d'un onglet (une seule fois)"""
+        builder = self.tab_builders.pop(str(frame), None)
+        if builder is not None:
+            start = time.perf_counter()
+            builder()
+            STARTUP_TIMINGS[f"onglet {builder.__name__}"] = time.perf_counter() - start
+            
+    def tab_built(self, frame):
+        """Indique si le contenu d'un onglet a déjà été construit"""
+        return str(frame) not in self.tab_builders
+        
     def create_menu(self):
         """Création du menu"""
         menubar = tk.Menu(self.root)
@@ -123,19 +4198,17 @@ class SuruwaApp:
         file_menu.add_command(label="Exporter données", command=self.export_data)
         file_menu.add_command(label="Importer données", command=self.import_data)
         file_menu.add_separator()
-        file_menu.add_command(label="Quitter", command=self.root.quit)
+        file_menu.add_command(label="Quitter", command=self.shutdown)
         
         # Menu Aide
         help_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="Aide", menu=help_menu)
         help_menu.add_command(label="Guide d'utilisation", command=self.show_help)
+        help_menu.add_command(label="Rapport de démarrage", command=self.show_startup_report)
         help_menu.add_command(label="À propos", command=self.show_about)
         
     def create_citizen_tab(self):
         """Onglet Espace Citoyen"""
-        self.citizen_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.citizen_frame, text="👥 Espace Citoyen")
-        
         # Titre avec logo
         title_frame = tk.Frame(self.citizen_frame, bg="#2c5aa0")
         title_frame.pack(fill='x', pady=(0, 10))
@@ -162,6 +4235,8 @@ class SuruwaApp:
         
         self.localite_entry = tk.Entry(search_input_frame, font=('Arial', 12), width=30)
         self.localite_entry.pack(side='left', padx=(0, 10))
+        self.localite_entry.bind('<KeyRelease>', self.update_suggestions)
+        self.localite_entry.bind('<Down>', self.focus_suggestions)
         
         search_btn = tk.Button(search_input_frame, text="🔎 Analyser",
                               command=self.analyser_risque,
@@ -173,6 +4248,13 @@ class SuruwaApp:
                            bg="#2196F3", fg="white", font=('Arial', 10, 'bold'))
         gps_btn.pack(side='left')
         
+        # Suggestions d'autocomplétion (affichées pendant la saisie)
+        self.search_input_frame = search_input_frame
+        self.suggestions_list = tk.Listbox(search_frame, height=6, font=('Arial', 11))
+        self.suggestions_list.bind('<ButtonRelease-1>', self.apply_suggestion)
+        self.suggestions_list.bind('<Return>', self.apply_suggestion)
+        self.suggestions_list.bind('<Escape>', lambda e: self.hide_suggestions())
+        
         # Section résultats
         results_frame = tk.LabelFrame(main_frame, text="📊 Analyse des Risques", 
                                     font=('Arial', 12, 'bold'), padx=10, pady=10)
@@ -228,9 +4310,6 @@ class SuruwaApp:
         
     def create_admin_tab(self):
         """Onglet Administrateur"""
-        self.admin_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.admin_frame, text="🛠️ Administration")
-        
         # Authentification
         auth_frame = tk.LabelFrame(self.admin_frame, text="🔐 Authentification", 
                                  font=('Arial', 12, 'bold'), padx=10, pady=10)
@@ -269,13 +4348,19 @@ class SuruwaApp:
                                  values=["Faible", "Modéré", "Élevé", "Critique"])
         risk_combo.grid(row=1, column=1, padx=10, pady=5)
         
-        tk.Label(self.alert_frame, text="Message d'alerte :").grid(row=2, column=0, sticky='nw', pady=5)
+        tk.Label(self.alert_frame, text="Type d'alerte :").grid(row=2, column=0, sticky='w', pady=5)
+        self.admin_alert_type = tk.StringVar(value=ALERT_TYPES['flood'])
+        type_combo = ttk.Combobox(self.alert_frame, textvariable=self.admin_alert_type,
+                                  values=list(ALERT_TYPES.values()), state='readonly')
+        type_combo.grid(row=2, column=1, padx=10, pady=5)
+        
+        tk.Label(self.alert_frame, text="Message d'alerte :").grid(row=3, column=0, sticky='nw', pady=5)
         self.message_text = tk.Text(self.alert_frame, width=50, height=5, font=('Arial', 10))
-        self.message_text.grid(row=2, column=1, padx=10, pady=5)
+        self.message_text.grid(row=3, column=1, padx=10, pady=5)
         
         # Boutons d'action admin
         admin_buttons = tk.Frame(self.alert_frame)
-        admin_buttons.grid(row=3, column=0, columnspan=2, pady=15)
+        admin_buttons.grid(row=4, column=0, columnspan=2, pady=15)
         
         send_btn = tk.Button(admin_buttons, text="📤 Envoyer Alerte",
                             command=self.send_alert,
@@ -297,9 +4382,6 @@ class SuruwaApp:
         
     def create_monitoring_tab(self):
         """Onglet Monitoring en temps réel"""
-        self.monitoring_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.monitoring_frame, text="📡 Monitoring")
-        
         # Contrôles
         control_frame = tk.Frame(self.monitoring_frame)
         control_frame.pack(fill='x', padx=20, pady=10)
@@ -326,6 +4408,14 @@ class SuruwaApp:
         
         self.zones_tree.pack(fill='both', expand=True)
         
+        # Dernier état connu des zones enregistrées
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT id, name, risk_level, last_update, status FROM monitoring_zones")
+        for zone_id, name, risk, last_update, status in cursor.fetchall():
+            last = last_update[:16] if last_update else "Jamais"
+            self.zones_tree.insert('', 'end', iid=str(zone_id),
+                                   values=(name, risk or "En attente...", last, status or "Actif"))
+        
         # Boutons de contrôle
         control_buttons = tk.Frame(self.monitoring_frame)
         control_buttons.pack(fill='x', padx=20, pady=10)
@@ -340,10 +4430,68 @@ class SuruwaApp:
                                   bg="#F44336", fg="white", font=('Arial', 10, 'bold'))
         remove_zone_btn.pack(side='left', padx=10)
         
+        situation_btn = tk.Button(control_buttons, text="🗺️ Carte de situation",
+                                  command=self.show_situation_map,
+                                  bg="#2196F3", fg="white", font=('Arial', 10, 'bold'))
+        situation_btn.pack(side='left', padx=10)
+        
+        # Diagnostics : durées des chemins critiques, compteurs et files d'attente
+        diagnostics_frame = tk.LabelFrame(self.monitoring_frame, text="🩺 Diagnostics",
+                                          font=('Arial', 12, 'bold'), padx=10, pady=10)
+        diagnostics_frame.pack(fill='x', padx=20, pady=(0, 10))
+        
+        columns = ('Mesure', 'Nombre', 'Moyenne (ms)', 'p50 (ms)', 'p95 (ms)')
+        self.diagnostics_tree = ttk.Treeview(diagnostics_frame, columns=columns, show='headings', height=6)
+        for col in columns:
+            self.diagnostics_tree.heading(col, text=col)
+            self.diagnostics_tree.column(col, width=220 if col == 'Mesure' else 90, anchor='w' if col == 'Mesure' else 'e')
+        self.diagnostics_tree.pack(fill='x')
+        
+        self.diagnostics_counters = tk.Label(diagnostics_frame, justify='left', anchor='w',
+                                             wraplength=900, font=('Arial', 9))
+        self.diagnostics_counters.pack(fill='x', pady=(5, 0))
+        
+        tk.Button(diagnostics_frame, text="💾 Exporter (Prometheus)", command=self.export_metrics_file,
+                  bg="#607D8B", fg="white", font=('Arial', 9, 'bold')).pack(anchor='e', pady=(5, 0))
+        self.refresh_diagnostics()
+        
+    def refresh_diagnostics(self):
+        """Mise à jour du panneau de diagnostic, puis nouvelle échéance"""
+        timings, values = METRICS.summary()
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for name, count, mean, p50, p95 in timings:
+            self.diagnostics_tree.insert('', 'end', values=(name, count, f"{mean:.1f}", f"{p50:.1f}", f"{p95:.1f}"))
+        self.diagnostics_counters.config(text="   ".join(f"{name} : {value}" for name, value in values))
+        self.root.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics)
+        
+    def export_metrics_file(self):
+        """Enregistrement des métriques au format Prometheus"""
+        filename = filedialog.asksaveasfilename(defaultextension=".prom", initialfile=os.path.basename(METRICS_PATH),
+                                                filetypes=[("Métriques Prometheus", "*.prom"), ("Texte", "*.txt")])
+        if filename:
+            METRICS.write(filename)
+            self.update_status(f"Métriques exportées : {filename}")
+        
     def create_analytics_tab(self):
         """Onglet Analytiques"""
-        self.analytics_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.analytics_frame, text="📊 Analytiques")
+        # Choix de la zone et de la période
+        controls = tk.Frame(self.analytics_frame)
+        controls.pack(fill='x', padx=20, pady=(10, 0))
+        
+        tk.Label(controls, text="Zone :").pack(side='left')
+        self.analytics_zone = tk.StringVar()
+        self.analytics_zone_combo = ttk.Combobox(controls, textvariable=self.analytics_zone, width=25)
+        self.analytics_zone_combo.pack(side='left', padx=(0, 10))
+        self.analytics_zone_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_analytics())
+        
+        tk.Label(controls, text="Période :").pack(side='left')
+        self.analytics_period = tk.StringVar(value="30 derniers jours")
+        period_combo = ttk.Combobox(controls, textvariable=self.analytics_period, state='readonly',
+                                    values=["30 derniers jours", "48 dernières heures"])
+        period_combo.pack(side='left', padx=(0, 10))
+        period_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_analytics())
+        
+        tk.Button(controls, text="🔄 Actualiser", command=self.refresh_analytics).pack(side='left')
         
         # Frame pour les graphiques
         graph_frame = tk.Frame(self.analytics_frame)
@@ -351,12 +4499,11 @@ class SuruwaApp:
         
         # Graphique des tendances
         self.create_analytics_chart(graph_frame)
+        self.refresh_analytics()
+        self.schedule_analytics_refresh()
         
     def create_settings_tab(self):
         """Onglet Paramètres"""
-        self.settings_frame = ttk.Frame(self.notebook)
-        self.notebook.add(self.settings_frame, text="⚙️ Paramètres")
-        
         # Paramètres généraux
         general_frame = tk.LabelFrame(self.settings_frame, text="🔧 Paramètres Généraux", 
                                     font=('Arial', 12, 'bold'), padx=10, pady=10)
@@ -389,6 +4536,39 @@ class SuruwaApp:
         self.humidity_threshold.set(80)
         self.humidity_threshold.grid(row=1, column=1, padx=10, pady=5)
         
+        # Cartes hors ligne
+        tiles_frame = tk.LabelFrame(self.settings_frame, text="🗺️ Cartes Hors Ligne",
+                                  font=('Arial', 12, 'bold'), padx=10, pady=10)
+        tiles_frame.pack(fill='x', padx=20, pady=10)
+        
+        self.tiles_label = tk.Label(tiles_frame, text=f"Tuiles stockées : {self.tile_store.count()}")
+        self.tiles_label.grid(row=0, column=0, sticky='w', pady=5)
+        
+        tk.Button(tiles_frame, text="⬇️ Pré-charger la zone analysée",
+                  command=self.seed_map_tiles,
+                  bg="#2196F3", fg="white", font=('Arial', 10, 'bold')).grid(row=0, column=1, padx=10, pady=5)
+        
+    def seed_map_tiles(self, radius=0.1, zooms=range(8, 15)):
+        """Pré-chargement des tuiles autour du lieu analysé (thread d'arrière-plan)"""
+        if not hasattr(self, 'current_location'):
+            messagebox.showwarning("Attention", "Effectuez d'abord une analyse de risque.")
+            return
+        
+        lat, lon = self.current_location
+            
+        def progress(done, total):
+            if done % 50 == 0 or done == total:
+                self.root.after(0, lambda: self.update_status(f"Tuiles hors ligne : {done}/{total}"))
+            
+        def seed():
+            added = self.tile_store.seed(lat - radius, lon - radius, lat + radius, lon + radius,
+                                         zooms, self.tile_server.fetch_upstream, progress)
+            total = self.tile_store.count()
+            self.root.after(0, lambda: self.tiles_label.config(text=f"Tuiles stockées : {total}"))
+            self.root.after(0, lambda: self.update_status(f"{added} tuiles ajoutées au stock hors ligne"))
+        
+        threading.Thread(target=seed, daemon=True).start()
+        
     def create_status_bar(self):
         """Barre de statut"""
         self.status_bar = tk.Label(self.root, 
@@ -399,113 +4579,106 @@ class SuruwaApp:
         
     def create_analytics_chart(self, parent):
         """Création du graphique d'analyse"""
-        # Données exemple
-        dates = [datetime.now() - timedelta(days=i) for i in range(30, 0, -1)]
-        risks = np.random.choice(['Faible', 'Modéré', 'Élevé'], 30)
+        Figure = lazy_import('matplotlib.figure').Figure
+        FigureCanvasTkAgg = lazy_import('matplotlib.backends.backend_tkagg').FigureCanvasTkAgg
+        
+        fig = Figure(figsize=(8, 6))
+        axes = fig.subplots(3, 1, sharex=True)
+        self.analytics_fig = fig
+        self.analytics_axes = axes
+        
+        self.analytics_canvas = FigureCanvasTkAgg(fig, parent)
+        self.analytics_canvas.get_tk_widget().pack(fill='both', expand=True)
+        
+    def refresh_analytics(self):
+        """Mise à jour du graphique à partir des tables d'agrégats"""
+        zones = self.list_rollup_zones()
+        self.analytics_zone_combo.config(values=zones)
+        if zones and self.analytics_zone.get() not in zones:
+            self.analytics_zone.set(zones[0])
+        city = self.analytics_zone.get()
+        
+        if self.analytics_period.get() == "48 dernières heures":
+            granularity, fmt = 'hourly', '%Y-%m-%d %H:00'
+            since = (datetime.now() - timedelta(hours=48)).strftime(fmt)
+            title = "48 dernières heures"
+        else:
+            granularity, fmt = 'daily', '%Y-%m-%d'
+            since = (datetime.now() - timedelta(days=30)).strftime(fmt)
+            title = "30 derniers jours"
         
-        fig, ax = plt.subplots(figsize=(8, 4))
+        rows = self.load_rollups(city, granularity, since) if city else []
+        dates = [datetime.strptime(row[0], fmt) for row in rows]
         
-        # Conversion des risques en valeurs numériques
-        risk_values = [1 if r == 'Faible' else 2 if r == 'Modéré' else 3 for r in risks]
+        risk_ax, humidity_ax, precip_ax = self.analytics_axes
+        for ax in self.analytics_axes:
+            ax.clear()
+            ax.grid(True, alpha=0.3)
         
-        ax.plot(dates, risk_values, marker='o', linewidth=2, markersize=4)
-        ax.set_ylim(0, 4)
-        ax.set_ylabel('Niveau de Risque')
-        ax.set_title('Évolution du Risque d\'Inondation (30 derniers jours)')
-        ax.grid(True, alpha=0.3)
+        risk_ax.plot(dates, [row[1] for row in rows], marker='o', linewidth=2, markersize=4)
+        risk_ax.set_ylim(0, 5)
+        risk_ax.set_ylabel('Risque max')
+        risk_ax.set_title(f"Évolution du Risque d'Inondation - {city or 'aucune donnée'} ({title})")
         
         # Labels pour l'axe Y
-        ax.set_yticks([1, 2, 3])
-        ax.set_yticklabels(['Faible', 'Modéré', 'Élevé'])
+        risk_ax.set_yticks([1, 2, 3, 4])
+        risk_ax.set_yticklabels(['Faible', 'Modéré', 'Élevé', 'Critique'])
         
-        canvas = FigureCanvasTkAgg(fig, parent)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill='both', expand=True)
+        humidity_ax.plot(dates, [row[2] for row in rows], color='teal', linewidth=2)
+        humidity_ax.set_ylabel('Humidité moy. (%)')
         
-    def get_weather_with_forecast(self, city):
-        """Récupération météo avec prévisions"""
-        try:
-            # Météo actuelle
-            current_url = f"https://api.openweathermap.org/data/2.5/weather?q={city}&appid={self.API_KEY}&units=metric"
-            current_res = requests.get(current_url).json()
-            
-            if current_res.get("cod") != 200:
-                raise Exception("Ville introuvable")
-            
-            # Prévisions
-            forecast_url = f"https://api.openweathermap.org/data/2.5/forecast?q={city}&appid={self.API_KEY}&units=metric"
-            forecast_res = requests.get(forecast_url).json()
-            
-            current_data = {
-                'temp': current_res["main"]["temp"],
-                'humidity': current_res["main"]["humidity"],
-                'condition': current_res["weather"][0]["description"],
-                'pressure': current_res["main"]["pressure"],
-                'wind_speed': current_res["wind"]["speed"],
-                'lat': current_res["coord"]["lat"],
-                'lon': current_res["coord"]["lon"]
-            }
-            
-            # Analyse des prévisions pour les 24h
-            forecast_data = []
-            for item in forecast_res["list"][:8]:  # 8 prévisions = 24h
-                forecast_data.append({
-                    'time': item["dt_txt"],
-                    'temp': item["main"]["temp"],
-                    'humidity': item["main"]["humidity"],
-                    'precipitation': item.get("rain", {}).get("3h", 0)
-                })
-            
-            return current_data, forecast_data
-            
-        except Exception as e:
-            return None, str(e)
-            
-    def calculate_flood_risk(self, current_data, forecast_data):
-        """Calcul du risque d'inondation basé sur l'IA"""
-        if not current_data or not forecast_data:
-            return "Indéterminé", "Données insuffisantes"
+        width = 0.8 if granularity == 'daily' else 0.8 / 24
+        precip_ax.bar(dates, [row[3] for row in rows], width=width, color='steelblue')
+        precip_ax.set_ylabel('Précip. (mm)')
+        
+        self.analytics_fig.autofmt_xdate()
+        self.analytics_canvas.draw_idle()
+        
+    def schedule_analytics_refresh(self):
+        """Actualisation périodique du graphique lorsque l'onglet est affiché"""
+        if self.notebook.select() == str(self.analytics_frame):
+            self.refresh_analytics()
+        self.root.after(ANALYTICS_REFRESH_MS, self.schedule_analytics_refresh)
+        
+    def update_suggestions(self, event=None):
+        """Autocomplétion de la localité à partir du répertoire hors ligne"""
+        if event is not None and event.keysym in ('Down', 'Up', 'Return', 'Tab'):
+            return
+        if event is not None and event.keysym == 'Escape':
+            self.hide_suggestions()
+            return
+        
+        suggestions = self.gazetteer.complete(self.localite_entry.get())
+        if not suggestions:
+            self.hide_suggestions()
+            return
+        
+        self.suggestions_list.delete(0, tk.END)
+        for label in suggestions:
+            self.suggestions_list.insert(tk.END, label)
+        self.suggestions_list.pack(fill='x', after=self.search_input_frame)
+        
+    def focus_suggestions(self, event=None):
+        """Passage du clavier à la liste des suggestions"""
+        if self.suggestions_list.winfo_ismapped():
+            self.suggestions_list.focus_set()
+            self.suggestions_list.selection_clear(0, tk.END)
+            self.suggestions_list.selection_set(0)
+            self.suggestions_list.activate(0)
+        
+    def apply_suggestion(self, event=None):
+        """Reprise de la suggestion choisie dans le champ de recherche"""
+        selection = self.suggestions_list.curselection()
+        if selection:
+            self.localite_entry.delete(0, tk.END)
+            self.localite_entry.insert(0, self.suggestions_list.get(selection[0]))
+        self.hide_suggestions()
+        self.localite_entry.focus_set()
+        
+    def hide_suggestions(self):
+        """Masquage de la liste des suggestions"""
+        self.suggestions_list.pack_forget()
         
-        risk_score = 0
-        factors = []
-        
-        # Facteur humidité
-        if current_data['humidity'] > 85:
-            risk_score += 3
-            factors.append("Humidité très élevée")
-        elif current_data['humidity'] > 70:
-            risk_score += 2
-            factors.append("Humidité élevée")
-        
-        # Facteur précipitations prévues
-        total_precip = sum(f['precipitation'] for f in forecast_data)
-        if total_precip > 50:
-            risk_score += 4
-            factors.append("Fortes précipitations prévues")
-        elif total_precip > 20:
-            risk_score += 2
-            factors.append("Précipitations modérées prévues")
-        
-        # Facteur pression atmosphérique
-        if current_data['pressure'] < 1000:
-            risk_score += 2
-            factors.append("Basse pression")
-        
-        # Facteur vent
-        if current_data['wind_speed'] > 15:
-            risk_score += 1
-            factors.append("Vents forts")
-        
-        # Détermination du niveau de risque
-        if risk_score >= 7:
-            return "Critique", factors
-        elif risk_score >= 5:
-            return "Élevé", factors
-        elif risk_score >= 3:
-            return "Modéré", factors
-        else:
-            return "Faible", factors
-            
     def analyser_risque(self):
         """Analyse complète du risque"""
         city = self.localite_entry.get().strip()
@@ -513,6 +4686,7 @@ class SuruwaApp:
             messagebox.showerror("Erreur", "Veuillez entrer une localité.")
             return
         
+        self.hide_suggestions()
         self.update_status("Analyse en cours...")
         
         # Thread pour éviter le blocage de l'interface
@@ -547,6 +4721,11 @@ class SuruwaApp:
 🌪️ Vent: {current_data['wind_speed']} m/s
 📊 Pression: {current_data['pressure']} hPa"""
         
+        if current_data.get('stale'):
+            cached_at = current_data.get('cached_at')
+            when = datetime.fromtimestamp(cached_at).strftime('%d/%m %H:%M') if cached_at else "?"
+            weather_info += f"\n⚠️ Hors ligne : dernières données connues ({when})"
+        
         self.weather_label.config(text=weather_info)
         
         # Indicateur de risque
@@ -555,7 +4734,8 @@ class SuruwaApp:
         self.risk_text.config(text=risk_level, fg=colors.get(risk_level, "gray"))
         
         # Conseils adaptés
-        tips = self.get_safety_tips(risk_level, factors)
+        tips = self.get_safety_tips(risk_level, factors,
+                                    self.nearest_shelters(current_data['lat'], current_data['lon']))
         self.tips_text.delete('1.0', tk.END)
         self.tips_text.insert('1.0', tips)
         
@@ -563,7 +4743,7 @@ class SuruwaApp:
         self.current_location = (current_data['lat'], current_data['lon'])
         self.current_city = self.localite_entry.get()
         
-    def get_safety_tips(self, risk_level, factors):
+    def get_safety_tips(self, risk_level, factors, shelters=()):
         """Génération de conseils de sécurité"""
         base_tips = "🔰 CONSEILS DE SÉCURITÉ:\n\n"
         
@@ -580,6 +4760,11 @@ class SuruwaApp:
         if factors:
             tips += f"\n\n⚠️ FACTEURS DE RISQUE DÉTECTÉS:\n• " + "\n• ".join(factors)
         
+        # Refuges les plus proches
+        if shelters:
+            tips += "\n\n🏥 REFUGES LES PLUS PROCHES:\n• " + "\n• ".join(
+                f"{name} ({distance:.1f} km)" for name, _, _, distance in shelters)
+        
         return tips
         
     def show_map(self):
@@ -589,72 +4774,10 @@ class SuruwaApp:
             return
         
         lat, lon = self.current_location
+        map_path = self.render_risk_map(self.map_renderer, lat, lon, self.current_city,
+                                        self.risk_text.cget('text'))
+        webbrowser.open(pathlib.Path(map_path).as_uri())
         
-        # Création de la carte avec couches multiples
-        m = folium.Map(location=[lat, lon], zoom_start=10)
-        
-        # Marqueur principal
-        folium.Marker(
-            [lat, lon],
-            popup=f"📍 {self.current_city}\n🌊 Risque: {self.risk_text.cget('text')}",
-            tooltip=f"Zone analysée: {self.current_city}",
-            icon=folium.Icon(color='red' if self.risk_text.cget('text') in ['Élevé', 'Critique'] else 'green')
-        ).add_to(m)
-        
-        # Couche des zones inondables (simulation)
-        self.add_flood_zones(m, lat, lon)
-        
-        # Couche des points d'évacuation
-        self.add_evacuation_points(m, lat, lon)
-        
-        # Sauvegarde et ouverture
-        map_path = os.path.join(os.getcwd(), "suruwa_map.html")
-        m.save(map_path)
-        webbrowser.open(f"file://{map_path}")
-        
-    def add_flood_zones(self, map_obj, lat, lon):
-        """Ajout des zones inondables à la carte"""
-        # Simulation de zones inondables autour de la position
-        import random
-        
-        for i in range(3):
-            # Génération de coordonnées aléatoires dans un rayon
-            offset_lat = random.uniform(-0.01, 0.01)
-            offset_lon = random.uniform(-0.01, 0.01)
-            
-            zone_coords = [
-                [lat + offset_lat, lon + offset_lon],
-                [lat + offset_lat + 0.005, lon + offset_lon],
-                [lat + offset_lat + 0.005, lon + offset_lon + 0.005],
-                [lat + offset_lat, lon + offset_lon + 0.005]
-            ]
-            
-            folium.Polygon(
-                zone_coords,
-                color='blue',
-                fill=True,
-                fillColor='lightblue',
-                fillOpacity=0.3,
-                popup=f"Zone inondable #{i+1}",
-                tooltip="Zone à risque d'inondation"
-            ).add_to(map_obj)
-            
-    def add_evacuation_points(self, map_obj, lat, lon):
-        """Ajout des points d'évacuation"""
-        evacuation_points = [
-            (lat + 0.005, lon + 0.005, "École Primaire"),
-            (lat - 0.005, lon + 0.005, "Centre Communautaire"),
-            (lat + 0.005, lon - 0.005, "Hôpital Local")
-        ]
-        
-        for e_lat, e_lon, name in evacuation_points:
-            folium.Marker(
-                [e_lat, e_lon],
-                popup=f"🏥 Point d'évacuation\n{name}",
-                tooltip=f"Refuge: {name}",
-                icon=folium.Icon(color='green', icon='home')
-            ).add_to(map_obj)
-            
     def get_gps_location(self):
         """Simulation de récupération GPS"""
         # En réalité, on utiliserait une API de géolocalisation
@@ -668,16 +4791,21 @@ class SuruwaApp:
         history_window.title("📈 Historique des Analyses")
         history_window.geometry("800x600")
         
-        # Récupération des données
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT city, temperature, humidity, risk_level, timestamp 
-            FROM weather_history 
-            ORDER BY timestamp DESC 
-            LIMIT 50
-        """)
+        # Filtres
+        filter_frame = tk.Frame(history_window)
+        filter_frame.pack(fill='x', padx=10, pady=(10, 0))
+        
+        tk.Label(filter_frame, text="Ville :").pack(side='left')
+        city_entry = tk.Entry(filter_frame, width=15)
+        city_entry.pack(side='left', padx=(0, 10))
         
-        data = cursor.fetchall()
+        tk.Label(filter_frame, text="Du (AAAA-MM-JJ) :").pack(side='left')
+        start_entry = tk.Entry(filter_frame, width=12)
+        start_entry.pack(side='left', padx=(0, 10))
+        
+        tk.Label(filter_frame, text="Au :").pack(side='left')
+        end_entry = tk.Entry(filter_frame, width=12)
+        end_entry.pack(side='left', padx=(0, 10))
         
         # Création du tableau
         columns = ('Ville', 'Temp (°C)', 'Humidité (%)', 'Risque', 'Date/Heure')
@@ -687,39 +4815,108 @@ class SuruwaApp:
             tree.heading(col, text=col)
             tree.column(col, width=120)
         
-        for row in data:
-            tree.insert('', 'end', values=row)
-        
         tree.pack(fill='both', expand=True, padx=10, pady=10)
         
-        # Bouton export
-        export_btn = tk.Button(history_window, text="💾 Exporter CSV",
-                              command=lambda: self.export_history_csv(data),
+        # Navigation par curseur : pile des clés de début de chaque page
+        state = {'filters': (None, None, None), 'pages': [None], 'data': []}
+        nav_frame = tk.Frame(history_window)
+        nav_frame.pack(pady=10)
+        
+        def load_page():
+            city, start, end = state['filters']
+            rows = self.fetch_history_page(city, start, end, after=state['pages'][-1])
+            has_more = len(rows) > HISTORY_PAGE_SIZE
+            rows = rows[:HISTORY_PAGE_SIZE]
+            
+            tree.delete(*tree.get_children())
+            for row in rows:
+                tree.insert('', 'end', values=row[1:])
+            
+            state['data'] = [row[1:] for row in rows]
+            state['next'] = (rows[-1][5], rows[-1][0]) if has_more else None
+            page_label.config(text=f"Page {len(state['pages'])}")
+            prev_btn.config(state='normal' if len(state['pages']) > 1 else 'disabled')
+            next_btn.config(state='normal' if has_more else 'disabled')
+            
+        def apply_filters():
+            try:
+                start = datetime.strptime(start_entry.get().strip(), '%Y-%m-%d') if start_entry.get().strip() else None
+                end = datetime.strptime(end_entry.get().strip(), '%Y-%m-%d') + timedelta(days=1) if end_entry.get().strip() else None
+            except ValueError:
+                messagebox.showerror("Erreur", "Dates attendues au format AAAA-MM-JJ.", parent=history_window)
+                return
+            state['filters'] = (city_entry.get().strip() or None, start, end)
+            state['pages'] = [None]
+            load_page()
+            
+        def next_page():
+            state['pages'].append(state['next'])
+            load_page()
+            
+        def prev_page():
+            state['pages'].pop()
+            load_page()
+        
+        tk.Button(filter_frame, text="🔎 Filtrer", command=apply_filters).pack(side='left')
+        
+        prev_btn = tk.Button(nav_frame, text="◀ Précédent", command=prev_page)
+        prev_btn.pack(side='left', padx=5)
+        page_label = tk.Label(nav_frame, text="Page 1")
+        page_label.pack(side='left', padx=5)
+        next_btn = tk.Button(nav_frame, text="Suivant ▶", command=next_page)
+        next_btn.pack(side='left', padx=5)
+        
+        # Bouton export : tout l'historique filtré, pas seulement la page affichée
+        export_btn = tk.Button(nav_frame, text="💾 Exporter",
+                              command=lambda: self.export_records_file('weather_history', *state['filters'],
+                                                                       parent=history_window),
                               bg="#4CAF50", fg="white")
-        export_btn.pack(pady=10)
+        export_btn.pack(side='left', padx=(20, 0))
         
-    def export_history_csv(self, data):
-        """Export de l'historique en CSV"""
-        import csv
+        load_page()
         
+    def export_records_file(self, table, zone=None, start=None, end=None, parent=None):
+        """Export d'une table filtrée vers un fichier choisi (thread d'arrière-plan)"""
+        formats = export_formats()
         filename = filedialog.asksaveasfilename(
-            defaultextension=".csv",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+            parent=parent,
+            defaultextension=".csv.gz",
+            filetypes=[(EXPORT_FORMATS[ext], f"*{ext}") for ext in formats] + [("All files", "*.*")]
         )
-        
         if filename:
-            with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['Ville', 'Température', 'Humidité', 'Risque', 'Date/Heure'])
-                writer.writerows(data)
+            self.run_export([(table, filename)], zone, start, end)
             
-            messagebox.showinfo("Succès", f"Données exportées vers {filename}")
+    def run_export(self, exports, zone=None, start=None, end=None, done_message=None):
+        """Exports [(table, fichier), ...] enchaînés en arrière-plan, avancement dans la barre de statut"""
+        self.export_cancel = threading.Event()
+        
+        def progress(done, total):
+            if done % (EXPORT_CHUNK_ROWS * 10) == 0 or done == total:
+                self.root.after(0, lambda: self.update_status(
+                    f"Export : {done}/{total} lignes ({done * 100 // max(total, 1)} %)"))
             
+        def run():
+            try:
+                counts = [self.export_records(filename, table, zone, start, end, progress, self.export_cancel)
+                          for table, filename in exports]
+            except (ValueError, OSError, sqlite3.Error) as e:
+                error = str(e)
+                self.root.after(0, lambda: messagebox.showerror("Erreur", f"Export impossible : {error}"))
+                self.root.after(0, lambda: self.update_status("Export interrompu"))
+                return
+            if None in counts:
+                return  # export annulé (fermeture de l'application)
+            summary = "\n".join(f"{filename} : {count} lignes" for (_, filename), count in zip(exports, counts))
+            self.root.after(0, lambda: self.update_status(f"Export terminé ({sum(counts)} lignes)"))
+            self.root.after(0, lambda: messagebox.showinfo("Succès", done_message or f"Données exportées :\n{summary}"))
+        
+        threading.Thread(target=run, name="suruwa-export", daemon=True).start()
+        
     def subscribe_alerts(self):
         """Abonnement aux alertes"""
         alert_window = tk.Toplevel(self.root)
         alert_window.title("⚠️ Abonnement aux Alertes")
-        alert_window.geometry("500x400")
+        alert_window.geometry("500x480")
         
         tk.Label(alert_window, text="Configuration des Alertes", 
                 font=('Arial', 16, 'bold')).pack(pady=10)
@@ -734,6 +4931,12 @@ class SuruwaApp:
         phone_entry = tk.Entry(alert_window, width=40, font=('Arial', 11))
         phone_entry.pack(pady=5)
         
+        # Zones suivies
+        tk.Label(alert_window, text="Zones (séparées par « ; ») :").pack(anchor='w', padx=20)
+        zones_entry = tk.Entry(alert_window, width=40, font=('Arial', 11))
+        zones_entry.insert(0, self.localite_entry.get())
+        zones_entry.pack(pady=5)
+        
         # Types d'alertes
         tk.Label(alert_window, text="Types d'alertes :").pack(anchor='w', padx=20, pady=(10, 0))
         
@@ -751,21 +4954,18 @@ class SuruwaApp:
         def save_subscription():
             email = email_entry.get()
             phone = phone_entry.get()
+            zones = [zone for zone in zones_entry.get().split(';') if zone.strip()]
+            alert_types = [alert_type for alert_type, var in (('flood', flood_var), ('weather', weather_var),
+                                                                ('emergency', emergency_var)) if var.get()]
             
-            if email or phone:
-                # Simulation de sauvegarde
-                self.user_preferences.update({
-                    'email': email,
-                    'phone': phone,
-                    'flood_alerts': flood_var.get(),
-                    'weather_alerts': weather_var.get(),
-                    'emergency_alerts': emergency_var.get()
-                })
-                
+            if not (email or phone):
+                messagebox.showerror("Erreur", "Veuillez renseigner au moins un moyen de contact.")
+            elif not zones:
+                messagebox.showerror("Erreur", "Veuillez indiquer au moins une zone.")
+            else:
+                self.db_writer.execute_group(subscription_statements(email, phone, zones, alert_types))
                 messagebox.showinfo("Succès", "Abonnement enregistré avec succès!")
                 alert_window.destroy()
-            else:
-                messagebox.showerror("Erreur", "Veuillez renseigner au moins un moyen de contact.")
         
         tk.Button(alert_window, text="💾 Enregistrer",
                  command=save_subscription,
@@ -796,38 +4996,33 @@ class SuruwaApp:
         """Envoi d'une alerte"""
         zone = self.zone_entry.get()
         risk = self.admin_risk.get()
+        alert_type = next(key for key, label in ALERT_TYPES.items() if label == self.admin_alert_type.get())
         message = self.message_text.get("1.0", tk.END).strip()
         
         if not zone or not message:
             messagebox.showerror("Erreur", "Veuillez remplir tous les champs.")
             return
         
-        # Sauvegarde en base
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO alerts (zone, message, risk_level, timestamp, status)
-            VALUES (?, ?, ?, ?, ?)
-        """, (zone, message, risk, datetime.now(), "Actif"))
-        
-        self.conn.commit()
-        
-        # Simulation d'envoi
-        self.simulate_alert_sending(zone, risk, message)
-        
-        # Mise à jour de la liste
-        self.load_active_alerts()
+        # Sauvegarde en base (liste mise à jour une fois l'écriture validée)
+        saved = self.db_writer.execute("""
+            INSERT INTO alerts (zone, message, risk_level, timestamp, status, alert_type, delivery_status)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (zone, message, risk, datetime.now(), "Actif", alert_type, DELIVERY_PENDING))
+        saved.add_done_callback(lambda f: self.root.after(0, self.load_active_alerts))
+        saved.add_done_callback(lambda f: f.exception() or self.add_situation_alert(f.result(), zone, risk))
         
-        messagebox.showinfo("Succès", f"Alerte envoyée à {zone}!")
+        # Diffusion en arrière-plan une fois l'alerte enregistrée
+        saved.add_done_callback(
+            lambda f: f.exception() or self.dispatch_alert(f.result(), zone, risk, message, alert_type))
         
-    def simulate_alert_sending(self, zone, risk, message):
-        """Simulation d'envoi d'alerte"""
-        # En production, ceci enverrait des SMS, emails, etc.
-        print(f"📱 SMS envoyé à {zone}")
-        print(f"📧 Email envoyé à {zone}")
-        print(f"📻 Diffusion radio: {message}")
+        messagebox.showinfo("Succès", f"Alerte enregistrée, diffusion en cours vers {zone}.")
         
-        # Notification dans l'interface
-        self.update_status(f"Alerte {risk} envoyée à {zone}")
+    def show_situation_map(self):
+        """Carte nationale : toutes les zones surveillées et les alertes actives, regroupées par zoom"""
+        path = self.map_renderer.render_situation(self.zone_clusters, self.alert_clusters)
+        webbrowser.open(pathlib.Path(path).as_uri())
+        self.update_status(f"Carte de situation : {len(self.zone_clusters.points)} zones, "
+                           f"{len(self.alert_clusters.points)} alertes")
         
     def preview_alert(self):
         """Aperçu de l'alerte"""
@@ -867,17 +5062,9 @@ SURUWA Team
         """Chargement des alertes actives"""
         self.alerts_listbox.delete(0, tk.END)
         
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT zone, risk_level, timestamp, message
-            FROM alerts 
-            WHERE status = 'Actif'
-            ORDER BY timestamp DESC
-        """)
-        
-        for row in cursor.fetchall():
-            zone, risk, timestamp, message = row
-            display_text = f"{zone} - {risk} - {timestamp[:16]}"
+        for row in self.fetch_active_alerts():
+            zone, risk, timestamp, message, delivery = row
+            display_text = f"{zone} - {risk} - {timestamp[:16]} - {delivery or DELIVERY_PENDING}"
             self.alerts_listbox.insert(tk.END, display_text)
             
     def add_monitoring_zone(self):
@@ -896,17 +5083,25 @@ SURUWA Team
         freq_entry.insert(0, "30")
         
         def add_zone():
-            zone = zone_entry.get()
-            frequency = freq_entry.get()
+            zone = zone_entry.get().strip()
+            frequency = freq_entry.get().strip()
             
             if zone and frequency:
-                # Ajout à la liste de surveillance
-                self.zones_tree.insert('', 'end', values=(
-                    zone, 
-                    "En attente...", 
-                    "Jamais", 
-                    "Actif"
-                ))
+                try:
+                    minutes = int(frequency)
+                    if minutes < 1:
+                        raise ValueError
+                except ValueError:
+                    messagebox.showerror("Erreur", "La fréquence doit être un nombre entier de minutes.")
+                    return
+                
+                # Enregistrement de la zone ; son identifiant sert de clé à la liste
+                saved = self.db_writer.execute("""
+                    INSERT INTO monitoring_zones (name, frequency, risk_level, last_update, status)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (zone, minutes, "En attente...", None, "Actif"))
+                saved.add_done_callback(
+                    lambda f: self.root.after(0, lambda: self._zone_added(f.result(), zone, minutes)))
                 
                 messagebox.showinfo("Succès", f"Zone {zone} ajoutée à la surveillance!")
                 zone_window.destroy()
@@ -917,39 +5112,53 @@ SURUWA Team
                  command=add_zone,
                  bg="#4CAF50", fg="white").pack(pady=20)
         
+    def _zone_added(self, zone_id, zone, minutes):
+        """Ajout à la liste et planification d'une zone enregistrée (thread Tk)"""
+        self.zones_tree.insert('', 'end', iid=str(zone_id), values=(
+            zone, 
+            "En attente...", 
+            "Jamais", 
+            "Actif"
+        ))
+        
+        # Première vérification quasi immédiate
+        self.zone_scheduler.add(zone_id, zone, minutes * 60, delay=random.uniform(0, 5))
+        
     def remove_monitoring_zone(self):
         """Suppression d'une zone surveillée"""
         selected = self.zones_tree.selection()
         if selected:
-            self.zones_tree.delete(selected)
+            for iid in selected:
+                self.zone_scheduler.remove(int(iid))
+                self.zone_clusters.remove(int(iid))
+            self.db_writer.executemany("DELETE FROM monitoring_zones WHERE id = ?",
+                                       [(int(iid),) for iid in selected])
+            
+            self.zones_tree.delete(*selected)
             messagebox.showinfo("Succès", "Zone supprimée de la surveillance.")
         else:
             messagebox.showwarning("Attention", "Veuillez sélectionner une zone à supprimer.")
             
-    def start_monitoring(self):
-        """Démarrage du système de monitoring"""
-        def monitor_loop():
-            while True:
-                time.sleep(60)  # Vérification toutes les minutes
-                # Mise à jour du statut des zones surveillées
-                self.update_monitoring_status()
-        
-        threading.Thread(target=monitor_loop, daemon=True).start()
-        
-    def update_monitoring_status(self):
-        """Mise à jour du statut de monitoring"""
-        # Cette fonction serait appelée périodiquement
-        pass
-        
-    def save_weather_data(self, city, data, risk_level):
-        """Sauvegarde des données météo"""
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            INSERT INTO weather_history (city, temperature, humidity, precipitation, risk_level, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (city, data['temp'], data['humidity'], 0, risk_level, datetime.now()))
-        
-        self.conn.commit()
+    def update_monitoring_summary(self):
+        """Résumé du monitoring : zones suivies et requêtes consommées"""
+        if not self.tab_built(self.monitoring_frame):
+            return
+        self.monitoring_status.config(
+            text=f"● Actif - {len(self.zone_scheduler.zones)} zones, "
+                 f"{self.monitoring_checks} vérifications pour {self.weather_client.request_count} requêtes API")
+        
+    def update_monitoring_status(self, zone_id, risk_level, status, updated_at):
+        """Mise à jour du statut de monitoring d'une zone (thread Tk)"""
+        iid = str(zone_id)
+        if not self.tab_built(self.monitoring_frame) or not self.zones_tree.exists(iid):
+            return  # zone supprimée pendant la vérification
+        
+        values = list(self.zones_tree.item(iid, 'values'))
+        if risk_level is not None:
+            values[1] = risk_level
+            values[2] = updated_at.strftime('%Y-%m-%d %H:%M')
+        values[3] = status
+        self.zones_tree.item(iid, values=values)
         
     def update_status(self, message):
         """Mise à jour de la barre de statut"""
@@ -957,32 +5166,39 @@ SURUWA Team
         self.status_bar.config(text=f"© 2025 SuruwaSoft | {timestamp} - {message}")
         
     def export_data(self):
-        """Export des données"""
+        """Export des données : préférences en JSON, historique et alertes complets à côté (CSV compressé)"""
         filename = filedialog.asksaveasfilename(
             defaultextension=".json",
             filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
         )
         
         if filename:
-            # Export des données en JSON
+            base = os.path.splitext(filename)[0]
+            exports = [('weather_history', f"{base}_historique.csv.gz"), ('alerts', f"{base}_alertes.csv.gz")]
+            
+            # Préférences en JSON ; les tables, volumineuses, sont écrites en flux
             export_data = {
                 'preferences': self.user_preferences,
-                'alerts': self.current_alerts,
+                'exports': {table: os.path.basename(path) for table, path in exports},
                 'timestamp': datetime.now().isoformat()
             }
             
             with open(filename, 'w', encoding='utf-8') as f:
                 json.dump(export_data, f, indent=2, ensure_ascii=False)
             
-            messagebox.showinfo("Succès", f"Données exportées vers {filename}")
+            self.run_export(exports, done_message=f"Données exportées vers {filename}\n"
+                                                  f"(historique et alertes : {os.path.basename(base)}_*.csv.gz)")
             
     def import_data(self):
-        """Import des données"""
+        """Import des données : préférences (JSON) ou historique météo en masse (CSV, JSON lignes)"""
         filename = filedialog.askopenfilename(
-            filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
+            filetypes=[("JSON files", "*.json"), ("Historique CSV", "*.csv *.csv.gz *.tsv"),
+                       ("Historique JSON lignes", "*.jsonl *.jsonl.gz *.ndjson *.ndjson.gz"), ("All files", "*.*")]
         )
         
-        if filename:
+        if filename and not filename.endswith('.json'):
+            self.run_import(filename)
+        elif filename:
             try:
                 with open(filename, 'r', encoding='utf-8') as f:
                     data = json.load(f)
@@ -996,6 +5212,36 @@ SURUWA Team
             except Exception as e:
                 messagebox.showerror("Erreur", f"Erreur lors de l'import: {str(e)}")
                 
+    def run_import(self, filename):
+        """Import d'historique en arrière-plan, avancement dans la barre de statut"""
+        self.import_cancel = threading.Event()
+        
+        def progress(imported, fraction):
+            self.root.after(0, lambda: self.update_status(
+                f"Import : {imported} lignes ({fraction * 100:.0f} % du fichier)"))
+            
+        def run():
+            try:
+                report = self.import_records(filename, progress, self.import_cancel)
+            except (ValueError, OSError, sqlite3.Error) as e:
+                error = str(e)
+                self.root.after(0, lambda: messagebox.showerror("Erreur", f"Import impossible : {error}"))
+                self.root.after(0, lambda: self.update_status("Import interrompu"))
+                return
+            if not report['termine']:
+                return  # import annulé (fermeture de l'application), repris au prochain lancement du même fichier
+            if report['deja_importe']:
+                message = f"{filename} a déjà été importé ({report['lignes_importees']} lignes)"
+            else:
+                message = (f"{report['lignes_importees']} lignes importées depuis {filename} "
+                           f"({report['lignes_rejetees']} rejetées, {report['lignes_par_s']} lignes/s)")
+                if report['erreurs']:
+                    message += "\n\n" + "\n".join(report['erreurs'][:5])
+            self.root.after(0, lambda: self.update_status(f"Import terminé ({report['lignes_importees']} lignes)"))
+            self.root.after(0, lambda: messagebox.showinfo("Succès", message))
+        
+        threading.Thread(target=run, name="suruwa-import", daemon=True).start()
+                
     def show_help(self):
         """Affichage de l'aide"""
         help_window = tk.Toplevel(self.root)
@@ -1082,16 +5328,218 @@ en fournissant des outils de prévention accessibles à tous.
         
         messagebox.showinfo("À Propos", about_text)
         
+    def _on_first_map(self, event):
+        """Enregistrement du délai jusqu'à la première fenêtre"""
+        if event.widget is not self.root or 'première fenêtre' in STARTUP_TIMINGS:
+            return
+        STARTUP_TIMINGS['première fenêtre'] = time.perf_counter() - STARTUP_T0
+        
+        if self.report_startup:
+            self.root.after_idle(self._finish_startup_report)
+            
+    def _finish_startup_report(self):
+        """Mode mesure : rapport sur la sortie standard puis fermeture"""
+        print(json.dumps(startup_report(), indent=2, ensure_ascii=False))
+        self.shutdown()
+        
+    def show_startup_report(self):
+        """Affichage du rapport de démarrage"""
+        report = startup_report()
+        lines = [f"⏱️ Première fenêtre : {report['étapes'].get('première fenêtre', '?')} s "
+                 f"(budget {report['budget']} s)", "", "Étapes :"]
+        lines += [f"  • {name} : {t:.3f} s" for name, t in report['étapes'].items()]
+        lines += ["", "Imports à la demande :"]
+        lines += [f"  • {name} : {t:.3f} s" for name, t in report['imports'].items()] or ["  • aucun"]
+        messagebox.showinfo("Rapport de démarrage", "\n".join(lines))
+        
     def run(self):
         """Lancement de l'application"""
         self.root.mainloop()
         
-    def __del__(self):
-        """Nettoyage lors de la fermeture"""
-        if hasattr(self, 'conn'):
-            self.conn.close()
+    def zone_reported(self, zone_id, name, risk_level, status, updated_at):
+        """Résultat d'une zone transmis au thread Tk"""
+        self.root.after(0, lambda: self.update_monitoring_status(zone_id, risk_level, status, updated_at))
+        
+    def zones_checked(self, count):
+        """Résumé du monitoring rafraîchi sur le thread Tk"""
+        self.root.after(0, self.update_monitoring_summary)
+        
+    def maintenance_done(self, report):
+        """Fin d'un passage de maintenance : résumé dans la barre de statut (thread Tk)"""
+        self.root.after(0, lambda: self.update_status(f"Maintenance : {maintenance_summary(report)}"))
+        
+    def error_reported(self, source, message):
+        """Erreur d'arrière-plan affichée dans la barre de statut (thread Tk)"""
+        self.root.after(0, lambda: self.update_status(f"⚠️ Erreur ({source}) : {message}"))
+        
+    def alert_recorded(self, alert_id, zone, risk_level):
+        """Alerte automatique enregistrée : liste des alertes et barre de statut (thread Tk)"""
+        self.root.after(0, self.load_active_alerts)
+        self.root.after(0, lambda: self.update_status(f"Alerte #{alert_id} déclenchée : {zone} ({risk_level})"))
+        
+    def alert_progressed(self, alert_id, status, sent, failed):
+        """Avancement d'une diffusion : liste des alertes et barre de statut (thread Tk)"""
+        if status != DELIVERY_RUNNING:
+            self.root.after(0, self.load_active_alerts)
+        self.root.after(0, lambda: self.update_status(
+            f"Alerte #{alert_id} : {status} ({sent} envois, {failed} échecs)"))
+        
+    def shutdown(self):
+        """Arrêt propre : moteur arrêté, serveur de tuiles fermé, fenêtre détruite"""
+        if hasattr(self, 'tile_server'):
+            self.tile_server.stop()
+            self.tile_store.close()
+        super().shutdown()
+        self.root.destroy()
+
+def serve(api_port=None, metrics_file=None, auto_alerts=True):
+    """Mode service : moteur sans Tkinter (API du risque et fichier de métriques si demandés)
+    jusqu'à un signal d'arrêt ; alertes diffusées d'elles-mêmes quand une zone surveillée devient à risque
+    """
+    signal = lazy_import('signal')
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: stop.set())
+    
+    engine = SuruwaEngine()
+    engine.start_monitoring(auto_alerts=auto_alerts)
+    if metrics_file:
+        engine.export_metrics(metrics_file)
+    print(f"SURUWA en service : {len(engine.zone_scheduler.zones)} zones surveillées "
+          f"({len(engine.alert_dispatcher.channels)} canaux d'alerte)", flush=True)
+    
+    api = None
+    if api_port is not None:
+        api = RiskApiServer(engine, host='0.0.0.0', port=api_port)
+        api.start()
+        print(f"API du risque : http://0.0.0.0:{api.port}/risk?city=... (métriques : /metrics)", flush=True)
+    
+    stop.wait()
+    print("Arrêt en cours : validation des écritures...", flush=True)
+    if api is not None:
+        api.stop()
+    engine.shutdown()
+    return 0
+
+
+def export(path, table='weather_history', zone=None, start=None, end=None):
+    """Mode export : table de la base écrite en flux dans path, avancement affiché"""
+    def progress(done, total):
+        if done % (EXPORT_CHUNK_ROWS * 50) == 0 or done == total:
+            print(f"{done}/{total} lignes ({done * 100 // max(total, 1)} %)", flush=True)
+    
+    try:
+        written = export_table(DB_PATH, path, table, zone, start, end, on_progress=progress)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"Export impossible : {e}", file=sys.stderr)
+        return 1
+    print(f"{written} lignes exportées vers {path}", flush=True)
+    return 0
+
+
+def maintain():
+    """Mode maintenance : rétention appliquée et base compactée (conversion comprise), rapport JSON affiché"""
+    engine = SuruwaEngine()
+    try:
+        report = engine.run_maintenance(convert=True)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"Maintenance impossible : {e}", file=sys.stderr)
+        return 1
+    finally:
+        engine.shutdown()
+    print(json.dumps(report, indent=1, ensure_ascii=False), flush=True)
+    return 0
+
+
+def import_file(path):
+    """Mode import : historique météo chargé en masse depuis path, rapport JSON affiché"""
+    def progress(imported, fraction):
+        print(f"{imported} lignes ({fraction * 100:.0f} % du fichier)", flush=True)
+    
+    # Moteur pour le schéma de la base (tables d'agrégats comprises) et la file d'écriture
+    engine = SuruwaEngine()
+    try:
+        report = engine.import_records(path, on_progress=progress)
+    except (ValueError, OSError, sqlite3.Error) as e:
+        print(f"Import impossible : {e}", file=sys.stderr)
+        return 1
+    finally:
+        engine.shutdown()
+    print(json.dumps(report, indent=1, ensure_ascii=False), flush=True)
+    return 0
+
+
+def main(argv=None):
+    """Point d'entrée en ligne de commande"""
+    global OWM_BASE_URL, RETENTION_RAW_DAYS
+    parser = argparse.ArgumentParser(description="SURUWA - Système de Prévention des Inondations")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="mesurer le démarrage à froid, afficher le rapport puis quitter "
+                             "(code 1 si le budget est dépassé)")
+    parser.add_argument('--serve', action='store_true',
+                        help="mode service sans interface : monitoring et diffusion des alertes "
+                             f"(automatique dès le niveau {AUTO_ALERT_MIN_LEVEL}) jusqu'à SIGINT/SIGTERM")
+    parser.add_argument('--no-auto-alerts', dest='auto_alerts', action='store_false',
+                        help="avec --serve : surveiller sans déclencher d'alerte automatique")
+    parser.add_argument('--api-port', type=int, metavar='PORT',
+                        help=f"avec --serve : API HTTP du risque sur ce port (ex. {RISK_API_PORT})")
+    parser.add_argument('--metrics-file', metavar='FICHIER',
+                        help="avec --serve : métriques Prometheus écrites dans ce fichier "
+                             f"toutes les {METRICS_FILE_INTERVAL} s")
+    parser.add_argument('--profile-slow', type=float, metavar='SECONDES',
+                        default=float(os.environ.get('SURUWA_PROFILE_SLOW') or 0),
+                        help=f"profil par échantillonnage des opérations plus longues que ce seuil, "
+                             f"écrit dans {os.path.basename(PROFILES_DIR)}/ (SURUWA_PROFILE_SLOW)")
+    parser.add_argument('--export', metavar='FICHIER',
+                        help="exporter l'historique (ou --table) puis quitter ; format selon l'extension : "
+                             + ", ".join(EXPORT_FORMATS))
+    parser.add_argument('--maintenance', action='store_true',
+                        help="appliquer la rétention de l'historique et compacter la base puis quitter "
+                             "(convertit une ancienne base au vacuum incrémental)")
+    parser.add_argument('--retention-days', type=int, metavar='JOURS', default=RETENTION_RAW_DAYS,
+                        help="active la purge : jours d'observations brutes conservés, agrégats horaires et "
+                             "journaliers au-delà ; 0 (défaut) : tout garder (SURUWA_RETENTION_DAYS)")
+    parser.add_argument('--import', dest='import_file', metavar='FICHIER',
+                        help="importer en masse un historique météo (CSV ou JSON lignes, .gz accepté) "
+                             "puis quitter ; un import interrompu reprend là où il s'était arrêté")
+    parser.add_argument('--table', choices=sorted(EXPORT_TABLES), default='weather_history',
+                        help="avec --export : table exportée")
+    parser.add_argument('--zone', help="avec --export : ville ou zone d'alerte")
+    parser.add_argument('--since', type=lambda text: datetime.strptime(text, '%Y-%m-%d'), metavar='AAAA-MM-JJ',
+                        help="avec --export : à partir de ce jour")
+    parser.add_argument('--until', type=lambda text: datetime.strptime(text, '%Y-%m-%d') + timedelta(days=1),
+                        metavar='AAAA-MM-JJ', help="avec --export : jusqu'à ce jour inclus")
+    parser.add_argument('--owm-url', metavar='URL',
+                        help="API OpenWeatherMap à utiliser, par exemple le serveur local tools/owm_stub.py "
+                             "(SURUWA_OWM_URL)")
+    args = parser.parse_args(argv)
+    
+    if args.owm_url:
+        OWM_BASE_URL = args.owm_url.rstrip('/')
+    RETENTION_RAW_DAYS = args.retention_days
+
+    if args.profile_slow > 0:
+        METRICS.enable_profiler(args.profile_slow)
+    
+    if args.maintenance:
+        return maintain()
+    
+    if args.import_file:
+        return import_file(args.import_file)
+    
+    if args.export:
+        return export(args.export, args.table, args.zone, args.since, args.until)
+    
+    if args.serve:
+        return serve(args.api_port, args.metrics_file, args.auto_alerts)
+    
+    app = SuruwaApp(report_startup=args.startup_report)
+    app.run()
+    
+    if args.startup_report:
+        return 0 if startup_report()['dans_le_budget'] else 1
+    return 0
 
 # Lancement de l'application
 if __name__ == "__main__":
-    app = SuruwaApp()
-    app.run()
\ No newline at end of file
+    sys.exit(main())
@@ -5,8 +5,30 @@ a = Analysis(
     ['suruwasoft.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    datas=[('assets/leaflet', 'assets/leaflet')],  # Leaflet servi localement (cartes hors ligne)
+    hiddenimports=[
+        # Modules importés à la demande (lazy_import)
+        'requests',
+        'numpy',
+        'matplotlib.figure',
+        'matplotlib.backends.backend_tkagg',
+        'csv',
+        'asyncio',
+        'smtplib',
+        'email.message',
+        'tkinter',
+        'tkinter.ttk',
+        'tkinter.messagebox',
+        'tkinter.filedialog',
+        'signal',
+        'gzip',
+        'zipfile',
+        'importlib.util',
+        'pyarrow',
+        'pyarrow.parquet',
+        'io',
+        'operator',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
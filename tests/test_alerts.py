@@ -0,0 +1,246 @@
+"""Diffusion des alertes contre des serveurs SMTP et HTTP locaux (sans réseau)"""
+import asyncio
+import json
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import suruwasoft  # noqa: E402
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    """Serveur SMTP minimal : chaque transaction est conservée (expéditeur, destinataires, message)"""
+    daemon_threads = True
+    allow_reuse_address = True
+        
+    def __init__(self):
+        self.messages = []
+        super().__init__(('127.0.0.1', 0), SmtpHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+        
+    def handle(self):
+        self.reply("220 sink")
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply("221 bye")
+                return
+            if command in ('EHLO', 'HELO'):
+                self.reply("250 sink")
+            elif command == 'MAIL':
+                sender, recipients = line.partition(':')[2].strip('<> '), []
+                self.reply("250 ok")
+            elif command == 'RCPT':
+                recipients.append(line.partition(':')[2].strip('<> '))
+                self.reply("250 ok")
+            elif command == 'DATA':
+                self.reply("354 go")
+                data = []
+                for raw in iter(self.rfile.readline, b''):
+                    if raw.rstrip(b'\r\n') == b'.':
+                        break
+                    data.append(raw.decode())
+                self.server.messages.append((sender, recipients, ''.join(data)))
+                self.reply("250 queued")
+            else:
+                self.reply("250 ok")
+
+
+class HttpSink(ThreadingHTTPServer):
+    """Passerelle HTTP : corps JSON reçus ; les `failures` premières requêtes répondent 500"""
+    daemon_threads = True
+        
+    def __init__(self, failures=0):
+        self.requests = []
+        self.failures = failures
+        self.lock = threading.Lock()
+        super().__init__(('127.0.0.1', 0), HttpSinkHandler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/send"
+        
+    def close(self):
+        self.shutdown()
+        self.server_close()
+
+
+class HttpSinkHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        with self.server.lock:
+            failing = self.server.failures > 0
+            if failing:
+                self.server.failures -= 1
+            else:
+                self.server.requests.append((time.monotonic(), body))
+        self.send_response(500 if failing else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        
+    def log_message(self, *args):
+        pass
+
+
+RECIPIENTS = [{'phone': f"+22890000{i:03d}", 'email': f"abonne{i}@example.org"} for i in range(7)]
+ALERT = {'id': 1, 'zone': "Lomé", 'risk': "Élevé", 'message': "Montée des eaux"}
+
+
+class AlertDispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.smtp = SmtpSink()
+        self.sms = HttpSink()
+        self.radio = HttpSink()
+        self.progress = []
+        
+    def tearDown(self):
+        for sink in (self.smtp, self.sms, self.radio):
+            sink.close()
+        
+    def dispatch(self, channels, recipients=RECIPIENTS):
+        dispatcher = suruwasoft.AlertDispatcher(channels, progress_interval=0,
+                                                on_progress=lambda *args: self.progress.append(args))
+        dispatcher.start()
+        try:
+            return dispatcher.dispatch(ALERT, iter(recipients)).result(15)
+        finally:
+            dispatcher.stop()
+        
+    def test_every_channel_delivers_in_batches(self):
+        status = self.dispatch([
+            suruwasoft.SmsGatewayChannel(self.sms.url, batch_size=3),
+            suruwasoft.SmtpChannel('127.0.0.1', port=self.smtp.server_address[1], batch_size=4),
+            suruwasoft.WebhookChannel(self.radio.url),
+        ])
+        self.assertEqual(status, suruwasoft.DELIVERY_SENT)
+        
+        # SMS : lots de 3 numéros, chaque abonné une seule fois
+        batches = [body['to'] for _, body in self.sms.requests]
+        self.assertEqual(sorted(len(batch) for batch in batches), [1, 3, 3])
+        self.assertEqual(sorted(sum(batches, [])), sorted(r['phone'] for r in RECIPIENTS))
+        self.assertIn("Lomé", self.sms.requests[0][1]['message'])
+        
+        # Emails : destinataires en copie cachée, lots de 4
+        recipients = [rcpts for _, rcpts, _ in self.smtp.messages]
+        self.assertEqual(sorted(len(rcpts) for rcpts in recipients), [3, 4])
+        self.assertEqual(sorted(sum(recipients, [])), sorted(r['email'] for r in RECIPIENTS))
+        self.assertTrue(all("Subject: [SURUWA] Alerte" in data for _, _, data in self.smtp.messages))
+        
+        # Webhook : une seule diffusion de l'alerte
+        self.assertEqual([body for _, body in self.radio.requests], [ALERT])
+        
+        _, final_status, sent, failed = self.progress[-1]
+        self.assertEqual((final_status, sent, failed), (suruwasoft.DELIVERY_SENT, 7 + 7 + 1, 0))
+        
+    def test_failed_batch_is_retried(self):
+        self.sms.failures = 2
+        status = self.dispatch([suruwasoft.SmsGatewayChannel(self.sms.url, batch_size=10, backoff=0.01)])
+        self.assertEqual(status, suruwasoft.DELIVERY_SENT)
+        self.assertEqual(len(self.sms.requests), 1)
+        
+    def test_exhausted_retries_are_reported(self):
+        self.sms.failures = 100
+        status = self.dispatch([
+            suruwasoft.SmsGatewayChannel(self.sms.url, batch_size=10, retries=1, backoff=0.01),
+            suruwasoft.WebhookChannel(self.radio.url),
+        ])
+        self.assertEqual(status, suruwasoft.DELIVERY_PARTIAL)
+        self.assertEqual(self.progress[-1][2:], (1, len(RECIPIENTS)))
+        
+        self.radio.failures = 100
+        status = self.dispatch([suruwasoft.WebhookChannel(self.radio.url, retries=0)])
+        self.assertEqual(status, suruwasoft.DELIVERY_FAILED)
+        
+    def test_rate_limit_spaces_batches(self):
+        # 2 numéros par seconde, rafale de 2 : 6 numéros par lots de 2 -> au moins 2 s
+        start = time.monotonic()
+        status = self.dispatch([suruwasoft.SmsGatewayChannel(self.sms.url, batch_size=2, concurrency=4,
+                                                             rate=2)], RECIPIENTS[:6])
+        self.assertEqual(status, suruwasoft.DELIVERY_SENT)
+        self.assertGreaterEqual(time.monotonic() - start, 1.9)
+        self.assertEqual(len(self.sms.requests), 3)
+        
+    def test_no_channel(self):
+        self.assertEqual(self.dispatch([]), suruwasoft.DELIVERY_NO_CHANNEL)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_burst_then_rate(self):
+        async def run():
+            bucket = suruwasoft.TokenBucket(rate=20, burst=5)
+            start = time.monotonic()
+            for _ in range(5):
+                await bucket.acquire()
+            burst = time.monotonic() - start
+            for _ in range(10):
+                await bucket.acquire()
+            return burst, time.monotonic() - start
+        
+        burst, total = asyncio.run(run())
+        self.assertLess(burst, 0.1)
+        self.assertGreaterEqual(total, 10 / 20 - 0.05)
+
+
+class DeliveryStatusTest(unittest.TestCase):
+    """Statut de diffusion enregistré dans la table des alertes par le moteur"""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)  # chemins de la base relatifs au répertoire courant
+        self.engine = suruwasoft.SuruwaEngine()
+        self.sms = HttpSink()
+        
+    def tearDown(self):
+        self.engine.shutdown()
+        self.sms.close()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+        
+    def test_delivery_status_is_persisted(self):
+        engine = self.engine
+        engine.alert_dispatcher.stop()
+        engine.alert_dispatcher = suruwasoft.AlertDispatcher(
+            [suruwasoft.SmsGatewayChannel(self.sms.url, batch_size=2)], on_progress=engine._alert_progress)
+        engine.alert_dispatcher.start()
+        
+        for i in range(3):
+            engine.db_writer.execute_group(suruwasoft.subscription_statements(
+                '', f"+2289000000{i}", ["Lomé, TG"], ['flood'])).result(5)
+        engine.db_writer.execute_group(suruwasoft.subscription_statements(
+            '', "+22891111111", ["Kara"], ['flood'])).result(5)
+        alert_id = engine.db_writer.execute(
+            "INSERT INTO alerts (zone, message, risk_level, status, delivery_status) VALUES (?, ?, ?, ?, ?)",
+            ("Lomé", "Montée des eaux", "Élevé", "Actif", suruwasoft.DELIVERY_PENDING)).result(5)
+        
+        status = engine.dispatch_alert(alert_id, "Lomé", "Élevé", "Montée des eaux").result(15)
+        self.assertEqual(status, suruwasoft.DELIVERY_SENT)
+        self.assertTrue(engine.db_writer.flush(5))
+        
+        row = engine.conn.execute("SELECT delivery_status, sent_count, failed_count FROM alerts WHERE id = ?",
+                                  (alert_id,)).fetchone()
+        self.assertEqual(row, (suruwasoft.DELIVERY_SENT, 3, 0))
+        self.assertEqual(sorted(sum((body['to'] for _, body in self.sms.requests), [])),
+                         [f"+2289000000{i}" for i in range(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+"""Moteur sans interface contre le serveur OpenWeatherMap local (tools/owm_stub.py), sans affichage ni réseau"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+import owm_stub  # noqa: E402
+import suruwasoft  # noqa: E402
+
+
+class StubTestCase(unittest.TestCase):
+    """Répertoire de travail temporaire (chemins de la base relatifs) et serveur météo local"""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, self.cwd)
+        self.addCleanup(self.tmp.cleanup)
+        self.stub = self.start_stub(scenario=owm_stub.StormScenario())
+        self.base_url = suruwasoft.OWM_BASE_URL
+        suruwasoft.OWM_BASE_URL = self.url(self.stub)
+        self.addCleanup(setattr, suruwasoft, 'OWM_BASE_URL', self.base_url)
+        
+    def start_stub(self, **options):
+        server = owm_stub.make_server(**options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+        
+    @staticmethod
+    def url(server):
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+class HeadlessEngineTest(StubTestCase):
+    def setUp(self):
+        super().setUp()
+        self.engine = suruwasoft.SuruwaEngine()
+        self.reports = []
+        self.reported = threading.Condition()
+        
+        def zone_reported(zone_id, name, risk_level, status, updated_at):
+            with self.reported:
+                self.reports.append((zone_id, risk_level, status))
+                self.reported.notify_all()
+        
+        self.engine.zone_reported = zone_reported
+        
+    def tearDown(self):
+        if self.engine is not None:
+            self.engine.shutdown()
+        
+    def test_startup_and_shutdown_without_display(self):
+        self.assertNotIn('tkinter', sys.modules)
+        tables = {row[0] for row in self.engine.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertTrue({'weather_history', 'alerts', 'subscribers', 'subscriber_zones', 'monitoring_zones',
+                         'weather_rollup_hourly', 'weather_rollup_daily'} <= tables)
+        self.engine.start_monitoring(auto_alerts=True)
+        
+        self.engine.shutdown()
+        self.assertFalse(self.engine.db_writer.thread.is_alive())
+        self.assertFalse(self.engine.alert_dispatcher.thread.is_alive())
+        self.assertNotIn(self.engine.error_reported, suruwasoft.ERROR_HANDLERS)
+        self.assertFalse(self.engine.zone_scheduler.running)
+        self.engine = None
+        
+    def test_risk_analysis_from_stub(self):
+        current_data, forecast_data = self.engine.get_weather_with_forecast("Lomé")
+        self.assertIsInstance(forecast_data, list)
+        self.assertEqual(len(forecast_data), 8)
+        self.assertFalse(current_data['stale'])
+        level, factors = self.engine.calculate_flood_risk(current_data, forecast_data)
+        self.assertIn(level, suruwasoft.RISK_LEVELS)
+        self.assertIsInstance(factors, list)
+        
+    def test_monitoring_reports_zones_then_batches_them(self):
+        for name in ("Lomé", "Kara", "Sokodé"):
+            self.engine.conn.execute("INSERT INTO monitoring_zones (name, frequency, risk_level, status) "
+                                     "VALUES (?, 60, 'En attente...', 'Actif')", (name,))
+        self.engine.conn.commit()
+        self.engine.start_monitoring()
+        zones = dict(self.engine.zone_scheduler.zones)
+        self.assertEqual(len(zones), 3)
+        
+        def refresh_now():
+            for zone_id, zone in zones.items():
+                self.engine.zone_scheduler.add(zone_id, zone['name'], 3600, delay=0)
+        
+        # Premier passage : zones résolues par leur nom ; second : requête groupée par identifiant
+        refresh_now()
+        with self.reported:
+            self.assertTrue(self.reported.wait_for(lambda: len(self.reports) == 3, 10))
+        self.assertEqual(set(self.engine.zone_city_ids), set(zones))
+        refresh_now()
+        with self.reported:
+            self.assertTrue(self.reported.wait_for(lambda: len(self.reports) == 6, 10))
+        self.assertEqual({status for _, _, status in self.reports}, {"Actif"})
+        self.assertEqual(self.stub.counts.get(('group', 200)), 1)
+        
+        self.assertTrue(self.engine.db_writer.flush(5))
+        self.assertEqual(self.engine.conn.execute("SELECT COUNT(*) FROM weather_history").fetchone()[0], 6)
+        rows = self.engine.conn.execute("SELECT city_id, risk_level FROM monitoring_zones").fetchall()
+        self.assertTrue(all(city_id and risk in suruwasoft.RISK_SCORES for city_id, risk in rows))
+        
+    def test_upstream_errors_only_fail_their_zones(self):
+        self.engine.start_monitoring()
+        self.engine.zone_scheduler.stop()
+        for zone_id in (1, 2):
+            self.engine.zone_scheduler.add(zone_id, f"Zone {zone_id}", 3600)
+            self.engine.zone_city_ids[zone_id] = 1000 + zone_id
+        self.stub.error_rate = 1.0  # {"cod": 500} sur tous les points d'accès, rien en cache
+        self.engine._refresh_zones([(1, "Zone 1"), (2, "Zone 2")])
+        self.assertEqual(sorted(self.reports), [(1, None, "Erreur"), (2, None, "Erreur")])
+
+
+class RecordReplayTest(StubTestCase):
+    """Relevés enregistrés en relais puis rejoués à l'identique (rejeu strict : 404 hors relevés)"""
+    def test_replayed_responses_match_recording(self):
+        recording = os.path.join(self.tmp.name, 'releves.jsonl')
+        relay = self.start_stub(record=recording, upstream=self.url(self.stub))
+        client = suruwasoft.WeatherClient('cle', base_url=self.url(relay))
+        self.addCleanup(client.close)
+        recorded = client.fetch_current_and_forecast({'q': "Kara"})
+        
+        replay = self.start_stub(replay=recording, strict=True)
+        client = suruwasoft.WeatherClient('cle', base_url=self.url(replay))
+        self.addCleanup(client.close)
+        self.assertEqual(client.fetch_current_and_forecast({'q': "kara "}), recorded)
+        
+        # Groupe rejoué depuis la météo actuelle indexée par identifiant
+        group = client.get('group', {'id': str(recorded[0]['id'])})
+        self.assertEqual(group['list'][0]['main'], recorded[0]['main'])
+        
+        self.assertEqual(str(client.get('weather', {'q': "Dapaong"})['cod']), "404")
+
+
+if __name__ == '__main__':
+    unittest.main()
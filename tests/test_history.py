@@ -0,0 +1,138 @@
+"""Historique : import en masse avec reprise, rétention des observations brutes et agrégats conservés"""
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import suruwasoft  # noqa: E402
+
+
+class HistoryTestCase(unittest.TestCase):
+    """Base au schéma de l'application, créée par le moteur dans un répertoire temporaire"""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        self.addCleanup(os.chdir, self.cwd)
+        self.addCleanup(self.tmp.cleanup)
+        suruwasoft.SuruwaEngine().shutdown()
+        self.db = os.path.join(self.tmp.name, suruwasoft.DB_PATH)
+        
+    def query(self, sql, params=()):
+        with sqlite3.connect(self.db) as conn:
+            return conn.execute(sql, params).fetchall()
+        
+    def write_csv(self, name, rows):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("city,temperature,humidity,precipitation,risk_level,timestamp\n")
+            for row in rows:
+                f.write(",".join(str(value) for value in row) + "\n")
+        return path
+
+
+class ImportHistoryTest(HistoryTestCase):
+    def setUp(self):
+        super().setUp()
+        start = datetime(2024, 6, 1)
+        self.rows = [("Lomé" if i % 2 else "Kara", 26.5, 80 + i % 20, i % 7, "Modéré",
+                      (start + timedelta(minutes=30 * i)).strftime('%Y-%m-%d %H:%M:%S')) for i in range(250)]
+        self.rows.insert(100, ("Lomé", "chaud", 80, 0, "Faible", "2024-06-03 00:00:00"))
+        self.rows.insert(200, ("Kara", 26, 180, 0, "Faible", "2024-06-04 00:00:00"))
+        self.path = self.write_csv('historique.csv', self.rows)
+        
+    def test_interrupted_import_resumes_without_duplicates(self):
+        cancel = threading.Event()
+        report = suruwasoft.import_history(self.db, self.path, on_progress=lambda *_: cancel.set(),
+                                           cancel=cancel, chunk_rows=60)
+        self.assertFalse(report['termine'])
+        self.assertEqual(report['lignes_importees'], 60)
+        
+        report = suruwasoft.import_history(self.db, self.path, chunk_rows=60)
+        self.assertTrue(report['termine'])
+        self.assertEqual(report['reprise_a'], 60)
+        self.assertEqual((report['lignes_importees'], report['lignes_rejetees']), (250, 2))
+        self.assertEqual(len(report['erreurs']), 2)
+        
+        # Fichier déjà importé : rien de plus
+        report = suruwasoft.import_history(self.db, self.path, chunk_rows=60)
+        self.assertTrue(report['deja_importe'])
+        self.assertEqual(self.query("SELECT COUNT(*) FROM weather_history")[0][0], 250)
+        
+        # Agrégats tenus à jour par bloc, comme pour les observations en direct
+        self.assertEqual(self.query("SELECT SUM(samples) FROM weather_rollup_daily")[0][0], 250)
+        self.assertEqual(self.query("SELECT SUM(samples) FROM weather_rollup_hourly")[0][0], 250)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM history_imports WHERE finished IS NOT NULL")[0][0], 1)
+        
+    def test_modified_file_is_imported_again(self):
+        suruwasoft.import_history(self.db, self.path, chunk_rows=60)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("Sokodé,25,70,0,Faible,2024-06-10 12:00:00\n")
+        os.utime(self.path, (1, 1))
+        report = suruwasoft.import_history(self.db, self.path, chunk_rows=60)
+        self.assertEqual(report['reprise_a'], 0)
+        self.assertEqual(report['lignes_importees'], 251)
+
+
+class RetentionTest(HistoryTestCase):
+    def setUp(self):
+        super().setUp()
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        self.old_day = (now - timedelta(days=60)).replace(hour=0)
+        self.recent_day = (now - timedelta(days=2)).replace(hour=0)
+        rows = [("Lomé", 27, 90, 3, "Élevé", (day + timedelta(hours=h)).strftime('%Y-%m-%d %H:%M:%S'))
+                for day in (self.old_day, self.recent_day) for h in range(24)]
+        suruwasoft.import_history(self.db, self.write_csv('releves.csv', rows))
+        
+        # Observations anciennes sans agrégats (historique antérieur aux tables d'agrégats)
+        with sqlite3.connect(self.db) as conn:
+            conn.executemany("""
+                INSERT INTO weather_history (city, temperature, humidity, precipitation, risk_level, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [("Kara", 25, 60, 0, "Faible", str(self.old_day + timedelta(hours=h))) for h in range(6)])
+        
+    def daily(self, day):
+        return dict((city, samples) for city, samples in self.query(
+            "SELECT city, samples FROM weather_rollup_daily WHERE bucket = ?", (day.strftime('%Y-%m-%d'),)))
+        
+    def test_raw_rows_expire_but_rollups_remain(self):
+        report = suruwasoft.maintain_history(self.db, raw_days=30, hourly_days=0, batch_rows=10, pause=0)
+        self.assertEqual(report['observations_supprimees'], 30)
+        self.assertEqual(report['jours_purges'], 1)
+        self.assertEqual(report['agregats_recalcules'], 1)  # Kara, recalculé avant suppression
+        
+        self.assertEqual(self.query("SELECT COUNT(*) FROM weather_history")[0][0], 24)
+        self.assertEqual(self.daily(self.old_day), {"Lomé": 24, "Kara": 6})
+        self.assertEqual(self.daily(self.recent_day), {"Lomé": 24})
+        old_hours = self.query("SELECT COUNT(*) FROM weather_rollup_hourly WHERE bucket < ?",
+                               (self.recent_day.strftime('%Y-%m-%d'),))[0][0]
+        self.assertEqual(old_hours, 24 + 6)
+        
+    def test_hourly_rollups_expire_in_batches(self):
+        report = suruwasoft.maintain_history(self.db, raw_days=30, hourly_days=45, batch_rows=7, pause=0)
+        self.assertEqual(report['agregats_horaires_supprimes'], 24 + 6)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM weather_rollup_hourly")[0][0], 24)
+        self.assertEqual(self.daily(self.old_day), {"Lomé": 24, "Kara": 6})
+        
+    def test_background_pass_never_converts_with_full_vacuum(self):
+        with sqlite3.connect(self.db) as conn:
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        self.assertEqual(auto_vacuum, 2)  # base créée par le moteur : vacuum incrémental
+        
+        legacy = os.path.join(self.tmp.name, 'ancienne.db')
+        with sqlite3.connect(legacy) as conn:
+            conn.execute("CREATE TABLE weather_history (id INTEGER PRIMARY KEY, city TEXT, timestamp DATETIME)")
+            conn.execute("CREATE TABLE weather_rollup_hourly (city TEXT, bucket TEXT, PRIMARY KEY (city, bucket))")
+        report = suruwasoft.maintain_history(legacy, raw_days=0, hourly_days=0, pause=0)
+        self.assertTrue(report['vacuum'].startswith("conversion requise"))
+        report = suruwasoft.maintain_history(legacy, raw_days=0, hourly_days=0, pause=0, convert=True)
+        self.assertEqual(report['vacuum'], 'conversion')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Calcul vectorisé du risque : parité avec la règle d'origine, un lieu à la fois"""
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import suruwasoft  # noqa: E402
+
+
+def baseline_risk(current_data, forecast_data):
+    """Règle d'origine (seuils et libellés de calculate_flood_risk avant le calcul groupé)"""
+    risk_score = 0
+    factors = []
+    if current_data['humidity'] > 85:
+        risk_score += 3
+        factors.append("Humidité très élevée")
+    elif current_data['humidity'] > 70:
+        risk_score += 2
+        factors.append("Humidité élevée")
+    total_precip = sum(f['precipitation'] for f in forecast_data)
+    if total_precip > 50:
+        risk_score += 4
+        factors.append("Fortes précipitations prévues")
+    elif total_precip > 20:
+        risk_score += 2
+        factors.append("Précipitations modérées prévues")
+    if current_data['pressure'] < 1000:
+        risk_score += 2
+        factors.append("Basse pression")
+    if current_data['wind_speed'] > 15:
+        risk_score += 1
+        factors.append("Vents forts")
+    if risk_score >= 7:
+        return "Critique", factors
+    elif risk_score >= 5:
+        return "Élevé", factors
+    elif risk_score >= 3:
+        return "Modéré", factors
+    return "Faible", factors
+
+
+def batch_risk(observations, in_flood_zone=None):
+    """(niveau, facteurs) de chaque observation par le calcul groupé"""
+    levels, _, masks = suruwasoft.compute_flood_risk_batch(*suruwasoft.flood_risk_inputs(observations),
+                                                           in_flood_zone=in_flood_zone)
+    return [(str(level), suruwasoft.risk_factors(int(mask))) for level, mask in zip(levels, masks)]
+
+
+def observation(humidity, pressure, wind_speed, precipitations):
+    return ({'humidity': humidity, 'pressure': pressure, 'wind_speed': wind_speed},
+            [{'precipitation': p} for p in precipitations])
+
+
+class RiskParityTest(unittest.TestCase):
+    def test_random_inputs_match_baseline(self):
+        rng = random.Random(20240601)
+        observations = [observation(rng.uniform(30, 100), rng.uniform(970, 1030), rng.uniform(0, 30),
+                                    [rng.choice((0, 0, rng.uniform(0, 15))) for _ in range(rng.randint(1, 8))])
+                        for _ in range(20000)]
+        self.assertEqual(batch_risk(observations), [baseline_risk(*obs) for obs in observations])
+        
+    def test_threshold_boundaries(self):
+        # Valeurs exactement aux seuils (strictement supérieur / inférieur dans la règle d'origine)
+        values = {'humidity': (70, 70.0001, 85, 85.0001), 'pressure': (999.9999, 1000),
+                  'wind_speed': (15, 15.0001)}
+        rains = ([20.0], [10.0, 10.0001], [50.0], [25.0, 25.0001], [0.1] * 3 + [0.2])
+        observations = [observation(h, p, w, r) for h in values['humidity'] for p in values['pressure']
+                        for w in values['wind_speed'] for r in rains]
+        self.assertEqual(batch_risk(observations), [baseline_risk(*obs) for obs in observations])
+        
+    def test_ragged_forecasts_are_padded(self):
+        observations = [observation(90, 990, 20, [30, 30]), observation(60, 1013, 2, [])]
+        self.assertEqual(batch_risk(observations), [baseline_risk(*obs) for obs in observations])
+        
+    def test_mapped_flood_zone_adds_two_points(self):
+        observations = [observation(75, 1013, 2, [5]), observation(60, 1013, 2, [5])]
+        self.assertEqual(batch_risk(observations, in_flood_zone=[True, False]), [
+            ("Modéré", ["Humidité élevée", "Dans une zone inondable cartographiée"]),
+            ("Faible", []),
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+"""Ordonnanceur des zones surveillées : lots, replanification, retrait et zones en cours de rafraîchissement"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import suruwasoft  # noqa: E402
+
+
+class ZoneSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.calls = []  # (instant, [(zone_id, nom), ...])
+        self.lock = threading.RLock()
+        self.refreshed = threading.Condition(self.lock)
+        self.hold = None  # Event : rafraîchissement bloqué jusqu'à son déclenchement
+        self.scheduler = suruwasoft.ZoneScheduler(self.refresh, max_workers=2, jitter=0, batch_size=3,
+                                                  batch_window=0.05)
+        self.scheduler.start()
+        
+    def tearDown(self):
+        if self.hold is not None:
+            self.hold.set()
+        self.scheduler.stop()
+        
+    def refresh(self, zones):
+        hold = self.hold
+        if hold is not None:
+            hold.wait(5)
+        with self.refreshed:
+            self.calls.append((time.monotonic(), list(zones)))
+            self.refreshed.notify_all()
+        
+    def refreshes(self, zone_id):
+        with self.lock:
+            return [at for at, zones in self.calls if any(z == zone_id for z, _ in zones)]
+        
+    def wait_for(self, predicate, timeout=5):
+        with self.refreshed:
+            return self.refreshed.wait_for(predicate, timeout)
+        
+    def test_due_zones_are_grouped_in_batches(self):
+        for zone_id in range(1, 8):
+            self.scheduler.add(zone_id, f"Zone {zone_id}", 3600, delay=0)
+        self.assertTrue(self.wait_for(lambda: sum(len(zones) for _, zones in self.calls) == 7))
+        self.assertTrue(all(len(zones) <= 3 for _, zones in self.calls))
+        self.assertEqual(sorted(z for _, zones in self.calls for z, _ in zones), list(range(1, 8)))
+        self.assertEqual(self.scheduler.in_flight, set())
+        
+    def test_zone_is_rescheduled_after_its_interval(self):
+        start = time.monotonic()
+        self.scheduler.add(1, "Lomé", 0.2, delay=0)
+        self.assertTrue(self.wait_for(lambda: len(self.refreshes(1)) >= 3))
+        times = self.refreshes(1)
+        self.assertLess(times[0] - start, 0.15)
+        for previous, current in zip(times, times[1:]):
+            self.assertGreaterEqual(current - previous, 0.15)
+        
+    def test_removed_zone_is_not_refreshed_again(self):
+        self.scheduler.add(1, "Lomé", 0.1, delay=0)
+        self.assertTrue(self.wait_for(lambda: self.refreshes(1)))
+        self.scheduler.remove(1)
+        count = len(self.refreshes(1))
+        time.sleep(0.4)
+        self.assertLessEqual(len(self.refreshes(1)), count + 1)  # un lot déjà parti au plus
+        self.assertNotIn(1, self.scheduler.zones)
+        
+    def test_zone_rescheduled_while_in_flight_is_not_lost(self):
+        self.hold = threading.Event()
+        self.scheduler.add(1, "Lomé", 3600, delay=0)
+        deadline = time.monotonic() + 5
+        while 1 not in self.scheduler.in_flight and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertIn(1, self.scheduler.in_flight)
+        
+        # Nouvelle fréquence pendant le rafraîchissement : échéance reportée, pas abandonnée
+        self.scheduler.add(1, "Lomé", 3600, delay=0)
+        time.sleep(0.1)
+        self.assertEqual(len(self.calls), 0)
+        self.hold.set()
+        self.hold = None
+        self.assertTrue(self.wait_for(lambda: len(self.refreshes(1)) == 1))
+        with self.scheduler.cond:
+            pending = [due for due, _, zone_id, gen in self.scheduler.heap
+                       if zone_id == 1 and gen == self.scheduler.zones[1]['gen']]
+        self.assertTrue(pending)
+        self.assertLess(min(pending) - time.monotonic(), suruwasoft.MONITORING_RETRY_DELAY + 0.5)
+        
+    def test_refresh_errors_are_reported_and_zone_kept(self):
+        errors = []
+        suruwasoft.ERROR_HANDLERS.append(lambda source, message: errors.append(source))
+        self.addCleanup(suruwasoft.ERROR_HANDLERS.pop)
+        failures = [RuntimeError("panne")]
+        
+        def refresh(zones):
+            if failures:
+                raise failures.pop()
+            self.refresh(zones)
+        
+        self.scheduler.refresh = refresh
+        self.scheduler.add(1, "Lomé", 0.1, delay=0)
+        self.assertTrue(self.wait_for(lambda: self.refreshes(1)))
+        self.assertEqual(errors, ['monitoring'])
+
+
+if __name__ == '__main__':
+    unittest.main()
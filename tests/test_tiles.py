@@ -0,0 +1,79 @@
+"""Stock de tuiles MBTiles et serveur local, pré-chargés depuis des tuiles synthétiques (sans réseau)"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import suruwasoft  # noqa: E402
+
+
+def synthetic_tile(z, x, y):
+    """Contenu reconnaissable d'une tuile"""
+    return f"tuile {z}/{x}/{y}".encode()
+
+
+class TileStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'tiles.mbtiles')
+        self.store = suruwasoft.TileStore(self.path)
+        self.fetched = []
+        
+        def fetch(z, x, y):
+            self.fetched.append((z, x, y))
+            return synthetic_tile(z, x, y)
+        
+        # Emprise de Lomé, zooms 8 à 10
+        self.bbox = (6.1, 1.15, 6.2, 1.3)
+        self.tiles = list(suruwasoft.tiles_in_bbox(*self.bbox, range(8, 11)))
+        self.added = self.store.seed(*self.bbox, range(8, 11), fetch, batch_size=2)
+        
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+        
+    def test_seed_stores_every_tile_once(self):
+        self.assertEqual(self.added, len(self.tiles))
+        self.assertEqual(sorted(self.fetched), sorted(self.tiles))
+        self.assertEqual(self.store.count(), len(self.tiles))
+        
+        # Second pré-chargement : rien à télécharger
+        self.assertEqual(self.store.seed(*self.bbox, range(8, 11), self.fail), 0)
+        
+    def test_get_flips_rows_to_tms(self):
+        for z, x, y in self.tiles:
+            self.assertEqual(self.store.get(z, x, y), synthetic_tile(z, x, y))
+        
+        # Fichier MBTiles : lignes numérotées depuis le bas (TMS)
+        z, x, y = self.tiles[0]
+        with sqlite3.connect(self.path) as conn:
+            row = conn.execute("SELECT tile_row FROM tiles WHERE zoom_level = ? AND tile_column = ?",
+                               (z, x)).fetchall()
+        self.assertIn(((1 << z) - 1 - y,), row)
+        self.assertIsNone(self.store.get(z, x, (1 << z) - 1 - y))
+        
+    def test_server_serves_seeded_tiles(self):
+        server = suruwasoft.TileServer(self.store, port=0, upstream=None)
+        server.start()
+        try:
+            z, x, y = self.tiles[-1]
+            with urllib.request.urlopen(server.url_template.format(z=z, x=x, y=y), timeout=5) as response:
+                self.assertEqual(response.status, 200)
+                self.assertEqual(response.headers['Content-Type'], 'image/png')
+                self.assertEqual(response.read(), synthetic_tile(z, x, y))
+            
+            # Hors emprise et sans serveur amont : 404
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                urllib.request.urlopen(server.url_template.format(z=2, x=0, y=0), timeout=5)
+            self.assertEqual(error.exception.code, 404)
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+"""Cache des réponses météo : durée de validité, LRU mémoire, limite disque et repli hors ligne"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import suruwasoft  # noqa: E402
+
+
+class WeatherCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'cache.db')
+        self.caches = []
+        
+    def tearDown(self):
+        for cache in self.caches:
+            cache.close()
+        self.tmp.cleanup()
+        
+    def cache(self, **options):
+        cache = suruwasoft.WeatherCache(self.path, **options)
+        self.caches.append(cache)
+        return cache
+        
+    def disk_rows(self, cache):
+        return cache.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        
+    def test_entries_expire_after_their_endpoint_ttl(self):
+        cache = self.cache(ttl={'weather': 0.2})
+        cache.put('weather', 'w', {'cod': 200, 'n': 1})
+        cache.put('forecast', 'f', {'cod': '200', 'n': 2})
+        self.assertEqual(cache.get('weather', 'w'), {'cod': 200, 'n': 1})
+        time.sleep(0.3)
+        self.assertIsNone(cache.get('weather', 'w'))
+        self.assertEqual(cache.get('forecast', 'f'), {'cod': '200', 'n': 2})
+        
+        # Entrée périmée : servie seulement sur demande, marquée comme telle
+        stale = cache.get('weather', 'w', allow_stale=True)
+        self.assertTrue(stale['_stale'])
+        self.assertEqual(stale['n'], 1)
+        self.assertIsNone(cache.get('weather', 'absente', allow_stale=True))
+        
+    def test_memory_is_lru_and_backed_by_disk(self):
+        cache = self.cache(memory_size=3)
+        for key in 'abc':
+            cache.put('weather', key, {'key': key})
+        cache.get('weather', 'a')  # « a » redevient la plus récente
+        cache.put('weather', 'd', {'key': 'd'})
+        self.assertEqual(list(cache.memory), ['c', 'a', 'd'])
+        
+        # « b » n'est plus en mémoire mais reste lu sur disque, puis remis en mémoire
+        self.assertEqual(cache.get('weather', 'b'), {'key': 'b'})
+        self.assertEqual(list(cache.memory), ['a', 'd', 'b'])
+        
+        # Nouveau processus : réponses retrouvées sur disque
+        cache.close()
+        self.caches.remove(cache)
+        self.assertEqual(self.cache().get('weather', 'c'), {'key': 'c'})
+        
+    def test_disk_evicts_oldest_entries_beyond_its_size(self):
+        cache = self.cache(disk_size=10)
+        for i in range(11):
+            cache.put('weather', f"k{i}", {'i': i})
+        self.assertEqual(self.disk_rows(cache), 9)  # 10% de marge libérée
+        self.assertIsNone(cache.conn.execute("SELECT 1 FROM responses WHERE key IN ('k0', 'k1')").fetchone())
+        
+    def test_refreshing_existing_keys_does_not_evict(self):
+        cache = self.cache(disk_size=100)
+        for i in range(90):
+            cache.put('weather', f"k{i}", {'i': i})
+        for _ in range(50):
+            for i in range(5):
+                cache.put('weather', f"k{i}", {'i': i})
+        self.assertEqual(self.disk_rows(cache), 90)
+        self.assertEqual(cache.disk_count, 90)
+        
+    def test_make_key_normalizes_parameters(self):
+        self.assertEqual(suruwasoft.WeatherCache.make_key('weather', {'q': ' Lomé ', 'lang': 'fr'}),
+                         suruwasoft.WeatherCache.make_key('weather', {'lang': 'FR', 'q': 'lomé'}))
+
+
+class WeatherClientFallbackTest(unittest.TestCase):
+    """Repli sur la dernière réponse valide quand l'API est injoignable ou répond une erreur"""
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = suruwasoft.WeatherCache(os.path.join(self.tmp.name, 'cache.db'), ttl={'weather': 0.1})
+        self.client = suruwasoft.WeatherClient('cle', base_url='http://127.0.0.1:9', cache=self.cache)
+        self.responses = []
+        self.calls = 0
+        
+        def get(endpoint, params):
+            self.calls += 1
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        
+        self.client.get = get
+        
+    def tearDown(self):
+        self.client.close()
+        self.cache.close()
+        self.tmp.cleanup()
+        
+    def test_fresh_entries_are_served_without_request(self):
+        self.responses = [{'cod': 200, 'temp': 25}]
+        self.assertEqual(self.client.fetch('weather', {'q': 'Lomé'}), {'cod': 200, 'temp': 25})
+        self.assertEqual(self.client.fetch('weather', {'q': 'lomé'}), {'cod': 200, 'temp': 25})
+        self.assertEqual(self.calls, 1)
+        
+    def test_stale_entry_on_network_or_api_errors(self):
+        self.responses = [{'cod': 200, 'temp': 25}]
+        self.client.fetch('weather', {'q': 'Lomé'})
+        time.sleep(0.15)
+        for failure in (requests.ConnectionError("hors ligne"), {'cod': 429, 'message': "quota"},
+                        {'cod': '500'}, {'cod': 404, 'message': "city not found"}):
+            self.responses = [failure]
+            result = self.client.fetch('weather', {'q': 'Lomé'})
+            self.assertTrue(result['_stale'], failure)
+            self.assertEqual(result['temp'], 25)
+        
+        # Une réponse d'erreur ne remplace pas l'entrée valide en cache
+        self.assertEqual(self.cache.get('weather', self.cache.make_key('weather', {'q': 'Lomé'}),
+                                        allow_stale=True)['temp'], 25)
+        
+    def test_errors_without_cached_entry_are_returned(self):
+        self.responses = [{'cod': 500}]
+        self.assertEqual(self.client.fetch('weather', {'q': 'Kara'}), {'cod': 500})
+        self.responses = [requests.ConnectionError("hors ligne")]
+        with self.assertRaises(requests.ConnectionError):
+            self.client.fetch('weather', {'q': 'Kara'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,334 @@
+"""Banc de mesure des chemins critiques de SURUWA, hors ligne (API météo simulée par tools/owm_stub.py)
+
+    python tools/bench.py                       # mesure puis comparaison à tools/bench_baseline.json
+    python tools/bench.py --sizes 10000         # volumes réduits pour un contrôle rapide
+    python tools/bench.py --update-baseline     # enregistre les mesures comme nouvelle référence
+
+Les bases de 10k, 1M et 10M lignes sont générées une fois dans --data-dir puis réutilisées.
+Code de sortie 1 si une mesure régresse au-delà de la tolérance enregistrée dans la référence.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'tools', 'bench_baseline.json')
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'suruwa-bench')
+SIZES = (10_000, 1_000_000, 10_000_000)
+TOLERANCE = 0.25  # écart relatif admis avant de signaler une régression
+LOOSE_TOLERANCE = 0.5  # mesures bruitées : réseau local, processus, disque, requêtes sous la milliseconde
+
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+import owm_stub  # noqa: E402
+
+STARTUP_SNIPPET = """
+import sys
+sys.path.insert(0, {root!r})
+import suruwasoft
+engine = suruwasoft.SuruwaEngine()
+engine.start_monitoring()
+print("prêt", flush=True)
+sys.stdin.read()
+engine.shutdown()
+"""
+
+
+def measure(func, repeat=15, number=1):
+    """Meilleure durée (s) par appel sur repeat séries de number appels, peu sensible à la charge de la machine"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def calibrate():
+    """Durée (s) d'une charge de référence fixe : rapport de vitesse entre la machine de référence et celle-ci"""
+    def workload():
+        total = 0
+        for i in range(200_000):
+            total += i * i % 7
+        sorted(str(i) for i in range(50_000))
+    return measure(workload, repeat=7)
+
+
+def metric(value, unit, better='lower', tolerance=TOLERANCE):
+    return {'value': round(value, 4), 'unit': unit, 'better': better, 'tolerance': tolerance}
+
+
+def write_geodata(directory, rng):
+    """Refuges et zones inondables synthétiques autour de Lomé, lus par le moteur au démarrage"""
+    shelters = [{"type": "Feature", "properties": {"name": f"Refuge {i}"},
+                 "geometry": {"type": "Point",
+                              "coordinates": [rng.uniform(-3, 5), rng.uniform(4, 12)]}}
+                for i in range(50_000)]
+    zones = []
+    for i in range(2_000):
+        lat, lon = rng.uniform(5.5, 7), rng.uniform(0.5, 2)
+        ring = [[lon + 0.02 * (1 + j % 3 / 3) * math.cos(j * math.tau / 40),
+                 lat + 0.02 * (1 + j % 3 / 3) * math.sin(j * math.tau / 40)] for j in range(40)]
+        zones.append({"type": "Feature", "properties": {"name": f"Zone {i}"},
+                      "geometry": {"type": "Polygon", "coordinates": [ring + ring[:1]]}})
+    for name, features in (('shelters.geojson', shelters), ('flood_zones.geojson', zones)):
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
+def sample_weather(rng):
+    """Observation (current_data, forecast_data) au format de parse_weather"""
+    current = {'temp': rng.uniform(20, 35), 'humidity': rng.uniform(40, 100), 'condition': "pluie",
+               'pressure': rng.uniform(985, 1020), 'wind_speed': rng.uniform(0, 25),
+               'lat': rng.uniform(5.5, 7), 'lon': rng.uniform(0.5, 2), 'city_id': 1,
+               'precipitation': rng.uniform(0, 10), 'stale': False, 'cached_at': None}
+    forecast = [{'time': "", 'temp': 25, 'humidity': 80, 'precipitation': rng.uniform(0, 12)}
+                for _ in range(8)]
+    return current, forecast
+
+
+def bench_engine(S, engine, rng, workdir):
+    """Calcul du risque, appels météo, écritures et génération de carte"""
+    results = {}
+    observations = [sample_weather(rng) for _ in range(256)]
+    current, forecast = observations[0]
+    results['risque_unitaire_us'] = metric(
+        measure(lambda: engine.calculate_flood_risk(current, forecast), number=200) * 1e6, 'µs')
+
+    np = S.lazy_import('numpy')
+    n = 100_000
+    arrays = (np.array([rng.uniform(40, 100) for _ in range(n)]), np.array([rng.uniform(985, 1020) for _ in range(n)]),
+              np.array([rng.uniform(0, 25) for _ in range(n)]), np.array([[rng.uniform(0, 12)] * 8 for _ in range(n)]))
+    flags = np.array([rng.random() < 0.1 for _ in range(n)])
+    results['risque_lot_100k_ms'] = metric(
+        measure(lambda: S.compute_flood_risk_batch(*arrays, in_flood_zone=flags)) * 1e3, 'ms')
+    results['risque_lot_256_observations_ms'] = metric(
+        measure(lambda: S.compute_flood_risk_batch(*S.flood_risk_inputs(observations),
+                                                   in_flood_zone=engine.flood_zone_flags(observations))) * 1e3, 'ms')
+
+    # Aller-retour météo : lieu jamais vu (deux appels HTTP au serveur simulé), puis servi par le cache
+    run = time.time_ns()
+    counter = iter(range(10 ** 9))
+    results['meteo_aller_retour_ms'] = metric(
+        measure(lambda: engine.get_weather_with_forecast(f"Bench {run} {next(counter)}"), repeat=50) * 1e3,
+        'ms', tolerance=LOOSE_TOLERANCE)
+    engine.get_weather_with_forecast("Lomé")
+    results['meteo_cache_us'] = metric(
+        measure(lambda: engine.get_weather_with_forecast("Lomé"), number=200) * 1e6, 'µs')
+
+    # Écritures : mesures et agrégats validés par le thread d'écriture
+    count = 20_000
+    start = time.perf_counter()
+    for i in range(count):
+        engine.save_weather_data(S.DEFAULT_PLACES[i % len(S.DEFAULT_PLACES)][0], current, "Modéré")
+    engine.db_writer.flush()
+    results['ecritures_meteo_par_s'] = metric(count / (time.perf_counter() - start), 'lignes/s', 'higher',
+                                              tolerance=LOOSE_TOLERANCE)
+
+    # Carte d'un lieu analysé : génération complète, puis lecture du cache disque
+    renderer = S.MapRenderer(cache_dir=os.path.join(workdir, 'maps'), max_files=10_000)
+    points = iter(range(10 ** 9))
+    results['carte_generation_ms'] = metric(
+        measure(lambda: engine.render_risk_map(renderer, 6.13 + next(points) * 1e-4, 1.22, "Lomé", "Élevé"),
+                repeat=10) * 1e3, 'ms')
+    results['carte_cache_ms'] = metric(
+        measure(lambda: engine.render_risk_map(renderer, 6.13, 1.22, "Lomé", "Élevé"), number=20) * 1e3, 'ms')
+    return results
+
+
+def fill_database(S, count):
+    """Historique et alertes synthétiques (count lignes chacun), index reconstruits ensuite"""
+    engine = S.SuruwaEngine()
+    engine.shutdown()
+    conn = sqlite3.connect(S.DB_PATH)
+    conn.execute("PRAGMA synchronous=OFF")
+    indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                           "AND tbl_name IN ('weather_history', 'alerts')").fetchall()
+    for (name,) in indexes:
+        conn.execute(f"DROP INDEX {name}")
+
+    rng = random.Random(count)
+    cities = [place[0] for place in S.DEFAULT_PLACES]
+    start = datetime.now() - timedelta(days=365)
+    step = 365 * 86400 / count
+
+    def history():
+        for i in range(count):
+            yield (rng.choice(cities), rng.uniform(20, 35), rng.uniform(40, 100), rng.uniform(0, 10),
+                   rng.choice(S.RISK_LEVELS), (start + timedelta(seconds=i * step)).isoformat(" "))
+
+    def alerts():
+        for i in range(count):
+            yield (rng.choice(cities), "Alerte de test", rng.choice(S.RISK_LEVELS),
+                   (start + timedelta(seconds=i * step)).isoformat(" "),
+                   "Actif" if rng.random() < 0.001 else "Résolue", S.DELIVERY_SENT)
+
+    with conn:
+        conn.executemany("INSERT INTO weather_history (city, temperature, humidity, precipitation, risk_level, "
+                         "timestamp) VALUES (?, ?, ?, ?, ?, ?)", history())
+        conn.executemany("INSERT INTO alerts (zone, message, risk_level, timestamp, status, delivery_status) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", alerts())
+    conn.execute("ANALYZE")
+    conn.close()
+    S.SuruwaEngine().shutdown()  # index recréés par init_database
+
+
+def bench_queries(S, count):
+    """Latence des requêtes de l'historique et des alertes actives sur count lignes"""
+    engine = S.SuruwaEngine()
+    try:
+        newest = engine.fetch_history_page()
+        middle = engine.conn.execute("SELECT timestamp, id FROM weather_history WHERE id = ?",
+                                     (count // 2,)).fetchone()
+        end = datetime.fromisoformat(newest[0][5])
+        label = f"{count // 1000}k" if count < 1_000_000 else f"{count // 1_000_000}M"
+        queries = {
+            'premiere_page': lambda: engine.fetch_history_page(),
+            'page_profonde': lambda: engine.fetch_history_page(after=tuple(middle)),
+            'page_ville': lambda: engine.fetch_history_page(city="Lomé"),
+            'page_periode': lambda: engine.fetch_history_page(start=end - timedelta(days=30),
+                                                              end=end - timedelta(days=29)),
+            'alertes_actives': engine.fetch_active_alerts,
+        }
+        return {f"historique_{name}_{label}_ms" if name != 'alertes_actives' else f"{name}_{label}_ms":
+                metric(measure(query, repeat=25) * 1e3, 'ms', tolerance=LOOSE_TOLERANCE)
+                for name, query in queries.items()}
+    finally:
+        engine.shutdown()
+
+
+def bench_startup(workdir, env, runs=5):
+    """Démarrage à froid du moteur dans un processus neuf, et de la fenêtre si un écran est disponible"""
+    results = {}
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, '-c', STARTUP_SNIPPET.format(root=ROOT)], cwd=workdir, env=env,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        process.stdout.readline()
+        times.append(time.perf_counter() - start)
+        process.communicate('')
+    results['demarrage_moteur_s'] = metric(statistics.median(times), 's', tolerance=LOOSE_TOLERANCE)
+
+    if os.environ.get('DISPLAY') or sys.platform in ('win32', 'darwin'):
+        output = subprocess.run([sys.executable, os.path.join(ROOT, 'suruwasoft.py'), '--startup-report'],
+                                cwd=workdir, env=env, capture_output=True, text=True).stdout
+        report = json.loads(output)
+        results['demarrage_fenetre_s'] = metric(report['étapes']['première fenêtre'], 's',
+                                                tolerance=LOOSE_TOLERANCE)
+    return results
+
+
+def compare(results, baseline, calibration):
+    """Tableau de comparaison, références ramenées à la vitesse de cette machine ; nombre de régressions"""
+    regressions = 0
+    reference = baseline.get('metrics', {})
+    speed = calibration / baseline.get('calibration_s', calibration)
+    print(f"Vitesse relative à la machine de référence : {1 / speed:.2f}x")
+    print(f"{'mesure':48} {'référence':>12} {'actuel':>12} {'écart':>8}")
+    for name, current in results.items():
+        base = reference.get(name)
+        if base is None:
+            print(f"{name:48} {'-':>12} {current['value']:>12} {'':>8}  nouveau")
+            continue
+        expected = base['value'] * speed if base['better'] == 'lower' else base['value'] / speed
+        delta = current['value'] / expected - 1 if expected else 0.0
+        worse = delta if base['better'] == 'lower' else -delta
+        regressed = worse > base.get('tolerance', TOLERANCE)
+        regressions += regressed
+        print(f"{name:48} {round(expected, 4):>12} {current['value']:>12} {delta:>+8.1%}  "
+              f"{'RÉGRESSION' if regressed else 'ok'} ({current['unit']})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de mesure SURUWA (hors ligne)")
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help="volumes de l'historique et des alertes (lignes, séparés par des virgules)")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="bases générées, réutilisées d'une exécution à l'autre")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--skip-startup', action='store_true')
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+
+    # Serveur météo simulé ; le module est importé une fois l'URL fixée
+    calibration = calibrate()
+    stub = owm_stub.make_server()
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    env = dict(os.environ, SURUWA_OWM_URL=f"http://127.0.0.1:{stub.server_port}")
+    os.environ.update(env)
+    sys.path.insert(0, ROOT)
+    import suruwasoft as S
+
+    # Moteur dans un répertoire neuf : base, cache et index propres à l'exécution
+    workdir = os.path.join(args.data_dir, 'moteur')
+    shutil.rmtree(workdir, ignore_errors=True)
+    os.makedirs(workdir)
+    os.chdir(workdir)
+    rng = random.Random(2024)
+    write_geodata(workdir, rng)
+    engine = S.SuruwaEngine()
+    while engine.shelter_index is None or engine.flood_zones is None:
+        time.sleep(0.05)
+    try:
+        results = bench_engine(S, engine, rng, workdir)
+    finally:
+        engine.shutdown()
+
+    for size in sizes:
+        directory = os.path.join(args.data_dir, f"lignes_{size}")
+        os.makedirs(directory, exist_ok=True)
+        os.chdir(directory)
+        if not os.path.exists('prete'):
+            print(f"Génération de la base de {size} lignes...", flush=True)
+            fill_database(S, size)
+            open('prete', 'w').close()
+        results.update(bench_queries(S, size))
+
+    if not args.skip_startup:
+        results.update(bench_startup(workdir, env))
+    stub.shutdown()
+    calibration = min(calibration, calibrate())
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, calibration)
+
+    if args.update_baseline:
+        # Tolérances ajustées à la main conservées
+        for name, current in results.items():
+            previous = baseline.get('metrics', {}).get(name)
+            if previous:
+                current['tolerance'] = previous.get('tolerance', current['tolerance'])
+        baseline = {
+            'machine': f"{platform.machine()} {platform.processor() or ''} {os.cpu_count()} CPU".replace('  ', ' '),
+            'python': platform.python_version(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'calibration_s': round(calibration, 6),
+            'metrics': dict(baseline.get('metrics', {}), **results),
+        }
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"Référence enregistrée : {args.baseline}")
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,88 @@
+"""Générateur de charge pour l'API du risque (python suruwasoft.py --serve --api-port PORT)
+
+    python tools/loadgen.py --url http://127.0.0.1:8780 --connections 64 --duration 10 --places 50
+
+Chaque connexion persistante enchaîne des GET /risk sur un ensemble de lieux ; le rapport donne le
+débit, les percentiles de latence et la répartition des statuts.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlparse, quote
+
+
+def place_targets(count, cities=None):
+    """Chemins de requête : villes données, sinon coordonnées réparties sur l'Afrique de l'Ouest"""
+    if cities:
+        return [f"/risk?city={quote(city)}" for city in cities]
+    rng = random.Random(42)
+    return [f"/risk?lat={rng.uniform(4, 15):.4f}&lon={rng.uniform(-17, 15):.4f}" for _ in range(count)]
+
+
+async def worker(host, port, targets, deadline, latencies, statuses):
+    """Une connexion persistante : requêtes enchaînées jusqu'à l'échéance"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            path = random.choice(targets)
+            start = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            status_line = await reader.readline()
+            if not status_line:
+                break
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            status = int(status_line.split()[1])
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else float('nan')
+
+
+async def run(url, connections, duration, targets):
+    parsed = urlparse(url)
+    latencies, statuses = [], {}
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(parsed.hostname, parsed.port or 80, targets, start + duration,
+                                  latencies, statuses) for _ in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requetes': len(latencies),
+        'debit_rps': round(len(latencies) / elapsed, 1),
+        'latence_ms': {name: round(percentile(latencies, p) * 1000, 2)
+                       for name, p in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+        'statuts': statuses,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Générateur de charge pour l'API du risque SURUWA")
+    parser.add_argument('--url', default="http://127.0.0.1:8780")
+    parser.add_argument('--connections', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--places', type=int, default=50, help="nombre de lieux distincts interrogés")
+    parser.add_argument('--cities', help="liste de villes séparées par des virgules (au lieu de coordonnées)")
+    args = parser.parse_args(argv)
+
+    targets = place_targets(args.places, args.cities.split(',') if args.cities else None)
+    report = asyncio.run(run(args.url, args.connections, args.duration, targets))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
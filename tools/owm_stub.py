@@ -0,0 +1,453 @@
+"""Serveur local imitant OpenWeatherMap (/weather, /forecast, /group) pour les tests de charge
+
+Réponses synthétiques (--scenario saison, calme ou orage) ou rejouées depuis des relevés réels
+(--record puis --replay), avec latence, erreurs, coupures et quota configurables.
+
+    python tools/owm_stub.py --port 8900 --scenario orage --time-scale 60 --latency 0.05 --error-rate 0.01
+    python tools/owm_stub.py --record releves.jsonl          # relais vers l'API réelle, réponses enregistrées
+    python tools/owm_stub.py --replay releves.jsonl --rate-limit 60
+    python tools/owm_stub.py --zones 5000 --db suruwa.db     # zones simulées à surveiller
+    python suruwasoft.py --serve --owm-url http://127.0.0.1:8900   (ou SURUWA_OWM_URL)
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.error import HTTPError
+from urllib.parse import urlparse, parse_qs, urlencode
+from urllib.request import urlopen
+
+OWM_UPSTREAM = "https://api.openweathermap.org/data/2.5"
+GROUP_LIMIT = 20
+MAX_CITY_ID = 10_000_000
+IGNORED_PARAMS = ('appid', 'units', 'lang')
+RATE_LIMIT_MESSAGE = ("Your account is temporary blocked due to exceeding of requests limitation of your "
+                      "subscription type. Please choose the proper subscription https://openweathermap.org/price")
+
+# Orage par défaut : cellule née au large de Lomé, remontant vers le nord-ouest
+# (lat, lon, rayon en km, cap en degrés, vitesse en km/h, pluie maximale en mm/h)
+DEFAULT_STORMS = [(5.4, 1.9, 120.0, 315.0, 35.0, 45.0)]
+
+
+def request_key(endpoint, params):
+    """Clé d'une requête sans la clé d'API ni les unités : « weather?q=lomé »"""
+    items = sorted((key, values[0]) for key, values in params.items() if key not in IGNORED_PARAMS)
+    return endpoint + "?" + "&".join(f"{key}={value.strip().lower()}" for key, value in items)
+
+
+def seed_position(city_id):
+    """Position stable d'un lieu inconnu, en Afrique de l'Ouest"""
+    return 4 + city_id % 1100 / 100, -17 + city_id // 1100 % 3200 / 100
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(h))
+
+
+class Places:
+    """Lieux vus par le serveur : identifiant stable par nom ou coordonnées, position retrouvée par identifiant"""
+    def __init__(self):
+        self.by_id = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, params):
+        """(identifiant, nom, lat, lon) d'une requête par id, q ou lat/lon"""
+        if 'id' in params:
+            city_id = int(params['id'][0])
+            with self.lock:
+                known = self.by_id.get(city_id)
+            return (city_id,) + known if known else (city_id, f"Ville {city_id}") + seed_position(city_id)
+        if 'lat' in params and 'lon' in params:
+            lat, lon = float(params['lat'][0]), float(params['lon'][0])
+            city_id = zlib.crc32(f"{lat:.4f},{lon:.4f}".encode()) % MAX_CITY_ID
+            name = f"Lieu {lat:.2f},{lon:.2f}"
+        else:
+            name = params.get('q', [''])[0].partition(',')[0].strip()
+            city_id = zlib.crc32(name.lower().encode()) % MAX_CITY_ID
+            lat, lon = seed_position(city_id)
+        with self.lock:
+            self.by_id[city_id] = (name, lat, lon)
+        return city_id, name, lat, lon
+
+
+class SeasonScenario:
+    """Saison des pluies ordinaire : conditions stables par lieu, averses variables d'un lieu à l'autre"""
+    def conditions(self, city_id, lat, lon, hours):
+        """Conditions (temp, humidity, pressure, wind, rain en mm/h) à hours heures du début du scénario"""
+        phase = city_id % 97 + hours / 3
+        return {'temp': 24 + city_id % 10, 'humidity': 60 + (city_id + int(hours)) % 40,
+                'pressure': 990 + city_id % 30, 'wind': city_id % 20,
+                'rain': round(max(0.0, 2 * math.sin(phase / 3)), 2)}
+
+
+class CalmScenario:
+    """Temps sec : aucun facteur de risque"""
+    def conditions(self, city_id, lat, lon, hours):
+        return {'temp': 30 + city_id % 4, 'humidity': 50 + city_id % 15, 'pressure': 1013, 'wind': 3, 'rain': 0.0}
+
+
+class StormScenario:
+    """Cellules orageuses en déplacement : pluie, humidité, vent et chute de pression selon la distance au centre"""
+    def __init__(self, storms=DEFAULT_STORMS):
+        self.storms = storms
+
+    def conditions(self, city_id, lat, lon, hours):
+        result = {'temp': 27 + city_id % 3, 'humidity': 65 + city_id % 10, 'pressure': 1011.0, 'wind': 4.0,
+                  'rain': 0.0}
+        for start_lat, start_lon, radius, heading, speed, peak in self.storms:
+            # Centre de la cellule après hours heures de route (approximation locale)
+            distance = speed * hours
+            center_lat = start_lat + distance * math.cos(math.radians(heading)) / 111.2
+            center_lon = start_lon + distance * math.sin(math.radians(heading)) / (
+                111.2 * math.cos(math.radians(center_lat)))
+            intensity = math.exp(-(haversine_km(lat, lon, center_lat, center_lon) / radius) ** 2)
+            result['rain'] += peak * intensity
+            result['humidity'] = max(result['humidity'], 70 + 28 * intensity)
+            result['pressure'] -= 25 * intensity
+            result['wind'] += 20 * intensity
+        result['rain'] = round(result['rain'], 2)
+        result['pressure'] = round(result['pressure'], 1)
+        result['wind'] = round(result['wind'], 1)
+        return result
+
+
+SCENARIOS = {'saison': SeasonScenario, 'calme': CalmScenario, 'orage': StormScenario}
+
+
+def weather_description(rain):
+    """(code, groupe, description) OpenWeatherMap selon la pluie horaire"""
+    if rain >= 7.6:
+        return 502, "Rain", "forte pluie"
+    if rain >= 2.5:
+        return 501, "Rain", "pluie modérée"
+    if rain > 0:
+        return 500, "Rain", "légère pluie"
+    return 800, "Clear", "ciel dégagé"
+
+
+def current_weather(place, conditions, now, group_item=False):
+    """Réponse /weather (ou élément de /group, sans « cod »)"""
+    city_id, name, lat, lon = place
+    code, main, description = weather_description(conditions['rain'])
+    body = {
+        "coord": {"lon": lon, "lat": lat},
+        "weather": [{"id": code, "main": main, "description": description}],
+        "main": {"temp": conditions['temp'], "feels_like": conditions['temp'] + 2,
+                 "pressure": conditions['pressure'], "humidity": round(conditions['humidity'])},
+        "wind": {"speed": conditions['wind'], "deg": 220},
+        "dt": int(now),
+        "id": city_id,
+        "name": name,
+    }
+    if conditions['rain'] > 0:
+        body["rain"] = {"1h": conditions['rain']}
+    if not group_item:
+        body["cod"] = 200
+    return body
+
+
+def forecast(place, scenario, hours, now, steps=40):
+    """Réponse /forecast : 5 jours par pas de 3 h"""
+    city_id, name, lat, lon = place
+    start = int(now) // 10800 * 10800 + 10800
+    items = []
+    for step in range(steps):
+        conditions = scenario.conditions(city_id, lat, lon, hours + 3 * (step + 1))
+        code, main, description = weather_description(conditions['rain'])
+        item = {
+            "dt": start + 10800 * step,
+            "main": {"temp": conditions['temp'], "pressure": conditions['pressure'],
+                     "humidity": round(conditions['humidity'])},
+            "weather": [{"id": code, "main": main, "description": description}],
+            "wind": {"speed": conditions['wind'], "deg": 220},
+            "dt_txt": time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + 10800 * step)),
+        }
+        if conditions['rain'] > 0:
+            item["rain"] = {"3h": round(3 * conditions['rain'], 2)}
+        items.append(item)
+    return {"cod": "200", "message": 0, "cnt": steps, "list": items,
+            "city": {"id": city_id, "name": name, "coord": {"lat": lat, "lon": lon}}}
+
+
+class Recordings:
+    """Relevés réels au format JSONL {key, status, body} : enregistrés en mode relais, rejoués en boucle"""
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}  # clé -> [(statut, corps), ...]
+        self.cursors = {}
+        self.lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.entries.setdefault(entry['key'], []).append((entry['status'], entry['body']))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Prochain relevé d'une requête, ou None"""
+        with self.lock:
+            responses = self.entries.get(key)
+            if not responses:
+                return None
+            index = self.cursors.get(key, 0)
+            self.cursors[key] = index + 1
+            return responses[index % len(responses)]
+
+    def add(self, key, status, body):
+        """Enregistrement d'une réponse ; les météos actuelles sont aussi indexées par identifiant pour /group"""
+        entries = [(key, body)]
+        if status == 200 and key.startswith('weather?') and 'id' in body and key != f"weather?id={body['id']}":
+            entries.append((f"weather?id={body['id']}", body))
+        elif status == 200 and key.startswith('group?'):
+            entries += [(f"weather?id={item['id']}", dict(item, cod=200)) for item in body.get('list', [])]
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                for entry_key, entry_body in entries:
+                    self.entries.setdefault(entry_key, []).append((status, entry_body))
+                    f.write(json.dumps({'key': entry_key, 'status': status, 'body': entry_body},
+                                       ensure_ascii=False) + "\n")
+
+
+class RateLimiter:
+    """Seau à jetons : rate requêtes par seconde, rafales jusqu'à rate requêtes"""
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Réponses des points d'accès utilisés par SURUWA"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # en-têtes et corps écrits séparément : pas d'attente d'ACK retardé
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if endpoint == '_stats':
+            self.reply(200, server.stats())
+            return
+        if endpoint not in ('weather', 'forecast', 'group'):
+            self.reply(404, {"cod": "404", "message": "Internal error"})
+            return
+
+        # Perturbations : quota, latence, coupure, erreur serveur
+        if server.limiter and not server.limiter.allow():
+            self.reply(429, {"cod": 429, "message": RATE_LIMIT_MESSAGE}, endpoint)
+            return
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+        if random.random() < server.drop_rate:
+            server.count(endpoint, 'coupure')
+            self.close_connection = True
+            return
+        if random.random() < server.error_rate:
+            self.reply(500, {"cod": 500, "message": "Internal server error"}, endpoint)
+            return
+
+        status, body = server.respond(endpoint, params)
+        self.reply(status, body, endpoint)
+
+    def reply(self, status, body, endpoint=None):
+        if endpoint:
+            self.server.count(endpoint, status)
+        data = json.dumps(body, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # pas de journal par requête
+
+
+class StubServer(ThreadingHTTPServer):
+    """Serveur et sources de réponses : scénario synthétique, relevés rejoués ou relais enregistré"""
+    daemon_threads = True
+
+    def __init__(self, address, scenario=None, time_scale=1.0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 drop_rate=0.0, rate_limit=None, replay=None, strict=False, record=None, upstream=OWM_UPSTREAM):
+        super().__init__(address, StubHandler)
+        self.scenario = scenario or SeasonScenario()
+        self.time_scale = time_scale  # heures simulées par heure réelle
+        self.started = time.time()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.recordings = Recordings(replay or record)
+        self.strict = strict  # rejeu : 404 plutôt qu'une réponse synthétique pour une requête non enregistrée
+        self.record = record is not None
+        self.upstream = upstream.rstrip('/')
+        self.places = Places()
+        self.requests = 0
+        self.counts = {}  # (point d'accès, statut) -> requêtes
+        self.count_lock = threading.Lock()
+
+    def count(self, endpoint, status):
+        with self.count_lock:
+            self.requests += 1
+            self.counts[(endpoint, status)] = self.counts.get((endpoint, status), 0) + 1
+
+    def stats(self):
+        """Requêtes servies par point d'accès et statut (GET /_stats)"""
+        with self.count_lock:
+            counts = {f"{endpoint} {status}": n for (endpoint, status), n in sorted(self.counts.items(), key=str)}
+            total = self.requests
+        return {'requetes': total, 'par_statut': counts, 'lieux': len(self.places.by_id),
+                'releves': len(self.recordings), 'heures_simulees': round(self.hours(), 2)}
+
+    def hours(self):
+        """Heures écoulées dans le scénario"""
+        return (time.time() - self.started) * self.time_scale / 3600
+
+    def respond(self, endpoint, params):
+        """(statut, corps) d'une requête valide"""
+        if self.record:
+            return self.relay(endpoint, params)
+        recorded = self.recordings.get(request_key(endpoint, params))
+        if recorded is not None:
+            return recorded
+        if endpoint == 'group':
+            return self.group(params)
+        if self.strict and len(self.recordings):
+            return 404, {"cod": "404", "message": "city not found"}
+        return 200, self.synthesize(endpoint, params)
+
+    def synthesize(self, endpoint, params, group_item=False):
+        place = self.places.resolve(params)
+        if endpoint == 'forecast':
+            return forecast(place, self.scenario, self.hours(), time.time())
+        conditions = self.scenario.conditions(place[0], place[2], place[3], self.hours())
+        return current_weather(place, conditions, time.time(), group_item)
+
+    def group(self, params):
+        """Météo de plusieurs villes : relevés par identifiant, sinon synthèse (sauf en rejeu strict)"""
+        ids = [int(i) for i in params.get('id', [''])[0].split(',') if i.strip()]
+        if len(ids) > GROUP_LIMIT:
+            return 400, {"cod": "400", "message": f"{len(ids)} cities requested, no more than {GROUP_LIMIT} allowed"}
+        items = []
+        for city_id in ids:
+            recorded = self.recordings.get(f"weather?id={city_id}")
+            if recorded is not None and recorded[0] == 200:
+                items.append({key: value for key, value in recorded[1].items() if key != 'cod'})
+            elif not (self.strict and len(self.recordings)):
+                items.append(self.synthesize('weather', {'id': [str(city_id)]}, group_item=True))
+        return 200, {"cnt": len(items), "list": items}
+
+    def relay(self, endpoint, params):
+        """Mode enregistrement : requête transmise à l'API réelle, réponse enregistrée puis renvoyée"""
+        try:
+            with urlopen(f"{self.upstream}/{endpoint}?{urlencode(params, doseq=True)}", timeout=15) as response:
+                status, body = response.status, json.loads(response.read())
+        except HTTPError as e:
+            status, body = e.code, json.loads(e.read() or b'{}')
+        except OSError as e:
+            return 502, {"cod": 502, "message": f"upstream unreachable: {e}"}
+        self.recordings.add(request_key(endpoint, params), status, body)
+        return status, body
+
+
+def make_server(host='127.0.0.1', port=0, latency=0.0, **options):
+    """Serveur prêt à lancer (serve_forever) ; port 0 = port libre"""
+    return StubServer((host, port), latency=latency, **options)
+
+
+def seed_zones(db_path, count, frequency=1):
+    """Zones « Zone simulée N » ajoutées à la base de SURUWA, jusqu'à count zones simulées"""
+    conn = sqlite3.connect(db_path)
+    try:
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'monitoring_zones'").fetchone():
+            raise SystemExit(f"{db_path} : base SURUWA introuvable, lancer l'application une première fois")
+        existing = conn.execute(
+            "SELECT COUNT(*) FROM monitoring_zones WHERE name LIKE 'Zone simulée %'").fetchone()[0]
+        with conn:
+            conn.executemany("""
+                INSERT INTO monitoring_zones (name, frequency, risk_level, last_update, status)
+                VALUES (?, ?, 'En attente...', NULL, 'Actif')
+            """, ((f"Zone simulée {i}", frequency) for i in range(existing + 1, count + 1)))
+        return max(0, count - existing)
+    finally:
+        conn.close()
+
+
+def parse_storm(text):
+    """--storm lat,lon,rayon_km,cap,vitesse_kmh,pluie_mm_h"""
+    values = tuple(float(value) for value in text.split(','))
+    if len(values) != 6:
+        raise argparse.ArgumentTypeError("6 valeurs attendues : lat,lon,rayon_km,cap,vitesse_kmh,pluie_mm_h")
+    return values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur OpenWeatherMap local pour SURUWA")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='saison')
+    parser.add_argument('--storm', type=parse_storm, action='append',
+                        help="cellule du scénario orage (répétable) : lat,lon,rayon_km,cap,vitesse_kmh,pluie_mm_h")
+    parser.add_argument('--time-scale', type=float, default=1.0, help="heures simulées par heure réelle")
+    parser.add_argument('--latency', type=float, default=0.0, help="délai ajouté à chaque réponse (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="délai aléatoire supplémentaire, jusqu'à (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="proportion de réponses 500")
+    parser.add_argument('--drop-rate', type=float, default=0.0, help="proportion de connexions coupées sans réponse")
+    parser.add_argument('--rate-limit', type=float, help="requêtes par seconde au-delà desquelles l'API répond 429")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--replay', metavar='FICHIER', help="relevés à rejouer (JSONL)")
+    source.add_argument('--record', metavar='FICHIER', help="relais vers l'API réelle, réponses ajoutées au fichier")
+    parser.add_argument('--strict', action='store_true', help="rejeu : 404 pour les requêtes non enregistrées")
+    parser.add_argument('--upstream', default=OWM_UPSTREAM, help="API réelle utilisée par --record")
+    parser.add_argument('--zones', type=int, help="nombre de zones simulées à surveiller dans --db")
+    parser.add_argument('--db', default='suruwa.db')
+    parser.add_argument('--zone-frequency', type=int, default=1, help="fréquence des zones simulées (minutes)")
+    args = parser.parse_args(argv)
+
+    if args.zones:
+        added = seed_zones(args.db, args.zones, args.zone_frequency)
+        print(f"{added} zones simulées ajoutées à {args.db}", flush=True)
+
+    scenario = StormScenario(args.storm or DEFAULT_STORMS) if args.scenario == 'orage' else SCENARIOS[args.scenario]()
+    server = make_server(args.host, args.port, args.latency, scenario=scenario, time_scale=args.time_scale,
+                         jitter=args.jitter, error_rate=args.error_rate, drop_rate=args.drop_rate,
+                         rate_limit=args.rate_limit, replay=args.replay, strict=args.strict, record=args.record,
+                         upstream=args.upstream)
+    mode = (f"relais vers {args.upstream}" if args.record else
+            f"rejeu de {len(server.recordings)} requêtes" if args.replay else f"scénario {args.scenario}")
+    print(f"Serveur OpenWeatherMap local : http://{args.host}:{server.server_port} ({mode})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(json.dumps(server.stats(), indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())